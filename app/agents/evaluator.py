@@ -1,31 +1,115 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
 
 
+def _load_predictions(path: str) -> list:
+    """COCO results list from ``path``; ValueError (with the reason) if it cannot be read or parsed."""
+    try:
+        preds = json.loads(Path(path).read_text(encoding="utf-8"))
+    except OSError as e:
+        raise ValueError(f"cannot read predictions {path}: {e}") from e
+    except ValueError as e:
+        raise ValueError(f"predictions {path} are not valid JSON: {e}") from e
+    if not isinstance(preds, list):
+        raise ValueError(f"predictions {path} must be a JSON list of COCO results")
+    return preds
+
+
+def _is_tracking_set(path: str) -> bool:
+    """True for a tracking eval set: a JSON list of ``{"name", "gt", "pred"}`` MOTChallenge file pairs."""
+    try:
+        entries = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return isinstance(entries, list) and bool(entries) and all(isinstance(e, dict) and "gt" in e and "pred" in e for e in entries)
+
+
+def _ocr_samples(dataset_path: str, predictions_path: str | None) -> list:
+    """OCR samples ``[{"gt": [...], "pred": [...]}]`` from the dataset, predictions taken from ``predictions_path`` if given.
+
+    The predictions file is a JSON list in dataset order whose entries are
+    the predicted ``{"text", "box"}`` items (or ``{"pred": [...]}``).
+    """
+    try:
+        samples = json.loads(Path(dataset_path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"ocr: cannot read samples from {dataset_path}: {e}") from e
+    if not isinstance(samples, list) or not all(isinstance(s, dict) and "gt" in s for s in samples):
+        raise ValueError(f"ocr needs OCR samples: {dataset_path} is not a JSON list of {{\"gt\", \"pred\"}} samples")
+    if not predictions_path:
+        return samples
+    preds = _load_predictions(predictions_path)
+    if len(preds) != len(samples):
+        raise ValueError(f"ocr: {len(preds)} predictions for {len(samples)} samples")
+    return [{**s, "pred": p.get("pred") if isinstance(p, dict) else p} for s, p in zip(samples, preds)]
+
+
 class EvaluatorAgent:
     def __init__(self, config: dict) -> None:
         self.config = config
 
-    def evaluate(self, dataset_path: str, tasks: list[str]) -> dict:
-        # Placeholder IoU and mAP computation outlines using utils.metrics
-        from app.utils.metrics import iou_xyxy, map50_placeholder  # noqa: F401
-        from app.utils.coco import load_coco, coco_gt_boxes_by_image
-        data = load_coco(dataset_path) if Path(dataset_path).exists() else {"images": [], "annotations": []}
-        gt_by_img = coco_gt_boxes_by_image(data)
-        # No actual preds; return zeros as placeholders
-        iou = 0.0 if "seg" in tasks else None
-        map50 = 0.0 if "det" in tasks else None
-        idf1 = 0.0 if "track" in tasks else None
-        ocr_acc = 0.0 if "ocr" in tasks else None
-        # Confusion matrix placeholder (2x2) per-class aggregation could go here
-        cm = [[0, 0], [0, 0]] if "det" in tasks else None
-        metrics = {
-            "det": {"map50": map50} if map50 is not None else {},
-            "seg": {"miou": iou} if iou is not None else {},
-            "track": {"idf1": idf1} if idf1 is not None else {},
-            "ocr": {"acc": ocr_acc} if ocr_acc is not None else {},
-        }
-        return {"dataset": dataset_path, "tasks": tasks, "metrics": metrics, "cm": cm}
+    def evaluate(self, dataset_path: str, tasks: list[str], predictions_path: str | None = None) -> dict:
+        metrics: dict = {"det": {}, "seg": {}, "track": {}, "ocr": {}}
+        per_class: dict = {}
+        cm = None
+        if "det" in tasks:
+            from app.utils.coco import load_coco
+            from app.utils.coco_eval import evaluate_detections
 
+            data = load_coco(dataset_path) if Path(dataset_path).exists() else {"images": [], "annotations": []}
+            preds = _load_predictions(predictions_path) if predictions_path else []
+            cfg = self.config.get("evaluation", {}) or {}
+            det = evaluate_detections(
+                data,
+                preds,
+                max_dets=int(cfg.get("max_dets", 100)),
+                workers=int(cfg.get("workers", 0)),
+                min_parallel_images=int(cfg.get("min_parallel_images", 500)),
+                shard_images=int(cfg.get("shard_images", 250)),
+                conf_thresh=float(cfg.get("conf_thresh", 0.25)),
+                cm_iou=float(cfg.get("cm_iou", 0.5)),
+            )
+            per_class["det"] = det.pop("per_class")
+            cm = det.pop("cm")
+            metrics["det"] = det
+        if "track" in tasks:
+            # Tracks need sequence ground truth: a MOTChallenge gt file (tracker output as predictions) or a tracking set
+            from app.utils.mot_eval import evaluate_mot_files, evaluate_tracking_set
 
+            cfg = self.config.get("evaluation", {}) or {}
+            iou = float(cfg.get("track_iou", 0.5))
+            if Path(dataset_path).suffix == ".txt":
+                if not predictions_path:
+                    raise ValueError("track: a MOTChallenge gt .txt dataset needs the tracker output .txt as predictions")
+                metrics["track"] = evaluate_mot_files(dataset_path, predictions_path, iou_thresh=iou)
+                metrics["track"].pop("_counts")
+            elif _is_tracking_set(dataset_path):
+                metrics["track"] = evaluate_tracking_set(dataset_path, iou_thresh=iou)
+            else:
+                raise ValueError(
+                    f"track needs sequence ground truth: {dataset_path} is neither a MOTChallenge gt .txt nor a tracking set"
+                )
+        if "ocr" in tasks:
+            # OCR reads need per-image text ground truth: the dataset is a list of OCR samples
+            from app.utils.ocr_eval import evaluate_ocr
+
+            cfg = self.config.get("evaluation", {}) or {}
+            metrics["ocr"] = evaluate_ocr(
+                _ocr_samples(dataset_path, predictions_path),
+                iou_thresh=float(cfg.get("ocr_iou", 0.5)),
+                workers=int(cfg.get("workers", 0)),
+                cache_path=cfg.get("ocr_cache") or None,
+            )
+        # Segmentation needs mask ground truth; placeholder until wired
+        if "seg" in tasks:
+            metrics["seg"] = {"miou": 0.0}
+        return {
+            "dataset": dataset_path,
+            "predictions": predictions_path,
+            "tasks": tasks,
+            "metrics": metrics,
+            "per_class": per_class,
+            "cm": cm,
+        }
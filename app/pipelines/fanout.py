@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from app.utils.config import load_providers_config
+from app.utils.timing import StageTimer
+
+
+@dataclass
+class StageResult:
+    name: str
+    value: Any
+    elapsed_ms: float
+    error: Optional[str] = None
+
+
+# Shared by all requests; provider calls are I/O bound so threads are enough.
+# Sized by ``pipeline.fanout_workers``; created on first use.
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                try:
+                    workers = int(load_providers_config().get("pipeline", {}).get("fanout_workers", 16))
+                except Exception:
+                    workers = 16
+                _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fanout")
+    return _executor
+
+
+def _run_stage(fn: Callable[[], Any]) -> tuple[Any, float]:
+    t0 = time.perf_counter()
+    value = fn()
+    return value, (time.perf_counter() - t0) * 1000.0
+
+
+def fan_out(
+    stages: Mapping[str, Callable[[], Any]],
+    deadlines_s: Mapping[str, float] | None = None,
+    timer: StageTimer | None = None,
+    default_deadline_s: float = 30.0,
+) -> Dict[str, StageResult]:
+    """Dispatch independent stages concurrently and merge their results.
+
+    Every stage gets its own deadline measured from dispatch. A stage that
+    times out or raises yields ``value=None`` with ``error`` set; a stage
+    still queued is cancelled, a running one is left to finish in the
+    background, so stages should stop retrying at their deadline (the
+    providers take it as ``deadline=``). Per-stage durations are recorded in
+    ``timer`` under the stage name.
+    """
+    deadlines_s = deadlines_s or {}
+    t0 = time.perf_counter()
+    executor = _get_executor()
+    futures = {name: executor.submit(_run_stage, fn) for name, fn in stages.items()}
+    results: Dict[str, StageResult] = {}
+    for name, fut in futures.items():
+        deadline = float(deadlines_s.get(name, default_deadline_s))
+        remaining = max(0.0, deadline - (time.perf_counter() - t0))
+        try:
+            value, elapsed_ms = fut.result(timeout=remaining)
+            results[name] = StageResult(name=name, value=value, elapsed_ms=elapsed_ms)
+        except FutureTimeout:
+            fut.cancel()
+            results[name] = StageResult(name=name, value=None, elapsed_ms=deadline * 1000.0, error="timeout")
+        except Exception as e:
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            results[name] = StageResult(name=name, value=None, elapsed_ms=elapsed_ms, error=f"{type(e).__name__}: {e}")
+        if timer is not None:
+            timer.record(name, results[name].elapsed_ms)
+    return results
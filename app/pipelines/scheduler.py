@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, Optional
+
+
+class FrameScheduler:
+    """Latest-frame mailbox paced to a profile's ``max_fps``.
+
+    The decoder ``offer``s every frame without blocking; a frame that is still
+    waiting when a newer one arrives is dropped, so the consumer always gets
+    the newest frame and latency never builds up behind a slow model. ``take``
+    additionally waits so admissions are at least ``1 / max_fps`` apart.
+    """
+
+    def __init__(self, max_fps: float = 0.0) -> None:
+        self.min_interval_s = 1.0 / float(max_fps) if max_fps and max_fps > 0 else 0.0
+        self._slot: Optional[Any] = None
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._next_due = 0.0
+        self._dropped_since_take = 0
+        self.decoded = 0
+        self.dropped = 0
+        self.admitted = 0
+
+    def offer(self, item: Any) -> None:
+        self.decoded += 1
+        if self._slot is not None:
+            self.dropped += 1
+            self._dropped_since_take += 1
+        self._slot = item
+        self._ready.set()
+
+    def close(self) -> None:
+        self._closed = True
+        self._ready.set()
+
+    async def take(self) -> tuple[Optional[Any], int]:
+        """Wait for the pacing slot, then return (newest frame, frames dropped before it).
+
+        Returns ``(None, n)`` once the source is closed and drained.
+        """
+        loop = asyncio.get_running_loop()
+        delay = self._next_due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        while self._slot is None:
+            if self._closed:
+                return None, self._dropped_since_take
+            self._ready.clear()
+            await self._ready.wait()
+        item, self._slot = self._slot, None
+        dropped, self._dropped_since_take = self._dropped_since_take, 0
+        self.admitted += 1
+        self._next_due = loop.time() + self.min_interval_s
+        return item, dropped
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "decoded": float(self.decoded),
+            "admitted": float(self.admitted),
+            "dropped": float(self.dropped),
+            "drop_ratio": round(self.dropped / self.decoded, 4) if self.decoded else 0.0,
+        }
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.pipelines.scheduler import FrameScheduler
+from app.pipelines.workers import run_blocking
+
+
+@dataclass
+class FramePacket:
+    frame_id: int  # index in the source
+    frame: Optional[np.ndarray]
+    seq: int = 0  # admission order into inference (differs from frame_id when frames drop)
+    dropped_before: int = 0
+    shape: Tuple[int, int] = (0, 0)  # (w, h) of the decoded frame
+    payload: Optional[bytes] = None  # encoded image handed to the provider
+    boxes: List[dict] = field(default_factory=list)
+    tracks: List[dict] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+
+
+class _StageStats:
+    def __init__(self, name: str, workers: int = 1) -> None:
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.busy_s = 0.0
+
+    def add(self, elapsed_s: float) -> None:
+        self.processed += 1
+        self.busy_s += elapsed_s
+
+
+_DONE = None  # end-of-stream sentinel passed down every queue
+
+
+class VideoPipeline:
+    """Staged decode -> encode -> infer(xN) -> track -> emit pipeline.
+
+    Stages are asyncio tasks joined by bounded queues, so a slow stage (or a
+    slow WebSocket client inside ``emit``) fills the queues upstream of it and
+    pauses decoding instead of buffering frames without limit. Inference runs
+    ``concurrency`` requests in flight; results are put back in frame order
+    before tracking, which is stateful and must see frames sequentially. A
+    reorder window caps how far inference may run ahead of a slow frame.
+
+    With a ``FrameScheduler`` the decode -> encode hop becomes a latest-frame
+    mailbox instead of a queue: decoding (paced to ``source_fps`` for file
+    replays) never waits, admissions follow the profile's ``max_fps``, and
+    frames that arrive while inference is saturated are dropped, not queued.
+
+    Callables supplied by the caller:
+      read()          blocking, returns (ok, frame) like ``cv2.VideoCapture.read``
+      encode(frame)   blocking, returns the encoded image bytes or None
+      infer(payload)  coroutine returning a list of box dicts
+      track(boxes)    returns the track list for one frame
+      emit(packet)    coroutine persisting/sending one finished frame
+    """
+
+    def __init__(
+        self,
+        read: Callable[[], Tuple[bool, Any]],
+        encode: Callable[[np.ndarray], Optional[bytes]],
+        infer: Callable[[bytes], Awaitable[List[dict]]],
+        track: Callable[[List[dict]], List[dict]],
+        emit: Callable[[FramePacket], Awaitable[None]],
+        concurrency: int = 2,
+        queue_size: int = 4,
+        should_stop: Callable[[], bool] = lambda: False,
+        scheduler: FrameScheduler | None = None,
+        source_fps: float = 0.0,
+    ) -> None:
+        self._read = read
+        self._encode = encode
+        self._infer = infer
+        self._track = track
+        self._emit = emit
+        self.concurrency = max(1, int(concurrency))
+        self._should_stop = should_stop
+        self.scheduler = scheduler
+        self.source_fps = float(source_fps or 0.0)
+        qsize = max(1, int(queue_size))
+        self.queues: Dict[str, asyncio.Queue] = {
+            "encode": asyncio.Queue(qsize),
+            "infer": asyncio.Queue(qsize),
+            "track": asyncio.Queue(qsize + self.concurrency),
+            "emit": asyncio.Queue(qsize),
+        }
+        self._stats = {
+            "decode": _StageStats("decode"),
+            "encode": _StageStats("encode"),
+            "infer": _StageStats("infer", self.concurrency),
+            "track": _StageStats("track"),
+            "emit": _StageStats("emit"),
+        }
+        # Frames admitted to inference but not yet tracked (bounds the reorder buffer).
+        # With a scheduler only as many as can be inferred at once: any more would
+        # wait in the infer queue and go stale while newer frames replace the mailbox.
+        self._window = asyncio.Semaphore(self.concurrency if scheduler is not None else qsize + self.concurrency)
+        self._started = 0.0
+        self.frames_emitted = 0
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage input queue depth and occupancy (busy fraction of wall time)."""
+        elapsed = max(1e-6, time.perf_counter() - self._started) if self._started else 1e-6
+        out: Dict[str, Dict[str, float]] = {}
+        for name, st in self._stats.items():
+            q = self.queues.get(name)
+            out[name] = {
+                "queue_depth": float(q.qsize()) if q is not None else 0.0,
+                "queue_max": float(q.maxsize) if q is not None else 0.0,
+                "occupancy": round(min(1.0, st.busy_s / (elapsed * st.workers)), 4),
+                "processed": float(st.processed),
+            }
+        if self.scheduler is not None:
+            out["scheduler"] = self.scheduler.stats()
+        return out
+
+    def throughput_fps(self) -> float:
+        if not self._started:
+            return 0.0
+        return self.frames_emitted / max(1e-6, time.perf_counter() - self._started)
+
+    async def _decode(self) -> None:
+        frame_id = 0
+        interval = 1.0 / self.source_fps if self.source_fps > 0 and self.scheduler is not None else 0.0
+        loop = asyncio.get_running_loop()
+        clock0 = loop.time()
+        while not self._should_stop():
+            if interval:
+                # Replay a file at its native rate, like a live camera would deliver it
+                delay = clock0 + frame_id * interval - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            t0 = time.perf_counter()
+            ok, frame = await run_blocking(self._read)
+            if not ok:
+                break
+            self._stats["decode"].add(time.perf_counter() - t0)
+            h, w = frame.shape[:2]
+            pkt = FramePacket(frame_id=frame_id, frame=frame, shape=(int(w), int(h)))
+            pkt.timings["decode"] = round((time.perf_counter() - t0) * 1000.0, 2)
+            if self.scheduler is not None:
+                self.scheduler.offer(pkt)
+            else:
+                await self.queues["encode"].put(pkt)
+            frame_id += 1
+        if self.scheduler is not None:
+            self.scheduler.close()
+        else:
+            await self.queues["encode"].put(_DONE)
+
+    async def _next_for_encode(self) -> Optional[FramePacket]:
+        # Reserve a reorder-window slot first so that, when inference is
+        # saturated, the scheduler keeps replacing the pending frame meanwhile.
+        await self._window.acquire()
+        if self.scheduler is not None:
+            pkt, dropped = await self.scheduler.take()
+            if pkt is not None:
+                pkt.dropped_before = dropped
+        else:
+            pkt = await self.queues["encode"].get()
+        if pkt is _DONE:
+            self._window.release()
+        return pkt
+
+    async def _encode_stage(self) -> None:
+        seq = 0
+        while True:
+            pkt = await self._next_for_encode()
+            if pkt is _DONE:
+                break
+            pkt.seq = seq
+            seq += 1
+            t0 = time.perf_counter()
+            pkt.payload = await run_blocking(self._encode, pkt.frame)
+            pkt.frame = None  # only the encoded payload travels further down
+            if pkt.payload is None:
+                pkt.errors.append("encode: failed")
+            elapsed = time.perf_counter() - t0
+            self._stats["encode"].add(elapsed)
+            pkt.timings["encode"] = round(elapsed * 1000.0, 2)
+            await self.queues["infer"].put(pkt)
+        for _ in range(self.concurrency):
+            await self.queues["infer"].put(_DONE)
+
+    async def _infer_worker(self) -> None:
+        while True:
+            pkt = await self.queues["infer"].get()
+            if pkt is _DONE:
+                break
+            t0 = time.perf_counter()
+            if pkt.payload is not None:
+                try:
+                    pkt.boxes = await self._infer(pkt.payload)
+                except Exception as e:
+                    pkt.errors.append(f"infer: {type(e).__name__}: {e}")
+            elapsed = time.perf_counter() - t0
+            self._stats["infer"].add(elapsed)
+            pkt.timings["model"] = round(elapsed * 1000.0, 2)
+            await self.queues["track"].put(pkt)
+        await self.queues["track"].put(_DONE)
+
+    async def _track_stage(self) -> None:
+        pending: Dict[int, FramePacket] = {}
+        next_id = 0
+        done_workers = 0
+        while done_workers < self.concurrency:
+            pkt = await self.queues["track"].get()
+            if pkt is _DONE:
+                done_workers += 1
+                continue
+            pending[pkt.seq] = pkt
+            # Release every frame that is now contiguous with what was emitted
+            while next_id in pending:
+                ready = pending.pop(next_id)
+                t0 = time.perf_counter()
+                ready.tracks = self._track(ready.boxes)
+                elapsed = time.perf_counter() - t0
+                self._stats["track"].add(elapsed)
+                ready.timings["track"] = round(elapsed * 1000.0, 2)
+                self._window.release()
+                await self.queues["emit"].put(ready)
+                next_id += 1
+        await self.queues["emit"].put(_DONE)
+
+    async def _emit_stage(self) -> None:
+        while True:
+            pkt = await self.queues["emit"].get()
+            if pkt is _DONE:
+                break
+            t0 = time.perf_counter()
+            self.frames_emitted += 1
+            await self._emit(pkt)
+            self._stats["emit"].add(time.perf_counter() - t0)
+
+    async def run(self) -> int:
+        """Run until the source is exhausted or stopped; returns frames emitted."""
+        self._started = time.perf_counter()
+        tasks = [
+            asyncio.create_task(self._decode()),
+            asyncio.create_task(self._encode_stage()),
+            *[asyncio.create_task(self._infer_worker()) for _ in range(self.concurrency)],
+            asyncio.create_task(self._track_stage()),
+            asyncio.create_task(self._emit_stage()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return self.frames_emitted
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# cv2 decode/encode and file I/O release the GIL, so a thread pool keeps them
+# off the event loop without pickling frames across processes.
+_cpu_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 2), thread_name_prefix="cpu")
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking call on the shared worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_cpu_pool, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.utils.config import load_providers_config
+
+
+@dataclass
+class CacheSettings:
+    enabled: bool = True
+    max_mb: float = 64.0
+    disk: bool = False
+    disk_dir: str = "runs/_cache"
+    disk_max_mb: float = 512.0
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any] | None) -> "CacheSettings":
+        cfg = cfg or {}
+        return cls(
+            enabled=bool(cfg.get("enabled", cls.enabled)),
+            max_mb=float(cfg.get("max_mb", cls.max_mb)),
+            disk=bool(cfg.get("disk", cls.disk)),
+            disk_dir=str(cfg.get("disk_dir", cls.disk_dir)),
+            disk_max_mb=float(cfg.get("disk_max_mb", cls.disk_max_mb)),
+        )
+
+
+def cache_key(provider: str, model: str, image: str | bytes, **params: Any) -> str:
+    """Content address for one provider call: image hash + provider/model + params."""
+    h = hashlib.sha256()
+    h.update(image.encode("ascii", "ignore") if isinstance(image, str) else image)
+    meta = json.dumps({"provider": provider, "model": model, "params": params}, sort_keys=True, default=str)
+    h.update(b"\0" + meta.encode("utf-8"))
+    return h.hexdigest()
+
+
+class _DiskTier:
+    """One JSON file per key under ``<dir>/<key[:2]>/``, oldest-first eviction."""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        if root.exists():
+            files = sorted(root.glob("*/*.json"), key=lambda p: p.stat().st_mtime)
+            for p in files:
+                self._sizes[p.stem] = p.stat().st_size
+                self.bytes += self._sizes[p.stem]
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._sizes:
+                return None
+            try:
+                return self._path(key).read_bytes()
+            except OSError:
+                self.bytes -= self._sizes.pop(key, 0)
+                return None
+
+    def put(self, key: str, blob: bytes) -> int:
+        with self._lock:
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(blob)
+            os.replace(tmp, path)
+            self.bytes += len(blob) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(blob)
+            evicted = 0
+            while self.bytes > self.max_bytes and len(self._sizes) > 1:
+                old, size = self._sizes.popitem(last=False)
+                self.bytes -= size
+                evicted += 1
+                try:
+                    self._path(old).unlink()
+                except OSError:
+                    pass
+            return evicted
+
+
+class InferenceCache:
+    """Content-addressed cache of provider responses.
+
+    Values are the provider's JSON response (parsed again on a hit), stored as
+    serialized bytes so the memory tier is bounded by actual size. The memory
+    tier is an LRU capped at ``max_mb``; the optional disk tier persists
+    entries under ``runs/`` across restarts and refills memory on a hit. Only
+    successful upstream responses should be stored. On the event loop use
+    ``aget``/``aput``: memory hits are answered inline and disk-tier I/O runs
+    on a worker thread (it never holds the memory tier's lock).
+    """
+
+    def __init__(self, settings: CacheSettings | None = None) -> None:
+        self.settings = settings or CacheSettings()
+        self.max_bytes = int(self.settings.max_mb * 1024 * 1024)
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self._disk: _DiskTier | None = None
+        if self.settings.enabled and self.settings.disk:
+            self._disk = _DiskTier(Path(self.settings.disk_dir), int(self.settings.disk_max_mb * 1024 * 1024))
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def get(self, key: str) -> Any:
+        """Cached response for ``key`` or None (counted as a miss)."""
+        if not self.settings.enabled:
+            return None
+        blob = self._mem_get(key)
+        if blob is None and self._disk is not None:
+            blob = self._disk_get(key)
+        return json.loads(blob) if blob is not None else None
+
+    async def aget(self, key: str) -> Any:
+        """``get`` without blocking the event loop on the disk tier."""
+        if not self.settings.enabled:
+            return None
+        blob = self._mem_get(key)
+        if blob is None and self._disk is not None:
+            blob = await asyncio.to_thread(self._disk_get, key)
+        return json.loads(blob) if blob is not None else None
+
+    def put(self, key: str, value: Any) -> None:
+        if not self.settings.enabled:
+            return
+        blob = self._mem_put(key, value)
+        if self._disk is not None:
+            self._disk_put(key, blob)
+
+    async def aput(self, key: str, value: Any) -> None:
+        """``put`` without blocking the event loop; the disk write runs on a worker thread."""
+        if not self.settings.enabled:
+            return
+        blob = self._mem_put(key, value)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk_put, key, blob)
+
+    def _mem_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            blob = self._mem.get(key)
+            if blob is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+            elif self._disk is None:
+                self.misses += 1
+            return blob
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        blob = self._disk.get(key)
+        with self._lock:
+            if blob is None:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+                self._store_locked(key, blob)
+        return blob
+
+    def _mem_put(self, key: str, value: Any) -> bytes:
+        blob = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._store_locked(key, blob)
+        return blob
+
+    def _disk_put(self, key: str, blob: bytes) -> None:
+        try:
+            evicted = self._disk.put(key, blob)
+        except OSError:
+            return
+        with self._lock:
+            self.disk_evictions += evicted
+
+    def _store_locked(self, key: str, blob: bytes) -> None:
+        if len(blob) > self.max_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old)
+        self._mem[key] = blob
+        self.bytes += len(blob)
+        while self.bytes > self.max_bytes:
+            _, dropped = self._mem.popitem(last=False)
+            self.bytes -= len(dropped)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            out = {
+                "memory": {
+                    "hits": float(self.hits),
+                    "misses": float(self.misses),
+                    "evictions": float(self.evictions),
+                    "entries": float(len(self._mem)),
+                    "bytes": float(self.bytes),
+                    "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                },
+            }
+            if self._disk is not None:
+                out["disk"] = {
+                    "hits": float(self.disk_hits),
+                    "evictions": float(self.disk_evictions),
+                    "entries": float(len(self._disk._sizes)),
+                    "bytes": float(self._disk.bytes),
+                }
+            return out
+
+
+_singleton: InferenceCache | None = None
+_singleton_lock = threading.Lock()
+
+
+def get_inference_cache() -> InferenceCache:
+    global _singleton
+    if _singleton is not None:
+        return _singleton
+    with _singleton_lock:
+        if _singleton is None:
+            try:
+                cfg = load_providers_config().get("cache", {})
+            except Exception:
+                cfg = {}
+            _singleton = InferenceCache(CacheSettings.from_config(cfg))
+    return _singleton
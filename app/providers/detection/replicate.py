@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import os
 from dataclasses import dataclass
 from typing import Any, Dict, List
 
-import requests
+from app.providers.cache import cache_key, get_inference_cache
+from app.providers.singleflight import get_single_flight
+from app.providers.transport import backoff, get_async_transport, get_transport
+from app.utils.io import as_b64
 
 
 @dataclass
@@ -17,6 +21,11 @@ class Detection:
     cls: str
 
 
+_URL = "https://api.replicate.com/v1/predictions"
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+_BACKOFFS = (0.5, 1.0, 2.0)
+
+
 class ReplicateDetector:
     """Minimal client wrapper. Replace with official SDK if desired."""
 
@@ -24,41 +33,87 @@ class ReplicateDetector:
         self.model = model
         self.token = os.getenv("REPLICATE_API_TOKEN", "")
 
-    def infer(self, image_b64: str) -> List[Detection]:
-        if not self.token:
-            return []
+    def _request(self, image: str | bytes) -> tuple[Dict[str, str], Dict[str, Any]]:
         headers = {"Authorization": f"Token {self.token}", "Content-Type": "application/json"}
-        url = "https://api.replicate.com/v1/predictions"
-        version = self.model
-        payload: Dict[str, Any] = {"version": version, "input": {"image": image_b64}}
+        payload: Dict[str, Any] = {"version": self.model, "input": {"image": as_b64(image)}}
+        return headers, payload
+
+    @staticmethod
+    def _parse(data: Dict[str, Any]) -> List[Detection]:
+        outputs = data.get("output") or []
+        dets: List[Detection] = []
+        for o in outputs:
+            try:
+                x1 = float(o.get("x1", 0)); y1 = float(o.get("y1", 0))
+                x2 = float(o.get("x2", 0)); y2 = float(o.get("y2", 0))
+                score = float(o.get("score", 0)); cls = str(o.get("class", "object"))
+                dets.append(Detection(x1=x1, y1=y1, x2=x2, y2=y2, score=score, cls=cls))
+            except Exception:
+                continue
+        return dets
+
+    @staticmethod
+    def _cacheable(data: Any) -> bool:
+        # Only finished predictions with output; starting/processing/failed replies must be asked again
+        return isinstance(data, dict) and data.get("status") == "succeeded" and bool(data.get("output"))
+
+    def _fetch(self, key: str, image: str | bytes, deadline: float | None = None) -> Dict[str, Any] | None:
+        """Upstream call with retry; caches and returns the response JSON."""
+        headers, payload = self._request(image)
         # Simple retry with backoff
-        backoffs = [0.5, 1.0, 2.0]
-        last_exc: Exception | None = None
-        for delay in backoffs:
+        for delay in _BACKOFFS:
             try:
-                resp = requests.post(url, headers=headers, json=payload, timeout=30)
-                if resp.status_code in (429, 500, 502, 503, 504):
-                    import time as _t
-                    _t.sleep(delay)
+                resp = get_transport().post(_URL, headers=headers, json=payload, deadline=deadline)
+                if resp.status_code in _RETRY_STATUS:
+                    if not backoff(delay, deadline):
+                        return None
                     continue
                 if not resp.ok:
-                    return []
+                    return None
                 data = resp.json()
-                outputs = data.get("output") or []
-                dets: List[Detection] = []
-                for o in outputs:
-                    try:
-                        x1 = float(o.get("x1", 0)); y1 = float(o.get("y1", 0))
-                        x2 = float(o.get("x2", 0)); y2 = float(o.get("y2", 0))
-                        score = float(o.get("score", 0)); cls = str(o.get("class", "object"))
-                        dets.append(Detection(x1=x1, y1=y1, x2=x2, y2=y2, score=score, cls=cls))
-                    except Exception:
-                        continue
-                return dets
-            except Exception as e:
-                last_exc = e
-                import time as _t
-                _t.sleep(delay)
-        return []
+                if self._cacheable(data):
+                    get_inference_cache().put(key, data)
+                return data
+            except Exception:
+                if not backoff(delay, deadline):
+                    return None
+        return None
 
+    async def _afetch(self, key: str, image: str | bytes) -> Dict[str, Any] | None:
+        headers, payload = self._request(image)
+        for delay in _BACKOFFS:
+            try:
+                resp = await get_async_transport().post(_URL, headers=headers, json=payload)
+                if resp.status_code in _RETRY_STATUS:
+                    await asyncio.sleep(delay)
+                    continue
+                if not resp.is_success:
+                    return None
+                data = resp.json()
+                if self._cacheable(data):
+                    await get_inference_cache().aput(key, data)
+                return data
+            except Exception:
+                await asyncio.sleep(delay)
+        return None
+
+    def infer(self, image: str | bytes, deadline: float | None = None) -> List[Detection]:
+        """Detections for one image; past ``deadline`` (``time.monotonic()``) no wait or retry is started."""
+        if not self.token:
+            return []
+        key = cache_key("replicate", self.model, image)
+        data = get_inference_cache().get(key)
+        if data is None:
+            # Identical concurrent calls share one upstream request
+            data = get_single_flight().do(key, lambda: self._fetch(key, image, deadline))
+        return self._parse(data) if data is not None else []
 
+    async def ainfer(self, image: str | bytes) -> List[Detection]:
+        """Non-blocking ``infer`` for use on the event loop (same retry policy)."""
+        if not self.token:
+            return []
+        key = cache_key("replicate", self.model, image)
+        data = await get_inference_cache().aget(key)
+        if data is None:
+            data = await get_single_flight().ado(key, lambda: self._afetch(key, image))
+        return self._parse(data) if data is not None else []
@@ -1,8 +1,17 @@
 from __future__ import annotations
 
 from typing import List, Any, Dict
+import asyncio
 import os
-import requests
+from app.providers.cache import cache_key, get_inference_cache
+from app.providers.singleflight import get_single_flight
+from app.providers.transport import backoff, get_async_transport, get_transport
+from app.utils.io import as_b64
+
+
+_URL = "https://api.replicate.com/v1/predictions"
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+_BACKOFFS = (0.5, 1.0, 2.0)
 
 
 class ReplicatePaddleOcr:
@@ -10,37 +19,82 @@ class ReplicatePaddleOcr:
         self.version = version
         self.token = os.getenv("REPLICATE_API_TOKEN", "")
 
-    def infer(self, image_b64: str) -> List[dict]:
-        if not self.token:
-            return []
+    def _request(self, image: str | bytes) -> tuple[Dict[str, str], Dict[str, Any]]:
         headers = {"Authorization": f"Token {self.token}", "Content-Type": "application/json"}
-        url = "https://api.replicate.com/v1/predictions"
-        payload: Dict[str, Any] = {"version": self.version, "input": {"image": image_b64}}
-        backoffs = [0.5, 1.0, 2.0]
-        for delay in backoffs:
+        payload: Dict[str, Any] = {"version": self.version, "input": {"image": as_b64(image)}}
+        return headers, payload
+
+    @staticmethod
+    def _parse(data: Dict[str, Any]) -> List[dict]:
+        out = data.get("output") or []
+        ocr_items: List[dict] = []
+        for it in out:
+            try:
+                text = it.get("text")
+                box = it.get("box")
+                if text and box and len(box) == 4:
+                    ocr_items.append({"text": str(text), "box": [float(x) for x in box]})
+            except Exception:
+                continue
+        return ocr_items
+
+    @staticmethod
+    def _cacheable(data: Any) -> bool:
+        # Only finished predictions with output; starting/processing/failed replies must be asked again
+        return isinstance(data, dict) and data.get("status") == "succeeded" and bool(data.get("output"))
+
+    def _fetch(self, key: str, image: str | bytes, deadline: float | None = None) -> Dict[str, Any] | None:
+        headers, payload = self._request(image)
+        for delay in _BACKOFFS:
             try:
-                resp = requests.post(url, headers=headers, json=payload, timeout=30)
-                if resp.status_code in (429, 500, 502, 503, 504):
-                    import time as _t
-                    _t.sleep(delay)
+                resp = get_transport().post(_URL, headers=headers, json=payload, deadline=deadline)
+                if resp.status_code in _RETRY_STATUS:
+                    if not backoff(delay, deadline):
+                        return None
                     continue
                 if not resp.ok:
-                    return []
+                    return None
                 data = resp.json()
-                out = data.get("output") or []
-                ocr_items: List[dict] = []
-                for it in out:
-                    try:
-                        text = it.get("text")
-                        box = it.get("box")
-                        if text and box and len(box) == 4:
-                            ocr_items.append({"text": str(text), "box": [float(x) for x in box]})
-                    except Exception:
-                        continue
-                return ocr_items
+                if self._cacheable(data):
+                    get_inference_cache().put(key, data)
+                return data
             except Exception:
-                import time as _t
-                _t.sleep(delay)
-        return []
+                if not backoff(delay, deadline):
+                    return None
+        return None
 
+    async def _afetch(self, key: str, image: str | bytes) -> Dict[str, Any] | None:
+        headers, payload = self._request(image)
+        for delay in _BACKOFFS:
+            try:
+                resp = await get_async_transport().post(_URL, headers=headers, json=payload)
+                if resp.status_code in _RETRY_STATUS:
+                    await asyncio.sleep(delay)
+                    continue
+                if not resp.is_success:
+                    return None
+                data = resp.json()
+                if self._cacheable(data):
+                    await get_inference_cache().aput(key, data)
+                return data
+            except Exception:
+                await asyncio.sleep(delay)
+        return None
 
+    def infer(self, image: str | bytes, deadline: float | None = None) -> List[dict]:
+        if not self.token:
+            return []
+        key = cache_key("replicate-paddleocr", self.version, image)
+        data = get_inference_cache().get(key)
+        if data is None:
+            data = get_single_flight().do(key, lambda: self._fetch(key, image, deadline))
+        return self._parse(data) if data is not None else []
+
+    async def ainfer(self, image: str | bytes) -> List[dict]:
+        if not self.token:
+            return []
+        key = cache_key("replicate-paddleocr", self.version, image)
+        data = await get_inference_cache().aget(key)
+        if data is None:
+            data = await get_single_flight().ado(key, lambda: self._afetch(key, image))
+        return self._parse(data) if data is not None else []
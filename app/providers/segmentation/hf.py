@@ -2,31 +2,80 @@ from __future__ import annotations
 
 from typing import List, Any, Dict
 import os
-import requests
+from app.providers.cache import cache_key, get_inference_cache
+from app.providers.singleflight import get_single_flight
+from app.providers.transport import get_async_transport, get_transport
+from app.utils.io import as_b64
 
 
 class HfSegmentation:
     def __init__(self, model_id: str) -> None:
         self.model_id = model_id
 
-    def infer(self, image_b64: str) -> List[dict]:
-        token = os.getenv("HF_API_TOKEN")
-        endpoint = os.getenv("HF_SEG_ENDPOINT")  # optional fully qualified endpoint URL
-        if not token or not endpoint:
-            return []
+    @staticmethod
+    def _endpoint() -> tuple[str | None, str | None]:
+        # optional fully qualified endpoint URL
+        return os.getenv("HF_API_TOKEN"), os.getenv("HF_SEG_ENDPOINT")
+
+    @staticmethod
+    def _parse(data: Any) -> List[dict]:
+        # Expecting a provider-specific schema; normalize to list of mask dicts
+        # For now pass through as-is; downstream will ignore if unusable
+        if isinstance(data, list):
+            return data
+        return data.get("masks", []) if isinstance(data, dict) else []
+
+    @staticmethod
+    def _cacheable(data: Any) -> bool:
+        # A mask list (or {"masks": [...]}); {"error": ...} replies, e.g. a model still loading, are not kept
+        if isinstance(data, dict):
+            return "error" not in data and bool(data.get("masks"))
+        return isinstance(data, list) and bool(data)
+
+    def _fetch(self, key: str, token: str, endpoint: str, image: str | bytes, deadline: float | None = None) -> Any:
         try:
             headers = {"Authorization": f"Bearer {token}"}
-            payload: Dict[str, Any] = {"inputs": image_b64}
-            resp = requests.post(endpoint, headers=headers, json=payload, timeout=30)
+            payload: Dict[str, Any] = {"inputs": as_b64(image)}
+            resp = get_transport().post(endpoint, headers=headers, json=payload, deadline=deadline)
             if not resp.ok:
-                return []
+                return None
             data = resp.json()
-            # Expecting a provider-specific schema; normalize to list of mask dicts
-            # For now pass through as-is; downstream will ignore if unusable
-            if isinstance(data, list):
-                return data
-            return data.get("masks", []) if isinstance(data, dict) else []
+            if self._cacheable(data):
+                get_inference_cache().put(key, data)
+            return data
         except Exception:
-            return []
+            return None
 
+    async def _afetch(self, key: str, token: str, endpoint: str, image: str | bytes) -> Any:
+        try:
+            headers = {"Authorization": f"Bearer {token}"}
+            payload: Dict[str, Any] = {"inputs": as_b64(image)}
+            resp = await get_async_transport().post(endpoint, headers=headers, json=payload)
+            if not resp.is_success:
+                return None
+            data = resp.json()
+            if self._cacheable(data):
+                await get_inference_cache().aput(key, data)
+            return data
+        except Exception:
+            return None
 
+    def infer(self, image: str | bytes, deadline: float | None = None) -> List[dict]:
+        token, endpoint = self._endpoint()
+        if not token or not endpoint:
+            return []
+        key = cache_key("hf", endpoint, image, model_id=self.model_id)
+        data = get_inference_cache().get(key)
+        if data is None:
+            data = get_single_flight().do(key, lambda: self._fetch(key, token, endpoint, image, deadline))
+        return self._parse(data) if data is not None else []
+
+    async def ainfer(self, image: str | bytes) -> List[dict]:
+        token, endpoint = self._endpoint()
+        if not token or not endpoint:
+            return []
+        key = cache_key("hf", endpoint, image, model_id=self.model_id)
+        data = await get_inference_cache().aget(key)
+        if data is None:
+            data = await get_single_flight().ado(key, lambda: self._afetch(key, token, endpoint, image))
+        return self._parse(data) if data is not None else []
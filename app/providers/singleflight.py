@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for and share its result (or exception). Nothing is
+    remembered once the call completes; that is the inference cache's job.
+    Sync callers (threads) and async callers (per event loop) are tracked
+    separately.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            tasks[key] = task
+            task.add_done_callback(lambda _t: tasks.pop(key, None))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        # Shielded so one caller going away does not cancel the shared request
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            in_flight = len(self._calls) + sum(len(t) for t in list(self._tasks.values()))
+            return {"calls": float(self.calls), "coalesced": float(self.coalesced), "in_flight": float(in_flight)}
+
+
+_singleton: SingleFlight | None = None
+_singleton_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    global _singleton
+    if _singleton is not None:
+        return _singleton
+    with _singleton_lock:
+        if _singleton is None:
+            _singleton = SingleFlight()
+    return _singleton
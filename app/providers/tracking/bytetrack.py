@@ -1,24 +1,60 @@
 from __future__ import annotations
 
+from collections import deque
 from typing import List, Dict
 
+import numpy as np
+
+from app.utils.assignment import sparse_assignment
+from app.utils.metrics import iou_matrix_xyxy, iou_pairs_xyxy, match_max_iou
+
 
 class SimpleTracker:
-    """Very basic deterministic tracker stub assigning incremental IDs."""
+    """Lightweight greedy-IoU tracker; IDs persist while boxes keep overlapping.
+
+    State is bounded: tracks unseen for ``max_age`` updates are dropped, at most
+    ``max_tracks`` are kept (least recently seen evicted first) and each trail
+    holds ``trail_len`` points.
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, iou_thresh: float = 0.3, max_age: int = 30, max_tracks: int = 256, trail_len: int = 10) -> None:
+        self.iou_thresh = iou_thresh
+        self.max_age = max_age
+        self.max_tracks = max_tracks
+        self.trail_len = trail_len
         self._next_id = 1
+        self._frame = 0
         self._history: dict[int, list[tuple[int, int]]] = {}
+        # id -> (last box, frame index last seen)
+        self._last: dict[int, tuple[tuple[float, float, float, float], int]] = {}
 
     def update(self, boxes: List[Dict]) -> List[Dict]:
+        self._frame += 1
+        cur = [(float(b["x1"]), float(b["y1"]), float(b["x2"]), float(b["y2"])) for b in boxes]
+        # Greedy association: highest-IoU pairs first, each side used once. Both
+        # axes run in descending (track id, box index) order, so equal IoUs
+        # resolve towards the newer track and the later box.
+        assigned: dict[int, int] = {}
+        if self._last and cur:
+            tids = sorted(self._last, reverse=True)
+            prev = np.array([self._last[t][0] for t in tids], dtype=np.float64)
+            iou = iou_matrix_xyxy(prev, np.array(cur[::-1], dtype=np.float64))
+            matches, _, _ = match_max_iou(iou, self.iou_thresh)
+            for r, c in matches.tolist():
+                assigned[len(cur) - 1 - c] = tids[r]
+
         tracks: List[Dict] = []
-        for b in boxes:
-            tid = self._next_id
+        for i, b in enumerate(boxes):
+            tid = assigned.get(i)
+            if tid is None:
+                tid = self._next_id
+                self._next_id += 1
+            self._last[tid] = (cur[i], self._frame)
             cx = int((b["x1"] + b["x2"]) / 2)
             cy = int((b["y1"] + b["y2"]) / 2)
             hist = self._history.setdefault(tid, [])
             hist.append((cx, cy))
-            if len(hist) > 10:
+            if len(hist) > self.trail_len:
                 hist.pop(0)
             tracks.append({
                 "id": tid,
@@ -26,7 +62,236 @@ class SimpleTracker:
                 "x1": b["x1"], "y1": b["y1"], "x2": b["x2"], "y2": b["y2"],
                 "trail": hist.copy(),
             })
-            self._next_id += 1
+        self._prune()
         return tracks
 
+    def _prune(self) -> None:
+        stale = [tid for tid, (_, seen) in self._last.items() if self._frame - seen > self.max_age]
+        if len(self._last) - len(stale) > self.max_tracks:
+            by_age = sorted(self._last.items(), key=lambda kv: kv[1][1])
+            stale = [tid for tid, _ in by_age[: len(self._last) - self.max_tracks]]
+        for tid in stale:
+            self._last.pop(tid, None)
+            self._history.pop(tid, None)
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+
+# Constant-velocity model over (cx, cy, aspect, h) and their velocities
+_STD_POS = 1.0 / 20
+_STD_VEL = 1.0 / 160
+
+
+def _xyxy_to_xyah(b: np.ndarray) -> np.ndarray:
+    w = b[:, 2] - b[:, 0]
+    h = np.maximum(b[:, 3] - b[:, 1], 1e-6)
+    return np.stack([b[:, 0] + w / 2, b[:, 1] + h / 2, w / h, h], axis=1)
+
+
+def _xyah_to_xyxy(m: np.ndarray) -> np.ndarray:
+    h = m[:, 3]
+    w = m[:, 2] * h
+    return np.stack([m[:, 0] - w / 2, m[:, 1] - h / 2, m[:, 0] + w / 2, m[:, 1] + h / 2], axis=1)
+
+
+def _std(h: np.ndarray, pos: float, aspect: float) -> np.ndarray:
+    s = h[:, None] * np.array([pos, pos, 0.0, pos])
+    s[:, 2] = aspect
+    return s
+
+
+class BatchedKalman:
+    """Kalman filter for many tracks at once over (T, 8) means.
+
+    With a constant-velocity transition, diagonal noise and a position-only
+    measurement, the 8x8 covariance never couples different coordinates: it
+    stays four independent 2x2 (position, velocity) blocks. Covariances are
+    therefore kept as (T, 3, 4) arrays of [var_pos, cov_pos_vel, var_vel] per
+    coordinate and every step is plain elementwise math, exactly equal to the
+    full-matrix filter.
+    """
+
+    @staticmethod
+    def initiate(xyah: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        n = xyah.shape[0]
+        mean = np.concatenate([xyah, np.zeros((n, 4))], axis=1)
+        cov = np.zeros((n, 3, 4))
+        cov[:, 0] = _std(xyah[:, 3], 2 * _STD_POS, 1e-2) ** 2
+        cov[:, 2] = _std(xyah[:, 3], 10 * _STD_VEL, 1e-5) ** 2
+        return mean, cov
+
+    @staticmethod
+    def predict(mean: np.ndarray, cov: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if mean.shape[0] == 0:
+            return mean, cov
+        h = mean[:, 3]
+        pp, pv, vv = cov[:, 0], cov[:, 1], cov[:, 2]
+        mean = mean.copy()
+        mean[:, :4] += mean[:, 4:]
+        out = np.empty_like(cov)
+        out[:, 0] = pp + 2 * pv + vv + _std(h, _STD_POS, 1e-2) ** 2
+        out[:, 1] = pv + vv
+        out[:, 2] = vv + _std(h, _STD_VEL, 1e-5) ** 2
+        return mean, out
+
+    @staticmethod
+    def update(mean: np.ndarray, cov: np.ndarray, xyah: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if mean.shape[0] == 0:
+            return mean, cov
+        pp, pv, vv = cov[:, 0], cov[:, 1], cov[:, 2]
+        innov_var = pp + _std(mean[:, 3], _STD_POS, 1e-1) ** 2
+        k_pos, k_vel = pp / innov_var, pv / innov_var
+        innov = xyah - mean[:, :4]
+        mean = np.concatenate([mean[:, :4] + k_pos * innov, mean[:, 4:] + k_vel * innov], axis=1)
+        out = np.empty_like(cov)
+        out[:, 0] = pp - k_pos * pp
+        out[:, 1] = pv - k_pos * pv
+        out[:, 2] = vv - k_vel * pv
+        return mean, out
+
+
+_TRACKED, _LOST = 0, 1
+
+
+class ByteTracker:
+    """ByteTrack-style multi-object tracker with all track state in arrays.
+
+    Per frame: batched Kalman predict; high-score detections are matched to
+    tracked and lost tracks on IoU; remaining tracked tracks get a second
+    chance against low-score detections; unconfirmed tracks (one hit so far)
+    may match leftover high-score detections, otherwise they are discarded.
+    Matching is optimal assignment on vectorized IoU costs between
+    overlapping pairs. Lost
+    tracks are kept for ``track_buffer`` frames. Same ``update`` contract as
+    ``SimpleTracker`` (box dicts in, track dicts with trails out).
+    """
+
+    def __init__(
+        self,
+        track_thresh: float = 0.5,
+        low_thresh: float = 0.1,
+        match_thresh: float = 0.8,
+        track_buffer: int = 30,
+        max_tracks: int = 1024,
+        trail_len: int = 10,
+    ) -> None:
+        self.track_thresh = track_thresh
+        self.low_thresh = low_thresh
+        self.new_track_thresh = track_thresh + 0.1
+        self.match_thresh = match_thresh
+        self.track_buffer = track_buffer
+        self.max_tracks = max_tracks
+        self.trail_len = trail_len
+        self._frame = 0
+        self._next_id = 1
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros((0, 8))
+        self.cov = np.zeros((0, 3, 4))
+        self.state = np.zeros(0, dtype=np.int8)
+        self.confirmed = np.zeros(0, dtype=bool)
+        self.last_seen = np.zeros(0, dtype=np.int64)
+        self.cls = np.zeros(0, dtype=object)
+        self._trails: dict[int, deque] = {}
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    def _match(self, track_idx: np.ndarray, det_boxes: np.ndarray, det_idx: np.ndarray, thresh: float):
+        if track_idx.size == 0 or det_idx.size == 0:
+            return np.empty((0, 2), dtype=np.int64), track_idx, det_idx
+        # Only overlapping pairs can pass the gate, so skip the dense N x M matrix
+        rows, cols, iou = iou_pairs_xyxy(_xyah_to_xyxy(self.mean[track_idx, :4]), det_boxes[det_idx])
+        m, ut, ud = sparse_assignment(track_idx.size, det_idx.size, rows, cols, 1.0 - iou, thresh)
+        return np.stack([track_idx[m[:, 0]], det_idx[m[:, 1]]], axis=1), track_idx[ut], det_idx[ud]
+
+    def update(self, boxes: List[Dict]) -> List[Dict]:
+        self._frame += 1
+        n = len(boxes)
+        det = np.array([[b["x1"], b["y1"], b["x2"], b["y2"]] for b in boxes], dtype=np.float64).reshape(n, 4)
+        scores = np.array([float(b.get("score", 1.0)) for b in boxes], dtype=np.float64)
+        classes = np.array([b.get("cls", "obj") for b in boxes], dtype=object)
+
+        self.mean, self.cov = BatchedKalman.predict(self.mean, self.cov)
+
+        all_idx = np.arange(len(self))
+        high = np.nonzero(scores >= self.track_thresh)[0]
+        low = np.nonzero((scores >= self.low_thresh) & (scores < self.track_thresh))[0]
+        pool = all_idx[self.confirmed]
+        unconfirmed = all_idx[~self.confirmed]
+
+        m1, rest_tracks, rest_high = self._match(pool, det, high, self.match_thresh)
+        second = rest_tracks[self.state[rest_tracks] == _TRACKED]
+        m2, _, _ = self._match(second, det, low, 0.5)
+        m3, dead_unconfirmed, new_high = self._match(unconfirmed, det, rest_high, 0.7)
+        matches = np.concatenate([m1, m2, m3], axis=0)
+
+        if matches.shape[0]:
+            t, d = matches[:, 0], matches[:, 1]
+            self.mean[t], self.cov[t] = BatchedKalman.update(self.mean[t], self.cov[t], _xyxy_to_xyah(det[d]))
+            self.state[t] = _TRACKED
+            self.confirmed[t] = True
+            self.last_seen[t] = self._frame
+            self.cls[t] = classes[d]
+        matched_tracks = matches[:, 0]
+        lost = np.setdiff1d(all_idx, np.concatenate([matched_tracks, dead_unconfirmed]))
+        self.state[lost] = _LOST
+
+        # Drop unconfirmed misses and tracks lost for longer than the buffer
+        keep = np.ones(len(self), dtype=bool)
+        keep[dead_unconfirmed] = False
+        keep &= (self._frame - self.last_seen) <= self.track_buffer
+        out_det, out_ids = matches[:, 1], self.ids[matches[:, 0]]
+        self._keep(keep)
+
+        new = new_high[scores[new_high] >= self.new_track_thresh]
+        if new.size:
+            mean, cov = BatchedKalman.initiate(_xyxy_to_xyah(det[new]))
+            new_ids = np.arange(self._next_id, self._next_id + new.size, dtype=np.int64)
+            self._next_id += int(new.size)
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.mean = np.concatenate([self.mean, mean])
+            self.cov = np.concatenate([self.cov, cov])
+            self.state = np.concatenate([self.state, np.zeros(new.size, dtype=np.int8)])
+            # ByteTrack activates immediately only on the first frame
+            self.confirmed = np.concatenate([self.confirmed, np.full(new.size, self._frame == 1)])
+            self.last_seen = np.concatenate([self.last_seen, np.full(new.size, self._frame, dtype=np.int64)])
+            self.cls = np.concatenate([self.cls, classes[new]])
+            if self._frame == 1:
+                out_det, out_ids = np.concatenate([out_det, new]), np.concatenate([out_ids, new_ids])
+        if len(self) > self.max_tracks:
+            keep = np.zeros(len(self), dtype=bool)
+            keep[np.argsort(-self.last_seen, kind="stable")[: self.max_tracks]] = True
+            self._keep(keep)
+
+        order = np.argsort(out_det, kind="stable")
+        out_det = out_det[order]
+        centers = ((det[out_det, :2] + det[out_det, 2:]) / 2).astype(np.int64).tolist()
+        tracks: List[Dict] = []
+        for d, tid, c in zip(out_det.tolist(), out_ids[order].tolist(), centers):
+            b = boxes[d]
+            hist = self._trails.get(tid)
+            if hist is None:
+                hist = self._trails[tid] = deque(maxlen=self.trail_len)
+            hist.append(tuple(c))
+            tracks.append({
+                "id": tid,
+                "cls": b.get("cls", "obj"),
+                "x1": b["x1"], "y1": b["y1"], "x2": b["x2"], "y2": b["y2"],
+                "score": float(scores[d]),
+                "trail": list(hist),
+            })
+        return tracks
 
+    def _keep(self, keep: np.ndarray) -> None:
+        if keep.all():
+            return
+        for tid in self.ids[~keep].tolist():
+            self._trails.pop(tid, None)
+        self.ids = self.ids[keep]
+        self.mean = self.mean[keep]
+        self.cov = self.cov[keep]
+        self.state = self.state[keep]
+        self.confirmed = self.confirmed[keep]
+        self.last_seen = self.last_seen[keep]
+        self.cls = self.cls[keep]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List
+
+
+class _Session:
+    __slots__ = ("tracker", "lock", "last_used", "frames")
+
+    def __init__(self, tracker: Any) -> None:
+        self.tracker = tracker
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.frames = 0
+
+
+class TrackerSessions:
+    """Tracker state kept across frames, keyed by run/stream id.
+
+    Sessions live in an LRU ordered by last use; idle ones are evicted after
+    ``ttl_s`` and the oldest beyond ``max_sessions`` are dropped, so memory stays
+    bounded even when clients never close their streams. Per-session memory is
+    capped by the tracker itself (see ``SimpleTracker(max_tracks=...)``).
+    """
+
+    def __init__(self, factory: Callable[[], Any], ttl_s: float = 300.0, max_sessions: int = 256) -> None:
+        self._factory = factory
+        self.ttl_s = float(ttl_s)
+        self.max_sessions = max(1, int(max_sessions))
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _session(self, key: str) -> _Session:
+        now = time.monotonic()
+        with self._lock:
+            sess = self._sessions.get(key)
+            if sess is None:
+                sess = _Session(self._factory())
+                self._sessions[key] = sess
+            else:
+                self._sessions.move_to_end(key)
+            sess.last_used = now
+            self._evict_locked(now)
+        return sess
+
+    def _evict_locked(self, now: float) -> None:
+        # Oldest entries are at the front; stop at the first one still fresh
+        while self._sessions:
+            key, sess = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - sess.last_used <= self.ttl_s:
+                break
+            del self._sessions[key]
+            self.evicted += 1
+
+    def update(self, key: str, boxes: List[Dict]) -> List[Dict]:
+        sess = self._session(key)
+        with sess.lock:
+            sess.frames += 1
+            return sess.tracker.update(boxes)
+
+    def drop(self, key: str) -> None:
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            before = self.evicted
+            self._evict_locked(time.monotonic())
+            return self.evicted - before
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"sessions": float(len(self._sessions)), "evicted": float(self.evicted)}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._sessions
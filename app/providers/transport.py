@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.config import load_providers_config
+
+
+@dataclass
+class PoolSettings:
+    pool_connections: int = 4
+    pool_maxsize: int = 8
+    timeout_s: float = 30.0
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any] | None) -> "PoolSettings":
+        cfg = cfg or {}
+        return cls(
+            pool_connections=max(1, int(cfg.get("pool_connections", cls.pool_connections))),
+            pool_maxsize=max(1, int(cfg.get("pool_maxsize", cls.pool_maxsize))),
+            timeout_s=float(cfg.get("timeout_s", cls.timeout_s)),
+        )
+
+
+class _HostPool:
+    """One keep-alive session per upstream host, gated by a slot semaphore.
+
+    The semaphore is sized to the urllib3 pool so callers queue here (where the
+    wait is measured) instead of inside urllib3 or by opening extra sockets.
+    """
+
+    def __init__(self, host: str, settings: PoolSettings) -> None:
+        self.host = host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=settings.pool_connections,
+            pool_maxsize=settings.pool_maxsize,
+            pool_block=True,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(settings.pool_maxsize)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.errors = 0
+
+    def post(self, url: str, wait_s: float | None = None, **kwargs: Any) -> requests.Response:
+        t0 = time.perf_counter()
+        if not self._slots.acquire(timeout=wait_s):
+            raise TimeoutError(f"no free connection to {self.host} within {wait_s:.3f}s")
+        waited_ms = (time.perf_counter() - t0) * 1000.0
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.wait_ms_total += waited_ms
+            self.wait_ms_max = max(self.wait_ms_max, waited_ms)
+        try:
+            return self.session.post(url, **kwargs)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def connections_opened(self) -> int:
+        # urllib3 counts every socket it had to open; requests minus this is reuse
+        total = 0
+        adapter = self.session.get_adapter(f"https://{self.host}")
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                total += int(getattr(pool, "num_connections", 0))
+        return total
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            reqs = self.requests
+            out = {
+                "requests": float(reqs),
+                "in_flight": float(self.in_flight),
+                "errors": float(self.errors),
+                "wait_ms_avg": self.wait_ms_total / reqs if reqs else 0.0,
+                "wait_ms_max": self.wait_ms_max,
+            }
+        conns = self.connections_opened()
+        out["connections"] = float(conns)
+        out["reuse_ratio"] = max(0.0, 1.0 - conns / reqs) if reqs else 0.0
+        return out
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class ProviderTransport:
+    """Process-wide HTTP transport shared by all provider clients."""
+
+    def __init__(self, settings: PoolSettings | None = None) -> None:
+        self.settings = settings or PoolSettings()
+        self._pools: Dict[str, _HostPool] = {}
+        self._lock = threading.Lock()
+
+    def _pool_for(self, url: str) -> _HostPool:
+        host = urlsplit(url).netloc
+        pool = self._pools.get(host)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(host)
+                if pool is None:
+                    pool = _HostPool(host, self.settings)
+                    self._pools[host] = pool
+        return pool
+
+    def post(self, url: str, deadline: float | None = None, **kwargs: Any) -> requests.Response:
+        """POST through the host's pool; ``deadline`` (``time.monotonic()``) bounds the wait for a slot and the request."""
+        kwargs.setdefault("timeout", self.settings.timeout_s)
+        wait_s = None
+        if deadline is not None:
+            wait_s = deadline - time.monotonic()
+            if wait_s <= 0:
+                raise TimeoutError("provider deadline passed")
+            kwargs["timeout"] = min(float(kwargs["timeout"]), wait_s)
+        return self._pool_for(url).post(url, wait_s=wait_s, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {host: pool.stats() for host, pool in list(self._pools.items())}
+
+    def close(self) -> None:
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+
+
+class _AsyncHostPool:
+    """Async counterpart of ``_HostPool`` backed by an ``httpx.AsyncClient``.
+
+    New sockets are counted through httpcore's trace extension, which is the
+    only place httpx reports that a connection had to be opened.
+    """
+
+    def __init__(self, host: str, settings: PoolSettings) -> None:
+        self.host = host
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.pool_maxsize,
+                max_keepalive_connections=settings.pool_maxsize,
+            ),
+            timeout=settings.timeout_s,
+        )
+        self._slots = asyncio.Semaphore(settings.pool_maxsize)
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.errors = 0
+
+    async def _trace(self, event: str, info: dict) -> None:
+        if event == "connection.connect_tcp.complete":
+            self.connections += 1
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        t0 = time.perf_counter()
+        async with self._slots:
+            waited_ms = (time.perf_counter() - t0) * 1000.0
+            self.requests += 1
+            self.in_flight += 1
+            self.wait_ms_total += waited_ms
+            self.wait_ms_max = max(self.wait_ms_max, waited_ms)
+            try:
+                return await self.client.post(url, extensions={"trace": self._trace}, **kwargs)
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.in_flight -= 1
+
+    def stats(self) -> Dict[str, float]:
+        reqs = self.requests
+        return {
+            "requests": float(reqs),
+            "in_flight": float(self.in_flight),
+            "errors": float(self.errors),
+            "wait_ms_avg": self.wait_ms_total / reqs if reqs else 0.0,
+            "wait_ms_max": self.wait_ms_max,
+            "connections": float(self.connections),
+            "reuse_ratio": max(0.0, 1.0 - self.connections / reqs) if reqs else 0.0,
+        }
+
+
+class AsyncProviderTransport:
+    """Async HTTP transport for provider clients used from the event loop.
+
+    httpx clients and asyncio semaphores are bound to the loop that created
+    them, so pools are kept per running loop (normally just uvicorn's).
+    """
+
+    def __init__(self, settings: PoolSettings | None = None) -> None:
+        self.settings = settings or PoolSettings()
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _AsyncHostPool]]" = weakref.WeakKeyDictionary()
+
+    def _pool_for(self, url: str) -> _AsyncHostPool:
+        host = urlsplit(url).netloc
+        pools = self._pools.setdefault(asyncio.get_running_loop(), {})
+        pool = pools.get(host)
+        if pool is None:
+            pool = _AsyncHostPool(host, self.settings)
+            pools[host] = pool
+        return pool
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self._pool_for(url).post(url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        merged: Dict[str, Dict[str, float]] = {}
+        for pools in list(self._pools.values()):
+            for host, pool in list(pools.items()):
+                cur = pool.stats()
+                prev = merged.get(host)
+                if prev is None:
+                    merged[host] = cur
+                    continue
+                # Several loops talking to one host: sum counters, recompute ratios
+                prev["wait_ms_avg"] = (
+                    (prev["wait_ms_avg"] * prev["requests"] + cur["wait_ms_avg"] * cur["requests"])
+                    / max(1.0, prev["requests"] + cur["requests"])
+                )
+                for k in ("requests", "in_flight", "errors", "connections"):
+                    prev[k] += cur[k]
+                prev["wait_ms_max"] = max(prev["wait_ms_max"], cur["wait_ms_max"])
+                reqs = prev["requests"]
+                prev["reuse_ratio"] = max(0.0, 1.0 - prev["connections"] / reqs) if reqs else 0.0
+        return merged
+
+    async def aclose(self) -> None:
+        pools = self._pools.pop(asyncio.get_running_loop(), {})
+        for pool in pools.values():
+            await pool.client.aclose()
+
+
+def _load_settings() -> PoolSettings:
+    try:
+        cfg = load_providers_config().get("transport", {})
+    except Exception:
+        cfg = {}
+    return PoolSettings.from_config(cfg)
+
+
+def backoff(delay: float, deadline: float | None = None) -> bool:
+    """Sleep ``delay`` before a retry; False (without sleeping) if the retry would start past ``deadline``."""
+    if deadline is not None and time.monotonic() + delay >= deadline:
+        return False
+    time.sleep(delay)
+    return True
+
+
+_singleton: ProviderTransport | None = None
+_async_singleton: AsyncProviderTransport | None = None
+_singleton_lock = threading.Lock()
+
+
+def get_transport() -> ProviderTransport:
+    global _singleton
+    if _singleton is not None:
+        return _singleton
+    with _singleton_lock:
+        if _singleton is None:
+            _singleton = ProviderTransport(_load_settings())
+    return _singleton
+
+
+def get_async_transport() -> AsyncProviderTransport:
+    global _async_singleton
+    if _async_singleton is not None:
+        return _async_singleton
+    with _singleton_lock:
+        if _async_singleton is None:
+            _async_singleton = AsyncProviderTransport(_load_settings())
+    return _async_singleton
@@ -1,29 +1,60 @@
 from __future__ import annotations
 
-from fastapi import FastAPI, Response, WebSocket, WebSocketDisconnect
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import os
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import json
 from datetime import datetime, timezone
 import base64
+import hashlib
 from pathlib import Path
 import numpy as np
 import cv2
 
-from .schemas import EvaluateRequest, ReportRequest, RunFrameRequest, RunVideoRequest
+from .schemas import EvaluateRequest, LiveEvalRequest, ReportRequest, RunFrameRequest, RunFramesRequest, RunVideoRequest
 from .metrics import get_metrics_registry
-from .storage import RunRegistry
-from app.utils.config import load_providers_config
+from .event_log import EventLog, SegmentSettings
+from .event_writer import WriterSettings
+from .live_eval import LiveEvals, LiveEvalSettings
+from .retention import RetentionSettings, RunJanitor
+from .storage import RunRegistry, check_run_id
+from app.utils.config import load_profile, load_providers_config
+from app.utils.io import from_b64
+from app.utils.preprocess import FrameTransform, apply_resize, encode_jpeg, plan_resize, prepare_upload
 from app.providers.detection.replicate import ReplicateDetector
-from app.utils.viz import draw_boxes, draw_track_ids, overlay_soft_masks, draw_ocr_labels
+from app.utils.viz import OverlaySpec, compose
 from app.utils.timing import StageTimer, timed
-from app.providers.tracking.bytetrack import SimpleTracker
+from app.providers.tracking.bytetrack import ByteTracker, SimpleTracker
+from app.providers.tracking.sessions import TrackerSessions
 from app.providers.segmentation.hf import HfSegmentation
 from app.providers.ocr.replicate_paddleocr import ReplicatePaddleOcr
+from app.providers.cache import get_inference_cache
+from app.providers.singleflight import get_single_flight
+from app.providers.transport import get_async_transport, get_transport
+from app.pipelines.fanout import fan_out
+from app.pipelines.workers import run_blocking
+from app.pipelines.scheduler import FrameScheduler
+from app.pipelines.video_engine import FramePacket, VideoPipeline
+
 
+@asynccontextmanager
+async def _lifespan(_: FastAPI):
+    janitor.start()
+    yield
+    await run_blocking(janitor.stop)
+    await run_blocking(registry.close)
+    await get_async_transport().aclose()
+    get_transport().close()
 
-app = FastAPI(title="Perception Ops Lab API", version="0.1.0")
+
+app = FastAPI(title="Perception Ops Lab API", version="0.1.0", lifespan=_lifespan)
 
 # Enable CORS for local Streamlit UI
 _cors_origins = os.getenv("CORS_ALLOW_ORIGINS", "http://localhost:8501,http://127.0.0.1:8501").split(",")
@@ -34,9 +65,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-registry = RunRegistry()
+# Events are queued and appended in batches by a background writer (see ``events`` config)
+_events_cfg = load_providers_config().get("events", {})
+registry = RunRegistry(
+    writer=WriterSettings.from_config(_events_cfg),
+    segments=SegmentSettings.from_config(_events_cfg),
+)
+# Compresses rotated segments and compacts/deletes old runs off the request path (``retention`` config)
+janitor = RunJanitor(registry, RetentionSettings.from_config(load_providers_config().get("retention", {})))
+# Running mAP of runs against attached ground truth, fed from their event logs
+live_evals = LiveEvals(registry, LiveEvalSettings.from_config(load_providers_config().get("evaluation", {})))
+_tracking_cfg = load_providers_config().get("tracking", {})
+
+
+def _make_tracker():
+    max_tracks = int(_tracking_cfg.get("max_tracks", 256))
+    trail_len = int(_tracking_cfg.get("trail_len", 10))
+    if _tracking_cfg.get("provider", "bytetrack") == "simple":
+        return SimpleTracker(max_tracks=max_tracks, trail_len=trail_len)
+    return ByteTracker(
+        track_thresh=float(_tracking_cfg.get("track_thresh", 0.5)),
+        match_thresh=float(_tracking_cfg.get("match_thresh", 0.8)),
+        track_buffer=int(_tracking_cfg.get("track_buffer", 30)),
+        max_tracks=max_tracks,
+        trail_len=trail_len,
+    )
+
+
+trackers = TrackerSessions(
+    factory=_make_tracker,
+    ttl_s=float(_tracking_cfg.get("session_ttl_s", 300)),
+    max_sessions=int(_tracking_cfg.get("max_sessions", 256)),
+)
 metrics = get_metrics_registry()
 _stop_requested: bool = False
+# Frame-level workers for /run_frame(s) (each frame fans out again on the provider executor)
+_frame_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="frame")
 
 
 @app.get("/health")
@@ -62,87 +126,138 @@ def health_providers() -> dict:
     return {"status": "ok", "providers": ready}
 
 
-@app.post("/run_frame")
-def run_frame(req: RunFrameRequest) -> dict:
-    # Process a single frame and persist artifacts
-    run_id = registry.ensure_run()
-    # Minimal provider wiring
-    providers = load_providers_config()
-    det_cfg = providers.get("detection", {})
-    if req.provider_override and isinstance(req.provider_override, dict):
-        det_cfg = req.provider_override.get("detection", det_cfg)
-    det_provider = det_cfg.get("provider", "replicate")
-    det_model = det_cfg.get("model", "ultralytics/yolov8")
-    boxes = []
-    timer = StageTimer()
-    if det_provider == "replicate":
-        with timed(timer, "model"):
-            det = ReplicateDetector(det_model)
-            boxes = [
-                {
-                    "x1": d.x1,
-                    "y1": d.y1,
-                    "x2": d.x2,
-                    "y2": d.y2,
-                    "score": d.score,
-                    "cls": d.cls,
-                }
-                for d in det.infer(req.image_b64)
-            ]
-
-    # Decode input and produce annotated overlay if possible
+class _FrameConfig:
+    """Provider/overlay settings resolved once per request (shared by batch frames)."""
+
+    def __init__(self, provider_override: dict | None, overlay_opts: dict | None, profile: str = "realtime") -> None:
+        providers = load_providers_config()
+        det_cfg = providers.get("detection", {})
+        if provider_override and isinstance(provider_override, dict):
+            det_cfg = provider_override.get("detection", det_cfg)
+        self.det_cfg = det_cfg
+        self.det_provider = det_cfg.get("provider", "replicate")
+        self.det_model = det_cfg.get("model", "ultralytics/yolov8")
+        ocr_cfg = providers.get("ocr", {})
+        ocr_provider = ocr_cfg.get("provider", "gcv")
+        if provider_override and isinstance(provider_override, dict):
+            ocr_cfg = provider_override.get("ocr", ocr_cfg)
+            ocr_provider = ocr_cfg.get("provider", ocr_provider)
+        self.ocr_cfg = ocr_cfg
+        self.ocr_provider = ocr_provider
+        self.seg_cfg = providers.get("segmentation", {})
+        self.batch_cfg = providers.get("batch", {})
+        prof = load_profile(profile)
+        # Uploads are downscaled to the profile's model input; the provider would resize anyway
+        self.input_size = int(prof.get("input_size", 0) or 0)
+        self.jpeg_quality = int(prof.get("jpeg_quality", 90))
+        self.letterbox = str(prof.get("resize_mode", "fit")) == "letterbox"
+        self.class_include = None
+        if overlay_opts and isinstance(overlay_opts, dict):
+            self.class_include = overlay_opts.get("class_include")
+
+    def provenance(self) -> dict:
+        return {"detector": f"replicate:{self.det_model}", "ocr": "gcv"}
+
+
+class _Prepared:
+    """One frame after preprocessing: upload bytes, their geometry, decoded source."""
+
+    __slots__ = ("upload", "xf", "frame")
+
+    def __init__(self, upload: bytes, xf: FrameTransform, frame: np.ndarray | None) -> None:
+        self.upload = upload
+        self.xf = xf
+        self.frame = frame
+
+
+def _prepare_frame(cfg: _FrameConfig, image: bytes, timer: StageTimer) -> _Prepared:
+    with timed(timer, "pre"):
+        return _Prepared(*prepare_upload(image, cfg.input_size, cfg.jpeg_quality, cfg.letterbox))
+
+
+def _infer_frame(cfg: _FrameConfig, image: bytes, timer: StageTimer) -> dict:
+    """Run detection, segmentation and OCR for one encoded image; stateless, safe to parallelize.
+
+    Providers receive the raw bytes and base64 them only if their API needs it.
+    Results are in the coordinates of ``image`` (see ``_prepare_frame``).
+    """
+
+    deadlines_s = {
+        "det": float(cfg.det_cfg.get("deadline_s", 30)),
+        "seg": float(cfg.seg_cfg.get("deadline_s", 30)),
+        "ocr": float(cfg.ocr_cfg.get("deadline_s", 30)),
+    }
+    # Providers stop retrying at the stage deadline, so a timed-out stage frees its fan-out thread
+    start = time.monotonic()
+    deadline = {name: start + s for name, s in deadlines_s.items()}
+
+    def _detect() -> list[dict]:
+        if cfg.det_provider != "replicate":
+            return []
+        return [
+            {"x1": d.x1, "y1": d.y1, "x2": d.x2, "y2": d.y2, "score": d.score, "cls": d.cls}
+            for d in ReplicateDetector(cfg.det_model).infer(image, deadline=deadline["det"])
+        ]
+
+    def _segment() -> list[dict]:
+        return HfSegmentation(model_id="seg").infer(image, deadline=deadline["seg"])
+
+    def _ocr() -> list[dict]:
+        version = cfg.ocr_cfg.get("version", "")
+        if str(cfg.ocr_provider).startswith("replicate") and version:
+            return ReplicatePaddleOcr(version=version).infer(image, deadline=deadline["ocr"])
+        return []
+
+    # Detection, segmentation and OCR only share the input image: run them concurrently
+    with timed(timer, "model"):
+        return fan_out({"det": _detect, "seg": _segment, "ocr": _ocr}, deadlines_s=deadlines_s, timer=timer)
+
+
+def _finish_frame(
+    cfg: _FrameConfig,
+    run_id: str,
+    prep: _Prepared,
+    stage_results: dict,
+    timer: StageTimer,
+    frame_id: int = 0,
+    annotate: bool = True,
+) -> dict:
+    """Track, annotate and build the event for one inferred frame (call in frame order)."""
+    errors = [f"{r.name}: {r.error}" for r in stage_results.values() if r.error]
+    xf = prep.xf
+    # Provider outputs are in upload coordinates; everything downstream uses the source frame
+    boxes = xf.boxes_to_source(stage_results["det"].value or [])
+    masks = stage_results["seg"].value or []
+    ocr_items = stage_results["ocr"].value or []
+    if not xf.identity:
+        ocr_items = [
+            {**o, "box": xf.box_to_source(o["box"])} if len(o.get("box") or []) == 4 else o for o in ocr_items
+        ]
+
+    # Annotate the frame decoded during preprocessing
     annotated_b64 = None
     annotated_path = None
-    try:
-        img_bytes = base64.b64decode(req.image_b64.encode("utf-8"))
-        arr = np.frombuffer(img_bytes, dtype=np.uint8)
-        img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-    except Exception:
-        img = None
+    img = prep.frame if annotate else None
 
     if img is not None:
-        box_tuples = [(b["x1"], b["y1"], b["x2"], b["y2"]) for b in boxes]
-        vis = draw_boxes(img, box_tuples) if box_tuples else img.copy()
-        # Real segmentation overlay if configured
-        try:
-            seg = HfSegmentation(model_id="seg")
-            masks = seg.infer(req.image_b64)
-            # Expect either binary mask arrays or provider-specific; if binary buffers available, overlay
-            bin_masks = []
-            for m in masks:
-                buf = m.get("mask") if isinstance(m, dict) else None
-                if buf is not None:
-                    import base64 as _b64, numpy as _np
-                    raw = _b64.b64decode(buf)
-                    arr2 = _np.frombuffer(raw, dtype=_np.uint8)
+        # Expect either binary mask arrays or provider-specific; if binary buffers available, overlay
+        bin_masks = []
+        h, w = (xf.dst_h, xf.dst_w) if not xf.identity else img.shape[:2]
+        for m in masks:
+            buf = m.get("mask") if isinstance(m, dict) else None
+            if buf is not None:
+                try:
                     # Fallback shape; real endpoints should include shape metadata
-                    try:
-                        h, w = vis.shape[:2]
-                        bin_masks.append(arr2.reshape(h, w))
-                    except Exception:
-                        continue
-            if bin_masks:
-                vis = overlay_soft_masks(vis, bin_masks)
-        except Exception:
-            pass
-        # Simple tracking stub computed before drawing track IDs
-        tracks = SimpleTracker().update(boxes)
-        vis = draw_track_ids(vis, tracks)
-        # OCR labels if configured (Replicate PaddleOCR)
-        ocr_items = []
+                    bin_masks.append(xf.mask_to_source(np.frombuffer(base64.b64decode(buf), dtype=np.uint8).reshape(h, w)))
+                except Exception:
+                    continue
+        # Tracker state persists per run, so repeated frames keep their IDs and trails
+        tracks = trackers.update(run_id, boxes)
+        # All layers in one pass, drawn straight into the decoded frame
         try:
-            ocr = providers.get("ocr", {})
-            ocr_provider = ocr.get("provider", "gcv")
-            if req.provider_override and isinstance(req.provider_override, dict):
-                ocr = req.provider_override.get("ocr", ocr)
-                ocr_provider = ocr.get("provider", ocr_provider)
-            if str(ocr_provider).startswith("replicate"):
-                version = ocr.get("version", "")
-                if version:
-                    ocr_items = ReplicatePaddleOcr(version=version).infer(req.image_b64)
-            vis = draw_ocr_labels(vis, ocr_items)
+            vis = compose(img, OverlaySpec(boxes=boxes, masks=bin_masks, tracks=tracks, ocr=ocr_items), inplace=True)
         except Exception:
-            pass
+            vis = img
         ok, buf = cv2.imencode(".jpg", vis)
         if ok:
             jpg_bytes = buf.tobytes()
@@ -155,50 +270,166 @@ def run_frame(req: RunFrameRequest) -> dict:
                 out_path = run_dir / f"annotated_{next_idx:03d}.jpg"
                 out_path.write_bytes(jpg_bytes)
                 annotated_path = str(out_path)
+                registry.add_artifact(run_id, out_path.stem, annotated_path)
 
     # Apply overlay filters (class include) if provided
-    class_include = None
-    if req.overlay_opts and isinstance(req.overlay_opts, dict):
-        class_include = req.overlay_opts.get("class_include")
-    if class_include:
-        boxes = [b for b in boxes if b.get("cls") in class_include]
+    if cfg.class_include:
+        boxes = [b for b in boxes if b.get("cls") in cfg.class_include]
 
-    # Simple tracking already computed above when img is not None; ensure defined
-    if 'tracks' not in locals():
-        tracks = SimpleTracker().update(boxes)
+    # Simple tracking already computed above when img is not None
+    if img is None:
+        tracks = trackers.update(run_id, boxes)
 
     # Export basic metrics
     if "model" in timer.timings_ms:
         metrics.latency_model_ms.observe(timer.timings_ms["model"]) 
 
-    total_ms = sum(timer.timings_ms.values()) or 1e-6
+    total_ms = timer.timings_ms.get("model", 0.0) or 1e-6
     fps_val = 1000.0 / total_ms
 
-    event = {
+    return {
         "boxes": boxes,
         "masks": [],
         "tracks": tracks,
-        "ocr": ocr_items if 'ocr_items' in locals() else [],
-        "timings": {
-            "model": round(timer.timings_ms.get("model", 0.0), 2),
-        },
-        "frame_id": 0,
+        "ocr": ocr_items,
+        "timings": {name: round(timer.timings_ms.get(name, 0.0), 2) for name in ("pre", "model", "det", "seg", "ocr")},
+        "frame_id": frame_id,
         "run_id": run_id,
         "ts": datetime.now(timezone.utc).isoformat(),
         "fps": fps_val,
-        "provider_provenance": {"detector": f"replicate:{det_model}", "ocr": "gcv"},
-        "errors": [],
+        "provider_provenance": cfg.provenance(),
+        "errors": errors,
         "annotated_path": annotated_path,
         "annotated_b64": annotated_b64,
     }
+
+
+def _options_from(fields) -> dict:
+    """Frame options sent as query params or multipart fields (dicts as JSON text)."""
+    opts = {k: fields.get(k) for k in ("profile", "run_id", "frame_id", "annotate", "concurrency") if fields.get(k) is not None}
+    for k in ("provider_override", "overlay_opts"):
+        if fields.get(k):
+            opts[k] = json.loads(str(fields.get(k)))
+    return opts
+
+
+async def _frame_input(request: Request) -> tuple[RunFrameRequest, bytes]:
+    """Parse a raw ``image/*`` body, a multipart ``file`` upload or ``RunFrameRequest`` JSON."""
+    ctype = request.headers.get("content-type", "")
+    if ctype.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if not hasattr(upload, "read"):
+            raise ValueError("multipart field 'file' is required")
+        return RunFrameRequest(**_options_from(form)), await upload.read()
+    if ctype.startswith(("image/", "application/octet-stream")):
+        return RunFrameRequest(**_options_from(request.query_params)), await request.body()
+    req = RunFrameRequest.model_validate_json(await request.body())
+    if not req.image_b64:
+        raise ValueError("image_b64 is required for JSON requests")
+    return req, from_b64(req.image_b64)
+
+
+def _run_frame(req: RunFrameRequest, image: bytes) -> dict:
+    # Process a single frame and persist artifacts
+    cfg = _FrameConfig(req.provider_override, req.overlay_opts, req.profile)
+    run_id = registry.ensure_run(req.run_id, profile=req.profile, provenance=cfg.provenance())
+    timer = StageTimer()
+    prep = _prepare_frame(cfg, image, timer)
+    stage_results = _infer_frame(cfg, prep.upload, timer)
+    event = _finish_frame(cfg, run_id, prep, stage_results, timer, frame_id=req.frame_id or 0)
     registry.append_event(run_id, json.dumps(event))
     return event
 
 
+@app.post("/run_frame")
+async def run_frame(request: Request) -> dict:
+    """Process one frame: raw ``image/jpeg``/``image/png`` body (options as query
+    params), multipart with the image under ``file``, or ``RunFrameRequest`` JSON.
+    """
+    try:
+        req, image = await _frame_input(request)
+    except (ValueError, TypeError) as e:
+        return JSONResponse({"error": f"invalid frame: {e}"}, status_code=422)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_frame_pool, _run_frame, req, image)
+
+
+async def _batch_frames(request: Request) -> tuple[RunFramesRequest, list[bytes]]:
+    """Parse a JSON ``RunFramesRequest`` or a multipart upload of image files."""
+    ctype = request.headers.get("content-type", "")
+    if ctype.startswith("multipart/form-data"):
+        form = await request.form()
+        files = [f for f in form.getlist("files") if hasattr(f, "read")]
+        images = [await f.read() for f in files]
+        return RunFramesRequest(**_options_from(form)), images
+    req = RunFramesRequest.model_validate_json(await request.body())
+    return req, [from_b64(b) for b in req.images_b64]
+
+
+@app.post("/run_frames")
+async def run_frames(request: Request) -> StreamingResponse:
+    """Run many frames through the providers; streams one NDJSON event per frame.
+
+    Accepts ``RunFramesRequest`` JSON or multipart ``files`` (raw JPEG/PNG)
+    with the same options as form fields. Provider calls run for up to
+    ``concurrency`` frames at once; tracking and annotation follow input
+    order. Each event is appended to the run's log as soon as it is streamed
+    (the background writer batches the writes).
+    """
+    try:
+        req, images = await _batch_frames(request)
+    except (ValueError, TypeError) as e:
+        return JSONResponse({"error": f"invalid batch: {e}"}, status_code=422)
+    cfg = await run_blocking(_FrameConfig, req.provider_override, req.overlay_opts, req.profile)
+    run_id = await run_blocking(registry.ensure_run, req.run_id, req.profile, None, cfg.provenance())
+    limit = max(1, int(req.concurrency or cfg.batch_cfg.get("concurrency", 4)))
+
+    def _prepare_and_infer(image: bytes, timer: StageTimer) -> tuple[_Prepared, dict]:
+        prep = _prepare_frame(cfg, image, timer)
+        if not req.annotate:
+            prep.frame = None  # do not hold decoded frames while waiting for earlier ones
+        return prep, _infer_frame(cfg, prep.upload, timer)
+
+    async def _infer(image: bytes) -> tuple[_Prepared, dict, StageTimer]:
+        timer = StageTimer()
+        loop = asyncio.get_running_loop()
+        prep, results = await loop.run_in_executor(_frame_pool, _prepare_and_infer, image, timer)
+        return prep, results, timer
+
+    async def _stream():
+        pending: deque = deque()
+        todo = iter(enumerate(images))
+        try:
+            while True:
+                # Keep up to ``limit`` frames in flight, consume them in order
+                while len(pending) < limit:
+                    nxt = next(todo, None)
+                    if nxt is None:
+                        break
+                    pending.append((nxt[0], asyncio.ensure_future(_infer(nxt[1]))))
+                if not pending:
+                    break
+                idx, fut = pending.popleft()
+                prep, results, timer = await fut
+                event = await run_blocking(
+                    _finish_frame, cfg, run_id, prep, results, timer, frame_id=idx, annotate=req.annotate
+                )
+                line = json.dumps(event)
+                # Logged as it is produced, so readers follow the batch and a crash keeps what was done
+                await run_blocking(registry.append_event, run_id, line)
+                yield line + "\n"
+        finally:
+            for _, fut in pending:
+                fut.cancel()
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson", headers={"X-Run-Id": run_id})
+
+
 @app.post("/run_video")
 def run_video(req: RunVideoRequest) -> JSONResponse:
     # WebSocket stream is planned; acknowledge request for now
-    run_id = registry.ensure_run()
+    run_id = registry.ensure_run(profile=req.profile, scenario=Path(req.video_path).stem)
     return JSONResponse({"status": "accepted", "run_id": run_id, "note": "WS stream TBD"})
 
 
@@ -209,21 +440,28 @@ def run_control(payload: dict) -> dict:
     action = str(payload.get("action", "")).lower()
     if action == "stop":
         _stop_requested = True
+        registry.flush()
         return {"ok": True, "action": action}
     return {"ok": False, "error": "unsupported action"}
 
 
 @app.post("/evaluate")
 def evaluate(req: EvaluateRequest) -> dict:
-    # Call evaluator agent placeholder and persist
+    # Evaluate and persist as the run's metrics.json
     from app.agents.evaluator import EvaluatorAgent
+    if req.predictions and not Path(req.predictions).exists():
+        return JSONResponse({"error": f"predictions not found: {req.predictions}"}, status_code=404)
+    agent = EvaluatorAgent(config=load_providers_config())
+    try:
+        result = agent.evaluate(req.dataset, req.tasks, predictions_path=req.predictions)
+    except (ValueError, KeyError, TypeError) as e:
+        return JSONResponse({"error": f"invalid evaluation input: {e}"}, status_code=422)
     run_id = registry.last_run_id() or registry.ensure_run()
-    agent = EvaluatorAgent(config={})
-    result = agent.evaluate(req.dataset, req.tasks)
     result.update({"run_id": run_id})
     run_dir = Path("runs") / run_id
     run_dir.mkdir(parents=True, exist_ok=True)
     (run_dir / "metrics.json").write_text(json.dumps(result, indent=2), encoding="utf-8")
+    registry.add_artifact(run_id, "metrics", run_dir / "metrics.json")
     return result
 
 
@@ -233,12 +471,22 @@ def report(req: ReportRequest) -> dict:
     from .report import build_pdf_report
     run_dir = Path("runs") / req.run_id
     run_dir.mkdir(parents=True, exist_ok=True)
+    registry.telemetry(req.run_id)  # bring the columnar store up to date for the latency plot
     path = build_pdf_report(run_dir)
+    registry.add_artifact(req.run_id, "report", path)
     return {"report_path": str(path)}
 
 
 @app.get("/metrics")
 def prometheus_metrics() -> Response:
+    metrics.update_provider_pools(get_transport().stats(), client="sync")
+    metrics.update_provider_pools(get_async_transport().stats(), client="async")
+    metrics.update_inference_cache(get_inference_cache().stats())
+    metrics.update_singleflight(get_single_flight().stats())
+    if registry.writer is not None:
+        metrics.update_event_writer(registry.writer.stats())
+    metrics.update_retention(janitor.stats())
+    metrics.update_live_eval(live_evals.stats())
     content, content_type = metrics.export_prometheus_text()
     return PlainTextResponse(content=content, media_type=content_type)
 
@@ -260,69 +508,199 @@ def last_event() -> JSONResponse:
 async def ws_run_video(ws: WebSocket) -> None:
     await ws.accept()
     cap = None
+    run_id = None
     try:
         params = dict(ws.query_params)
         video_path = params.get("video_path", "data/samples/day.mp4")
         profile = params.get("profile", "realtime")
-        run_id = registry.ensure_run()
-        cap = cv2.VideoCapture(video_path)
+        providers = load_providers_config()
+        det_cfg = providers.get("detection", {})
+        det_model = det_cfg.get("model", "ultralytics/yolov8")
+        run_id = await run_blocking(
+            registry.ensure_run, None, profile, Path(video_path).stem, {"detector": f"replicate:{det_model}"}
+        )
+        cap = await run_blocking(cv2.VideoCapture, video_path)
         if not cap.isOpened():
             await ws.send_json({"error": f"cannot open video: {video_path}"})
             await ws.close()
             return
-        frame_id = 0
-        timer = StageTimer()
-        providers = load_providers_config()
-        det_cfg = providers.get("detection", {})
-        det_model = det_cfg.get("model", "ultralytics/yolov8")
+        det = ReplicateDetector(det_model)
+        prof = load_profile(profile)
+        conf_thresh = float(prof.get("confidence_thresh", 0.0))
+        scheduler = FrameScheduler(max_fps=float(prof.get("max_fps", 0) or 0))
+        # Every frame of a file has the same size: plan the upload resize once
+        xf = plan_resize(
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0),
+            int(prof.get("input_size", 0) or 0),
+            letterbox=str(prof.get("resize_mode", "fit")) == "letterbox",
+        )
+        quality = int(prof.get("jpeg_quality", 90))
         global _stop_requested
         _stop_requested = False
-        while True:
-            ok, frame = cap.read()
-            if not ok:
-                break
-            if _stop_requested:
-                break
-            h, w = frame.shape[:2]
-            # Encode frame to base64 for provider calls
-            ok2, buf = cv2.imencode(".jpg", frame)
-            if not ok2:
-                break
-            b64 = base64.b64encode(buf.tobytes()).decode("utf-8")
-            # Detection
-            with timed(timer, "model"):
-                det = ReplicateDetector(det_model)
-                dets = det.infer(b64)
-            boxes = [{"x1": d.x1, "y1": d.y1, "x2": d.x2, "y2": d.y2, "score": d.score, "cls": d.cls} for d in dets]
-            # Tracking
-            tracks = SimpleTracker().update(boxes)
-            # Build event
-            total_ms = sum(timer.timings_ms.values()) or 1e-6
-            fps_val = 1000.0 / total_ms
+
+        def _encode(frame: np.ndarray) -> bytes | None:
+            return encode_jpeg(apply_resize(frame, xf), quality)
+
+        async def _infer(jpeg: bytes) -> list[dict]:
+            dets = await det.ainfer(jpeg)
+            return xf.boxes_to_source([
+                {"x1": d.x1, "y1": d.y1, "x2": d.x2, "y2": d.y2, "score": d.score, "cls": d.cls}
+                for d in dets
+                if d.score >= conf_thresh
+            ])
+
+        async def _emit(pkt: FramePacket) -> None:
+            w, h = pkt.shape
+            stage_stats = pipeline.stats()
             event = {
                 "run_id": run_id,
-                "frame_id": frame_id,
+                "frame_id": pkt.frame_id,
                 "ts": datetime.now(timezone.utc).isoformat(),
-                "timings": {"model": round(timer.timings_ms.get("model", 0.0), 2)},
-                "fps": fps_val,
-                "boxes": boxes,
-                "tracks": tracks,
+                # decode + resize/encode is the preprocessing cost of a frame
+                "timings": {**pkt.timings, "pre": round(pkt.timings.get("decode", 0.0) + pkt.timings.get("encode", 0.0), 2)},
+                "fps": pipeline.throughput_fps(),
+                "boxes": pkt.boxes,
+                "tracks": pkt.tracks,
                 "masks": [],
                 "ocr": [],
                 "provider_provenance": {"detector": f"replicate:{det_model}", "ocr": ""},
-                "errors": [],
+                "errors": pkt.errors,
                 "shape": {"w": w, "h": h},
+                "profile": profile,
+                "dropped_frames": {"since_prev": pkt.dropped_before, "total": scheduler.dropped, "decoded": scheduler.decoded},
+                "pipeline": stage_stats,
             }
-            registry.append_event(run_id, json.dumps(event))
+            await run_blocking(registry.append_event, run_id, json.dumps(event))
             metrics.fps.set(event["fps"])  # basic metric update
+            metrics.update_pipeline(stage_stats)
+            # A slow client blocks here and backpressure propagates up the queues
             await ws.send_json(event)
-            frame_id += 1
+
+        pipeline_cfg = providers.get("pipeline", {})
+        pipeline = VideoPipeline(
+            read=cap.read,
+            encode=_encode,
+            infer=_infer,
+            track=lambda boxes: trackers.update(run_id, boxes),
+            emit=_emit,
+            concurrency=int(det_cfg.get("concurrency", 2)),
+            queue_size=int(pipeline_cfg.get("queue_size", 4)),
+            should_stop=lambda: _stop_requested,
+            scheduler=scheduler,
+            source_fps=float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+        )
+        await pipeline.run()
         await ws.close()
     except WebSocketDisconnect:
         return
     finally:
+        if run_id is not None:
+            trackers.drop(run_id)
+            await run_blocking(registry.flush, run_id)
         if cap is not None:
-            cap.release()
+            await run_blocking(cap.release)
+
+
+@app.websocket("/ws/run_frames")
+async def ws_run_frames(ws: WebSocket) -> None:
+    """Client-pushed video: every binary message is one encoded frame (JPEG/PNG).
+
+    Frame bytes go to the detector as received (no decode or re-encode) and
+    one JSON event per frame is sent back in order. At most
+    ``detection.concurrency`` frames are awaiting inference before the server
+    stops reading from the socket. Send the text message ``end`` to flush
+    and close. Query params: ``profile``, ``run_id``.
+    """
+    await ws.accept()
+    params = dict(ws.query_params)
+    if params.get("run_id"):
+        try:
+            check_run_id(params["run_id"])
+        except ValueError as e:
+            await ws.send_json({"error": str(e)})
+            await ws.close(code=1008)
+            return
+    profile = params.get("profile", "realtime")
+    det_cfg = load_providers_config().get("detection", {})
+    det_model = det_cfg.get("model", "ultralytics/yolov8")
+    run_id = await run_blocking(
+        registry.ensure_run, params.get("run_id"), profile, None, {"detector": f"replicate:{det_model}"}
+    )
+    det = ReplicateDetector(det_model)
+    conf_thresh = float(load_profile(profile).get("confidence_thresh", 0.0))
+    # A slot is taken before a frame's inference starts and freed once its event is sent
+    slots = asyncio.Semaphore(max(1, int(det_cfg.get("concurrency", 2))))
+    inflight: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+
+    async def _infer(data: bytes) -> tuple[list[dict], list[str], float]:
+        t0 = time.perf_counter()
+        try:
+            dets = await det.ainfer(data)
+            errors: list[str] = []
+        except Exception as e:
+            dets, errors = [], [f"infer: {type(e).__name__}: {e}"]
+        boxes = [
+            {"x1": d.x1, "y1": d.y1, "x2": d.x2, "y2": d.y2, "score": d.score, "cls": d.cls}
+            for d in dets
+            if d.score >= conf_thresh
+        ]
+        return boxes, errors, round((time.perf_counter() - t0) * 1000.0, 2)
+
+    async def _receive() -> None:
+        frame_id = 0
+        try:
+            while True:
+                msg = await ws.receive()
+                if msg["type"] == "websocket.disconnect":
+                    break
+                data = msg.get("bytes")
+                if data is None:
+                    # Text "end": finish the in-flight frames, then close
+                    if (msg.get("text") or "").strip() == "end":
+                        break
+                    continue
+                await slots.acquire()
+                await inflight.put((frame_id, asyncio.ensure_future(_infer(data))))
+                frame_id += 1
+        finally:
+            await inflight.put(None)
+
+    reader = asyncio.create_task(_receive())
+    emitted = 0
+    try:
+        while True:
+            item = await inflight.get()
+            if item is None:
+                break
+            frame_id, fut = item
+            boxes, errors, model_ms = await fut
+            emitted += 1
+            event = {
+                "run_id": run_id,
+                "frame_id": frame_id,
+                "ts": datetime.now(timezone.utc).isoformat(),
+                "timings": {"model": model_ms},
+                "fps": emitted / max(1e-6, time.perf_counter() - started),
+                "boxes": boxes,
+                "tracks": trackers.update(run_id, boxes),
+                "masks": [],
+                "ocr": [],
+                "provider_provenance": {"detector": f"replicate:{det_model}", "ocr": ""},
+                "errors": errors,
+                "profile": profile,
+            }
+            await run_blocking(registry.append_event, run_id, json.dumps(event))
+            await ws.send_json(event)
+            slots.release()
+        await ws.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        reader.cancel()
+        trackers.drop(run_id)
+        await run_blocking(registry.flush, run_id)
 
 
 @app.post("/ab_compare")
@@ -346,25 +724,25 @@ def ab_compare(payload: dict) -> dict:
     cap.release()
     if not ok:
         return {"ok": False, "error": "failed to read frame"}
-    ok2, buf = cv2.imencode(".jpg", frame)
-    if not ok2:
-        return {"ok": False, "error": "encode failure"}
-    b64 = base64.b64encode(buf.tobytes()).decode("utf-8")
     providers = load_providers_config()
     det_cfg = providers.get("detection", {})
     det_model = det_cfg.get("model", "ultralytics/yolov8")
-    # Helper to annotate
-    def _annotate(img_b64: str) -> tuple[list[dict], np.ndarray]:
-        det = ReplicateDetector(det_model)
-        dets = det.infer(img_b64)
-        boxes = [{"x1": d.x1, "y1": d.y1, "x2": d.x2, "y2": d.y2} for d in dets]
-        arr = cv2.imdecode(np.frombuffer(base64.b64decode(img_b64), dtype=np.uint8), cv2.IMREAD_COLOR)
-        vis = draw_boxes(arr, [(b["x1"], b["y1"], b["x2"], b["y2"]) for b in boxes]) if boxes else arr
+    det = ReplicateDetector(det_model)
+    h, w = frame.shape[:2]
+    # Helper to annotate; each profile uploads at its own input size and JPEG quality
+    def _annotate(profile: str) -> tuple[list[dict], np.ndarray]:
+        prof = load_profile(profile)
+        xf = plan_resize(w, h, int(prof.get("input_size", 0) or 0), str(prof.get("resize_mode", "fit")) == "letterbox")
+        upload = encode_jpeg(apply_resize(frame, xf), int(prof.get("jpeg_quality", 90)))
+        if upload is None:
+            return [], frame.copy()
+        dets = det.infer(upload)
+        boxes = xf.boxes_to_source([{"x1": d.x1, "y1": d.y1, "x2": d.x2, "y2": d.y2} for d in dets])
+        vis = compose(frame, OverlaySpec(boxes=boxes))
         return boxes, vis
-    # Realtime
-    _, vis_rt = _annotate(b64)
-    # Accuracy (same flow for now; in a real setup you would swap models/providers)
-    _, vis_ac = _annotate(b64)
+    # Same model for both for now; in a real setup you would swap models/providers
+    _, vis_rt = _annotate("realtime")
+    _, vis_ac = _annotate("accuracy")
     out = Path("runs/latest")
     out.mkdir(parents=True, exist_ok=True)
     cv2.imwrite(str(out / "realtime_frame.png"), vis_rt)
@@ -385,35 +763,159 @@ def clear() -> dict:
     return {"ok": True}
 
 
+def _events_etag(run_id: str, *params) -> str:
+    """Validator for a view of a run's events: changes whenever the log grows."""
+    log = EventLog(Path("runs") / run_id)
+    try:
+        st = log.active.stat()
+        version = f"{log.end()}-{st.st_mtime_ns}"
+    except OSError:
+        version = "0"
+    tag = hashlib.sha1(repr((run_id, version, params)).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{tag}"'
+
+
+def _bad_run_id(run_id: str | None) -> JSONResponse | None:
+    """422 response for a run id that is not a safe directory name (None when it is fine or absent)."""
+    if not run_id:
+        return None
+    try:
+        check_run_id(run_id)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=422)
+    return None
+
+
+def _not_modified(request: Request, etag: str) -> Response | None:
+    match = request.headers.get("if-none-match")
+    if match and etag in [t.strip() for t in match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+@app.get("/events")
+def events(
+    request: Request,
+    run_id: str | None = None,
+    cursor: int | None = None,
+    after_frame: int | None = None,
+    limit: int = 100,
+) -> Response:
+    """Incremental events: a page after ``cursor`` (byte offset) or ``after_frame``.
+
+    Without either, the last ``limit`` events. Pass the returned ``cursor``
+    back to get only newer events; ``If-None-Match`` with the last ``ETag``
+    answers 304 while nothing was appended.
+    """
+    bad = _bad_run_id(run_id)
+    if bad is not None:
+        return bad
+    rid = run_id or registry.last_run_id()
+    if not rid:
+        return JSONResponse({"run_id": None, "events": [], "cursor": 0})
+    limit = max(1, min(int(limit), 1000))
+    registry.flush(rid)  # queued events must count toward the validator
+    etag = _events_etag(rid, cursor, after_frame, limit)
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
+    lines, next_cursor = registry.read_events(rid, cursor=cursor, after_frame=after_frame, limit=limit)
+    parsed = []
+    for line in lines:
+        try:
+            parsed.append(json.loads(line))
+        except Exception:
+            continue
+    return JSONResponse({"run_id": rid, "events": parsed, "cursor": next_cursor}, headers={"ETag": etag})
+
+
 @app.get("/events_snapshot")
-def events_snapshot(limit: int = 50) -> JSONResponse:
+def events_snapshot(request: Request, limit: int = 50) -> Response:
     run_id = registry.last_run_id()
     if not run_id:
         return JSONResponse({"run_id": None, "fps": [], "latency_pre": [], "latency_model": [], "latency_post": [], "frame_ids": []})
-    path = Path("runs") / run_id / "events.jsonl"
-    fps: list[float] = []
-    lpre: list[float] = []
-    lmod: list[float] = []
-    lpost: list[float] = []
-    fids: list[int] = []
-    if path.exists():
-        lines = path.read_text(encoding="utf-8").splitlines()
-        for line in lines[-limit:]:
-            try:
-                obj = json.loads(line)
-                fids.append(int(obj.get("frame_id", 0)))
-                fps.append(float(obj.get("fps", 0.0)))
-                t = obj.get("timings", {})
-                lpre.append(float(t.get("pre", 0.0)))
-                lmod.append(float(t.get("model", 0.0)))
-                lpost.append(float(t.get("post", 0.0)))
-            except Exception:
-                continue
-    return JSONResponse({"run_id": run_id, "fps": fps, "latency_pre": lpre, "latency_model": lmod, "latency_post": lpost, "frame_ids": fids})
+    registry.flush(run_id)
+    etag = _events_etag(run_id, "snapshot", limit)
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
+    # Numeric columns straight from the run's telemetry store; no JSON parsing
+    cols = registry.telemetry(run_id).columns(["frame_id", "fps", "pre_ms", "model_ms", "post_ms"])
+    tail = {name: arr[len(arr) - min(len(arr), max(0, limit)):] for name, arr in cols.items()}
+    fids = tail["frame_id"].tolist()
+    fps = np.round(tail["fps"].astype(np.float64), 4).tolist()
+    lpre = np.round(tail["pre_ms"].astype(np.float64), 2).tolist()
+    lmod = np.round(tail["model_ms"].astype(np.float64), 2).tolist()
+    lpost = np.round(tail["post_ms"].astype(np.float64), 2).tolist()
+    return JSONResponse(
+        {"run_id": run_id, "fps": fps, "latency_pre": lpre, "latency_model": lmod, "latency_post": lpost, "frame_ids": fids},
+        headers={"ETag": etag},
+    )
+
+
+@app.get("/runs")
+def list_runs(
+    profile: str | None = None,
+    scenario: str | None = None,
+    since: float | None = None,
+    until: float | None = None,
+    limit: int = 50,
+) -> JSONResponse:
+    """Runs from the run index, newest first; ``since``/``until`` are unix seconds on creation time."""
+    runs = registry.index.query(profile=profile, scenario=scenario, since=since, until=until, limit=min(int(limit), 1000))
+    return JSONResponse({"latest": registry.last_run_id(), "runs": runs})
+
+
+@app.get("/runs/{run_id}/stats")
+def run_stats(run_id: str) -> JSONResponse:
+    """Mean/min/max and p50/p95/p99 of fps and stage latencies, maintained as events are written."""
+    bad = _bad_run_id(run_id)
+    if bad is not None:
+        return bad
+    if not EventLog(Path("runs") / run_id).exists():
+        return JSONResponse({"error": f"unknown run: {run_id}"}, status_code=404)
+    return JSONResponse({"run_id": run_id, **registry.run_stats(run_id)})
+
+
+@app.post("/runs/{run_id}/live_eval")
+def attach_live_eval(run_id: str, req: LiveEvalRequest) -> JSONResponse:
+    """Score the run's detections against a COCO file as frames arrive (earlier frames included)."""
+    bad = _bad_run_id(run_id)
+    if bad is not None:
+        return bad
+    if not Path(req.dataset).exists():
+        return JSONResponse({"error": f"dataset not found: {req.dataset}"}, status_code=404)
+    try:
+        return JSONResponse(live_evals.attach(run_id, req.dataset, req.frame_key))
+    except (ValueError, KeyError) as e:
+        return JSONResponse({"error": f"invalid dataset: {e}"}, status_code=422)
+
+
+@app.get("/runs/{run_id}/live_eval")
+def live_eval(run_id: str) -> JSONResponse:
+    """Running mAP/recall, per-class AP and confusion matrix over the frames logged so far."""
+    bad = _bad_run_id(run_id)
+    if bad is not None:
+        return bad
+    summary = live_evals.summary(run_id)
+    if summary is None:
+        return JSONResponse({"error": f"no ground truth attached to run: {run_id}"}, status_code=404)
+    return JSONResponse(summary)
+
+
+@app.delete("/runs/{run_id}/live_eval")
+def detach_live_eval(run_id: str) -> Response:
+    bad = _bad_run_id(run_id)
+    if bad is not None:
+        return bad
+    return JSONResponse({"ok": live_evals.detach(run_id)})
 
 
 @app.get("/load_metrics")
 def load_metrics(run_id: str | None = None) -> JSONResponse:
+    bad = _bad_run_id(run_id)
+    if bad is not None:
+        return bad
     rid = run_id or registry.last_run_id()
     if not rid:
         return JSONResponse({"run_id": None, "metrics": None})
@@ -429,6 +931,9 @@ def load_metrics(run_id: str | None = None) -> JSONResponse:
 
 @app.post("/export_run")
 def export_run(payload: dict) -> dict:
+    bad = _bad_run_id(payload.get("run_id"))
+    if bad is not None:
+        return bad
     rid = payload.get("run_id") or registry.last_run_id()
     if not rid:
         return {"zip_path": None, "error": "no run id"}
@@ -438,6 +943,7 @@ def export_run(payload: dict) -> dict:
     import shutil
     zip_base = Path("runs") / f"{rid}_bundle"
     zip_file = shutil.make_archive(str(zip_base), "zip", str(run_dir))
+    registry.add_artifact(rid, "bundle", zip_file)
     return {"zip_path": zip_file, "run_id": rid}
 
 
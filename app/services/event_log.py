@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import zstandard  # type: ignore
+except Exception:  # pragma: no cover - optional at runtime
+    zstandard = None  # type: ignore
+
+CODECS = ("none", "gzip", "zstd")
+_SUFFIX = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+@dataclass
+class SegmentSettings:
+    segment_mb: float = 64.0  # rotate the active events.jsonl past this size (0 = never)
+    segment_max_age_s: float = 0.0  # ... or once it has been written to this long (0 = never)
+    compression: str = "gzip"  # codec for closed segments: none | gzip | zstd
+
+    @property
+    def rotates(self) -> bool:
+        return self.segment_mb > 0 or self.segment_max_age_s > 0
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any] | None) -> "SegmentSettings":
+        cfg = cfg or {}
+        codec = str(cfg.get("compression", cls.compression)).lower()
+        if codec not in CODECS:
+            raise ValueError(f"events.compression must be one of {CODECS}, got {codec!r}")
+        if codec == "zstd" and zstandard is None:
+            codec = "gzip"
+        return cls(
+            segment_mb=float(cfg.get("segment_mb", cls.segment_mb)),
+            segment_max_age_s=float(cfg.get("segment_max_age_s", cls.segment_max_age_s)),
+            compression=codec,
+        )
+
+
+def _skip(f, n: int, block: int = 1 << 20) -> None:
+    while n > 0:
+        chunk = f.read(min(block, n))
+        if not chunk:
+            return
+        n -= len(chunk)
+
+
+class EventLog:
+    """A run's event log as closed segments plus the active ``events.jsonl``.
+
+    Closed segments live in ``segments/`` (``000001.jsonl``, later
+    ``000001.jsonl.gz`` or ``.zst`` once compressed) and are listed in
+    ``segments.json`` with their ``[start, end)`` range in the logical log:
+    the concatenation of every segment followed by the active file. Offsets
+    (index rows, ``/events`` cursors) are logical, so they stay valid across
+    rotation and compression. Runs that never rotated have no manifest and
+    the active file starts at offset 0.
+
+    Rotation and compression swap files; callers serialize them with reads
+    of the same run (the registry does this under its lock).
+    """
+
+    MANIFEST = "segments.json"
+
+    def __init__(self, run_dir: Path) -> None:
+        self.dir = Path(run_dir)
+        self.active = self.dir / "events.jsonl"
+        self.seg_dir = self.dir / "segments"
+        self.manifest = self.dir / self.MANIFEST
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """Closed segments in log order: ``{"name", "start", "end", "codec", "closed_at"}``."""
+        try:
+            return list(json.loads(self.manifest.read_text(encoding="utf-8")).get("segments", []))
+        except (OSError, ValueError):
+            return []
+
+    def base(self, segments: Optional[List[Dict[str, Any]]] = None) -> int:
+        """Logical offset of the first byte of the active file."""
+        segs = self.segments() if segments is None else segments
+        return int(segs[-1]["end"]) if segs else 0
+
+    def end(self) -> int:
+        """Logical size of the whole log."""
+        try:
+            size = self.active.stat().st_size
+        except OSError:
+            size = 0
+        return self.base() + size
+
+    def exists(self) -> bool:
+        return self.active.exists() or self.manifest.exists()
+
+    def read(self, lo: int, hi: int) -> bytes:
+        """Bytes ``[lo, hi)`` of the logical log, across segment boundaries."""
+        if hi <= lo:
+            return b""
+        segs = self.segments()
+        parts: List[bytes] = []
+        for seg in segs:
+            s, e = int(seg["start"]), int(seg["end"])
+            if e <= lo or s >= hi:
+                continue
+            a, b = max(lo, s), min(hi, e)
+            parts.append(self._read_segment(seg, a - s, b - a))
+        base = self.base(segs)
+        if hi > base:
+            try:
+                with self.active.open("rb") as f:
+                    f.seek(max(lo, base) - base)
+                    parts.append(f.read(hi - max(lo, base)))
+            except OSError:
+                pass
+        return b"".join(parts)
+
+    def _read_segment(self, seg: Dict[str, Any], offset: int, n: int) -> bytes:
+        path = self.seg_dir / seg["name"]
+        codec = seg.get("codec", "none")
+        if codec == "none":
+            with path.open("rb") as f:
+                f.seek(offset)
+                return f.read(n)
+        if codec == "gzip":
+            with gzip.open(path, "rb") as f:
+                _skip(f, offset)
+                return f.read(n)
+        if zstandard is None:  # pragma: no cover - optional at runtime
+            raise RuntimeError(f"segment {path} is zstd-compressed but zstandard is not installed")
+        with path.open("rb") as raw, zstandard.ZstdDecompressor().stream_reader(raw) as f:
+            _skip(f, offset)
+            return f.read(n)
+
+    def _write_manifest(self, segments: List[Dict[str, Any]]) -> None:
+        tmp = self.manifest.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({"segments": segments}), encoding="utf-8")
+        os.replace(tmp, self.manifest)
+
+    def rotate(self) -> Optional[Dict[str, Any]]:
+        """Close the active file as the next segment and start an empty one; None if it is empty.
+
+        The active file must have no open append handles.
+        """
+        try:
+            size = self.active.stat().st_size
+        except OSError:
+            return None
+        if size == 0:
+            return None
+        segs = self.segments()
+        base = self.base(segs)
+        seq = int(segs[-1]["name"].split(".", 1)[0]) + 1 if segs else 1
+        seg = {"name": f"{seq:06d}.jsonl", "start": base, "end": base + size, "codec": "none", "closed_at": time.time()}
+        self.seg_dir.mkdir(parents=True, exist_ok=True)
+        os.replace(self.active, self.seg_dir / seg["name"])
+        self._write_manifest(segs + [seg])
+        self.active.touch()
+        return seg
+
+    def uncompressed(self) -> List[Dict[str, Any]]:
+        return [seg for seg in self.segments() if seg.get("codec", "none") == "none"]
+
+    def compress_segment(self, seg: Dict[str, Any], codec: str = "gzip") -> Path:
+        """Write a compressed copy of a closed segment next to it; ``commit_compressed`` swaps it in."""
+        src = self.seg_dir / seg["name"]
+        tmp = self.seg_dir / f"{seg['name']}{_SUFFIX[codec]}.tmp"
+        with src.open("rb") as fin, tmp.open("wb") as raw:
+            if codec == "zstd" and zstandard is not None:
+                zstandard.ZstdCompressor(level=3).copy_stream(fin, raw)
+            else:
+                with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as fout:
+                    while True:
+                        chunk = fin.read(1 << 20)
+                        if not chunk:
+                            break
+                        fout.write(chunk)
+            raw.flush()
+            os.fsync(raw.fileno())
+        return tmp
+
+    def commit_compressed(self, seg: Dict[str, Any], tmp: Path) -> int:
+        """Point the manifest at the compressed copy and delete the original; bytes saved."""
+        codec = "zstd" if tmp.name.endswith(".zst.tmp") else "gzip"
+        name = tmp.name[: -len(".tmp")]
+        segs = self.segments()
+        for cur in segs:
+            if cur["name"] == seg["name"]:
+                break
+        else:
+            tmp.unlink(missing_ok=True)  # segment went away meanwhile
+            return 0
+        src = self.seg_dir / seg["name"]
+        before = src.stat().st_size
+        os.replace(tmp, self.seg_dir / name)
+        cur.update(name=name, codec=codec)
+        self._write_manifest(segs)
+        src.unlink(missing_ok=True)
+        return before - (self.seg_dir / name).stat().st_size
+
+    def disk_bytes(self) -> int:
+        total = 0
+        for path in [self.active, *(self.seg_dir / s["name"] for s in self.segments())]:
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+        return total
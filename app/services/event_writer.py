@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+DURABILITY = ("none", "flush", "fsync")
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class WriterSettings:
+    enabled: bool = True
+    durability: str = "flush"  # flush | fsync per batch; none is accepted and means flush
+    max_batch_events: int = 256
+    max_batch_kb: float = 1024.0
+    flush_interval_ms: float = 250.0
+    max_pending_events: int = 10000  # producers wait beyond this (writer fell behind)
+    max_open_files: int = 32
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any] | None) -> "WriterSettings":
+        cfg = cfg or {}
+        durability = str(cfg.get("durability", cls.durability)).lower()
+        if durability not in DURABILITY:
+            raise ValueError(f"events.durability must be one of {DURABILITY}, got {durability!r}")
+        return cls(
+            enabled=bool(cfg.get("writer", cls.enabled)),
+            durability=durability,
+            max_batch_events=int(cfg.get("max_batch_events", cls.max_batch_events)),
+            max_batch_kb=float(cfg.get("max_batch_kb", cls.max_batch_kb)),
+            flush_interval_ms=float(cfg.get("flush_interval_ms", cls.flush_interval_ms)),
+            max_pending_events=int(cfg.get("max_pending_events", cls.max_pending_events)),
+            max_open_files=int(cfg.get("max_open_files", cls.max_open_files)),
+        )
+
+
+# Called once a batch has reached the OS: (run_id, start offset, bytes, size after, last line).
+# Returns True when the file should be rotated (closed and handed to ``RotateFn``).
+CommitFn = Callable[[str, int, bytes, int, str], Optional[bool]]
+RotateFn = Callable[[str], None]
+
+
+class _RunFile:
+    """Append handle for one run's events.jsonl plus the bytes not yet handed to the OS."""
+
+    def __init__(self, path: Path) -> None:
+        self.f = path.open("ab")
+        self.start = self.f.tell()
+        self.chunks: List[bytes] = []
+        self.last = ""
+        self.rotate = False
+
+    def write(self, data: bytes, last: str) -> None:
+        if not self.chunks:
+            self.start = self.f.tell()
+        self.f.write(data)
+        self.chunks.append(data)
+        self.last = last
+
+    def commit(self, run_id: str, fsync: bool, on_commit: CommitFn) -> bool:
+        if not self.chunks:
+            return False
+        self.f.flush()
+        if fsync:
+            os.fsync(self.f.fileno())
+        data = b"".join(self.chunks)
+        self.chunks = []
+        self.rotate = bool(on_commit(run_id, self.start, data, self.f.tell(), self.last))
+        return True
+
+
+class EventWriter:
+    """Background, batched appends to ``runs/<id>/events.jsonl``.
+
+    ``submit`` only queues the line in memory. A writer thread writes a
+    run's pending lines as one batch once ``max_batch_events`` or
+    ``max_batch_kb`` is reached, or after ``flush_interval_ms``. Every batch
+    is handed to the OS and passed to the commit hook, so indexes, telemetry
+    and stats follow the log; durability only decides whether the batch is
+    also fsynced (``fsync``) or not (``flush``, and ``none`` which means the
+    same). ``flush`` and ``close`` write everything pending. A batch the
+    thread fails on is logged and counted (``errors``, plus ``dropped`` if
+    it never reached the file) and the thread carries on; lines already in
+    the file stay there, and the commit hook catches up on the next batch.
+    """
+
+    def __init__(
+        self,
+        base: Path,
+        on_commit: CommitFn,
+        settings: WriterSettings | None = None,
+        on_rotate: RotateFn | None = None,
+    ) -> None:
+        self.base = Path(base)
+        self.settings = settings or WriterSettings()
+        self._on_commit = on_commit
+        self._on_rotate = on_rotate
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()  # orders batch writes; held while draining
+        self._pending: Dict[str, List[str]] = {}
+        self._pending_bytes: Dict[str, int] = {}
+        self._since: Dict[str, float] = {}
+        self._queued = 0
+        self._files: "OrderedDict[str, _RunFile]" = OrderedDict()
+        self._deleting: Set[str] = set()  # runs whose lines are dropped while their files are removed
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.events = 0
+        self.batches = 0
+        self.bytes = 0
+        self.commits = 0
+        self.waits = 0
+        self.errors = 0  # batches the writer thread failed on
+        self.dropped = 0  # events lost because their batch never reached the file
+
+    def submit(self, run_id: str, lines: List[str]) -> None:
+        lines = [ln.strip() for ln in lines if ln.strip()]
+        if not lines:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("event writer is closed")
+            if run_id in self._deleting:
+                return
+            self._start_locked()
+            while self._queued >= self.settings.max_pending_events:
+                self.waits += 1
+                self._cond.notify_all()
+                self._cond.wait(0.1)
+            buf = self._pending.setdefault(run_id, [])
+            if not buf:
+                self._since[run_id] = time.monotonic()
+            buf.extend(lines)
+            self._pending_bytes[run_id] = self._pending_bytes.get(run_id, 0) + sum(len(ln) + 1 for ln in lines)
+            self._queued += len(lines)
+            if self._due_locked(run_id, time.monotonic()):
+                self._cond.notify_all()
+
+    def pending(self, run_id: str) -> Optional[str]:
+        """Newest submitted line for ``run_id`` that has not been written yet."""
+        with self._cond:
+            buf = self._pending.get(run_id)
+            return buf[-1] if buf else None
+
+    def flush(self, run_id: Optional[str] = None) -> None:
+        """Write everything pending (for one run or all) and hand it to the OS."""
+        with self._cond:
+            runs = [run_id] if run_id is not None else list(set(self._pending) | set(self._files))
+        for rid in runs:
+            self._drain(rid)
+
+    def close_run(self, run_id: str) -> None:
+        self._drain(run_id)
+        with self._io_lock:
+            rf = self._files.pop(run_id, None)
+            if rf is not None:
+                rf.f.close()
+
+    @contextmanager
+    def deleting(self, run_id: str) -> Iterator[None]:
+        """Drop the run's queued lines, close its file, and drop lines submitted for it until the block exits."""
+        with self._cond:
+            self._deleting.add(run_id)
+            lines = self._pending.pop(run_id, None)
+            self._pending_bytes.pop(run_id, None)
+            self._since.pop(run_id, None)
+            if lines:
+                self._queued -= len(lines)
+                self._cond.notify_all()
+        try:
+            # Waits out a batch of the run already being written
+            with self._io_lock:
+                rf = self._files.pop(run_id, None)
+                if rf is not None:
+                    rf.f.close()
+            yield
+        finally:
+            with self._cond:
+                self._deleting.discard(run_id)
+
+    def rotate(self, run_id: str) -> None:
+        """Write what is pending, close the run's file and rotate it while no batch can land."""
+        with self._io_lock:
+            self._drain_locked(run_id)
+            rf = self._files.pop(run_id, None)
+            if rf is not None:
+                rf.f.close()
+            self._rotate(run_id)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=10.0)
+        self.flush()
+        with self._io_lock:
+            for rf in self._files.values():
+                rf.f.close()
+            self._files.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "events": float(self.events),
+                "batches": float(self.batches),
+                "bytes": float(self.bytes),
+                "commits": float(self.commits),
+                "pending": float(self._queued),
+                "producer_waits": float(self.waits),
+                "errors": float(self.errors),
+                "dropped": float(self.dropped),
+                "open_files": float(len(self._files)),
+            }
+
+    def _start_locked(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="event-writer", daemon=True)
+            self._thread.start()
+
+    def _due_locked(self, run_id: str, now: float) -> bool:
+        s = self.settings
+        return (
+            len(self._pending.get(run_id, ())) >= s.max_batch_events
+            or self._pending_bytes.get(run_id, 0) >= s.max_batch_kb * 1024
+            or now - self._since.get(run_id, now) >= s.flush_interval_ms / 1000.0
+        )
+
+    def _loop(self) -> None:
+        interval = max(0.001, self.settings.flush_interval_ms / 1000.0)
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                due = [rid for rid in self._pending if self._due_locked(rid, now)]
+                if not due:
+                    oldest = min(self._since.values(), default=None)
+                    self._cond.wait(interval if oldest is None else max(0.0, oldest + interval - now))
+                    continue
+            for rid in due:
+                # The thread must outlive any one batch: producers block on it past max_pending_events
+                try:
+                    self._drain(rid)
+                except Exception:
+                    log.exception("event writer: batch for run %s failed", rid)
+                    with self._cond:
+                        self.errors += 1
+
+    def _drain(self, run_id: str) -> None:
+        with self._io_lock:
+            self._drain_locked(run_id)
+
+    def _drain_locked(self, run_id: str) -> None:
+        with self._cond:
+            lines = self._pending.pop(run_id, None)
+            self._pending_bytes.pop(run_id, None)
+            self._since.pop(run_id, None)
+            if lines:
+                self._queued -= len(lines)
+                self._cond.notify_all()
+        rf = self._files.get(run_id)
+        if rf is not None:
+            self._files.move_to_end(run_id)
+        if lines:
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            try:
+                if rf is None:
+                    rf = self._open(run_id)
+                rf.write(data, lines[-1])
+            except Exception:
+                # Already taken off the queue, so these events are lost
+                with self._cond:
+                    self.dropped += len(lines)
+                raise
+            self.events += len(lines)
+            self.batches += 1
+            self.bytes += len(data)
+        if rf is not None and rf.commit(run_id, self.settings.durability == "fsync", self._on_commit):
+            self.commits += 1
+            if rf.rotate:
+                rf.f.close()
+                self._files.pop(run_id, None)
+                self._rotate(run_id)
+
+    def _rotate(self, run_id: str) -> None:
+        if self._on_rotate is not None:
+            self._on_rotate(run_id)
+
+    def _open(self, run_id: str) -> _RunFile:
+        while len(self._files) >= max(1, self.settings.max_open_files):
+            old_id, old = self._files.popitem(last=False)
+            old.commit(old_id, self.settings.durability == "fsync", self._on_commit)
+            old.f.close()
+            if old.rotate:
+                self._rotate(old_id)
+        path = self.base / run_id / "events.jsonl"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rf = self._files[run_id] = _RunFile(path)
+        return rf
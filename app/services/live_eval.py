@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.utils.coco import load_coco
+from app.utils.coco_eval import StreamingDetectionEval
+
+from .storage import RunRegistry
+
+
+@dataclass
+class LiveEvalSettings:
+    max_runs: int = 16  # runs evaluated at once; attaching another drops the least recently read
+    score_bins: int = 500  # score resolution of the running PR curves
+    page: int = 1000  # events read per step when catching up
+    max_dets: int = 100
+    conf_thresh: float = 0.25
+    cm_iou: float = 0.5
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any] | None) -> "LiveEvalSettings":
+        """Read from the ``evaluation`` config block (``live_*`` keys plus the shared matching options)."""
+        cfg = cfg or {}
+        return cls(
+            max_runs=int(cfg.get("live_max_runs", cls.max_runs)),
+            score_bins=int(cfg.get("live_score_bins", cls.score_bins)),
+            page=int(cfg.get("live_page", cls.page)),
+            max_dets=int(cfg.get("max_dets", cls.max_dets)),
+            conf_thresh=float(cfg.get("conf_thresh", cls.conf_thresh)),
+            cm_iou=float(cfg.get("cm_iou", cls.cm_iou)),
+        )
+
+
+class _Live:
+    __slots__ = ("evaluator", "dataset", "frame_key", "cursor", "lock")
+
+    def __init__(self, evaluator: StreamingDetectionEval, dataset: str, frame_key: str) -> None:
+        self.evaluator = evaluator
+        self.dataset = dataset
+        self.frame_key = frame_key
+        self.cursor = 0
+        self.lock = threading.Lock()
+
+
+class LiveEvals:
+    """Running detection mAP of runs against ground truth attached to them.
+
+    Each attached run has a :class:`StreamingDetectionEval` and a cursor into
+    its event log. Reads (the endpoint, a ``/metrics`` scrape) first feed it
+    the events written since the last read, so work per read is proportional
+    to new frames and the run is never rescanned. Frames logged before
+    attaching are picked up on the first read.
+    """
+
+    def __init__(self, registry: RunRegistry, settings: LiveEvalSettings | None = None) -> None:
+        self.registry = registry
+        self.settings = settings or LiveEvalSettings()
+        self._runs: "OrderedDict[str, _Live]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def attach(self, run_id: str, dataset: str, frame_key: str = "index") -> Dict[str, Any]:
+        """Start (or restart) evaluating ``run_id`` against a COCO file; returns the first summary."""
+        s = self.settings
+        evaluator = StreamingDetectionEval(
+            load_coco(dataset),
+            frame_key=frame_key,
+            max_dets=s.max_dets,
+            score_bins=s.score_bins,
+            conf_thresh=s.conf_thresh,
+            cm_iou=s.cm_iou,
+        )
+        with self._lock:
+            self._runs[run_id] = _Live(evaluator, dataset, frame_key)
+            self._runs.move_to_end(run_id)
+            while len(self._runs) > max(1, s.max_runs):
+                self._runs.popitem(last=False)
+                self.evicted += 1
+        return self.summary(run_id) or {}
+
+    def detach(self, run_id: str) -> bool:
+        with self._lock:
+            return self._runs.pop(run_id, None) is not None
+
+    def runs(self) -> List[str]:
+        with self._lock:
+            return list(self._runs)
+
+    def summary(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Catch up on new events and return the running metrics; None if nothing is attached."""
+        with self._lock:
+            live = self._runs.get(run_id)
+            if live is None:
+                return None
+            self._runs.move_to_end(run_id)
+        with live.lock:
+            self._catch_up(run_id, live)
+            out = live.evaluator.summary()
+            cursor = live.cursor
+        return {"run_id": run_id, "dataset": live.dataset, "frame_key": live.frame_key, "cursor": cursor, **out}
+
+    def _catch_up(self, run_id: str, live: _Live) -> None:
+        while True:
+            lines, cursor = self.registry.read_events(run_id, cursor=live.cursor, limit=self.settings.page)
+            if not lines:
+                return
+            for line in lines:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(event, dict) and event.get("frame_id") is not None:
+                    live.evaluator.add_frame(int(event["frame_id"]), event.get("boxes") or [])
+            live.cursor = cursor
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Headline numbers per attached run, for the ``live_eval`` gauge."""
+        out: Dict[str, Dict[str, float]] = {}
+        for run_id in self.runs():
+            summary = self.summary(run_id)
+            if summary is None:
+                continue
+            out[run_id] = {
+                key: float(summary[key] or 0.0) for key in ("map", "map50", "map75", "recall", "frames", "skipped", "predictions")
+            }
+        return out
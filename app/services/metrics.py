@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Dict
 
 from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, Gauge, generate_latest
 
@@ -12,6 +13,53 @@ class MetricsRegistry:
     latency_model_ms: Histogram
     latency_post_ms: Histogram
     fps: Gauge
+    provider_pool: Gauge
+    pipeline_stage: Gauge
+    inference_cache: Gauge
+    provider_singleflight: Gauge
+    event_writer: Gauge
+    run_retention: Gauge
+    live_eval: Gauge
+
+    def update_provider_pools(self, stats: Dict[str, Dict[str, float]], client: str = "sync") -> None:
+        """Copy transport pool stats (per host) into the labelled pool gauge."""
+        for host, values in stats.items():
+            for stat, val in values.items():
+                self.provider_pool.labels(client=client, host=host, stat=stat).set(val)
+
+    def update_pipeline(self, stats: Dict[str, Dict[str, float]]) -> None:
+        """Copy video pipeline stage stats (queue depth, occupancy) into gauges."""
+        for stage, values in stats.items():
+            for stat, val in values.items():
+                self.pipeline_stage.labels(stage=stage, stat=stat).set(val)
+
+    def update_inference_cache(self, stats: Dict[str, Dict[str, float]]) -> None:
+        """Copy inference cache counters (per tier) into gauges."""
+        for tier, values in stats.items():
+            for stat, val in values.items():
+                self.inference_cache.labels(tier=tier, stat=stat).set(val)
+
+    def update_singleflight(self, stats: Dict[str, float]) -> None:
+        """Copy request-coalescing counters (upstream calls vs coalesced) into gauges."""
+        for stat, val in stats.items():
+            self.provider_singleflight.labels(stat=stat).set(val)
+
+    def update_event_writer(self, stats: Dict[str, float]) -> None:
+        """Copy background event writer counters (batches, pending, waits) into gauges."""
+        for stat, val in stats.items():
+            self.event_writer.labels(stat=stat).set(val)
+
+    def update_retention(self, stats: Dict[str, float]) -> None:
+        """Copy run janitor counters (compactions, deletions, bytes reclaimed) into gauges."""
+        for stat, val in stats.items():
+            self.run_retention.labels(stat=stat).set(val)
+
+    def update_live_eval(self, stats: Dict[str, Dict[str, float]]) -> None:
+        """Replace the running detection metrics of runs with ground truth attached."""
+        self.live_eval.clear()  # drop detached runs
+        for run_id, values in stats.items():
+            for stat, val in values.items():
+                self.live_eval.labels(run_id=run_id, stat=stat).set(val)
 
     def export_prometheus_text(self) -> tuple[str, str]:
         return generate_latest(self.registry).decode("utf-8"), CONTENT_TYPE_LATEST
@@ -30,6 +78,50 @@ def get_metrics_registry() -> MetricsRegistry:
     latency_model_ms = Histogram("latency_model_ms", "Model latency", registry=reg, buckets=(1, 5, 10, 25, 50, 100, 250, 500))
     latency_post_ms = Histogram("latency_post_ms", "Post-processing latency", registry=reg, buckets=(1, 5, 10, 25, 50, 100, 250, 500))
     fps = Gauge("fps", "Frames per second", registry=reg)
+    provider_pool = Gauge(
+        "provider_pool",
+        "Provider HTTP pool stats (requests, connections, reuse_ratio, wait_ms_avg, wait_ms_max, in_flight, errors)",
+        ["client", "host", "stat"],
+        registry=reg,
+    )
+    pipeline_stage = Gauge(
+        "pipeline_stage",
+        "Video pipeline stage stats (queue_depth, queue_max, occupancy, processed)",
+        ["stage", "stat"],
+        registry=reg,
+    )
+    inference_cache = Gauge(
+        "inference_cache",
+        "Provider inference cache stats (hits, misses, evictions, entries, bytes, hit_ratio)",
+        ["tier", "stat"],
+        registry=reg,
+    )
+    provider_singleflight = Gauge(
+        "provider_singleflight",
+        "Identical in-flight provider calls: calls (sent upstream), coalesced (shared), in_flight",
+        ["stat"],
+        registry=reg,
+    )
+    event_writer = Gauge(
+        "event_writer",
+        "Batched events.jsonl writer: events, batches, bytes, commits, pending, producer_waits, errors, dropped, open_files",
+        ["stat"],
+        registry=reg,
+    )
+
+    run_retention = Gauge(
+        "run_retention",
+        "Run janitor: passes, compacted, segments_compressed, deleted, bytes_saved, bytes_freed, errors, last_pass_ms",
+        ["stat"],
+        registry=reg,
+    )
+
+    live_eval = Gauge(
+        "live_eval",
+        "Running detection quality per run vs attached ground truth: map, map50, map75, recall, frames, skipped, predictions",
+        ["run_id", "stat"],
+        registry=reg,
+    )
 
     _singleton = MetricsRegistry(
         registry=reg,
@@ -37,7 +129,12 @@ def get_metrics_registry() -> MetricsRegistry:
         latency_model_ms=latency_model_ms,
         latency_post_ms=latency_post_ms,
         fps=fps,
+        provider_pool=provider_pool,
+        pipeline_stage=pipeline_stage,
+        inference_cache=inference_cache,
+        provider_singleflight=provider_singleflight,
+        event_writer=event_writer,
+        run_retention=run_retention,
+        live_eval=live_eval,
     )
     return _singleton
-
-
@@ -6,6 +6,13 @@ import json
 import io
 import base64
 import matplotlib.pyplot as plt
+import numpy as np
+
+from .telemetry import TelemetryStore
+
+
+def _fmt(value) -> str:
+    return "n/a" if value is None else f"{float(value):.3f}"
 
 
 def build_pdf_report(run_dir: Path) -> Path:
@@ -21,13 +28,17 @@ def build_pdf_report(run_dir: Path) -> Path:
     images = sorted(run_dir.glob("annotated_*.jpg"))[:3]
     img_tags = "".join([f"<img src='{p.as_posix()}' style='max-width: 32%; margin-right: 4px;'/>" for p in images])
 
-    # Generate a simple latency histogram from events.jsonl if available
+    # Latency histogram from the run's columnar telemetry (events.jsonl for older runs)
     hist_data_uri = ""
-    events_path = run_dir / "events.jsonl"
-    if events_path.exists():
-        latencies = []
+    latencies = []
+    store = TelemetryStore(run_dir)
+    if len(store):
+        cols = store.columns(["pre_ms", "model_ms", "post_ms"])
+        total = cols["pre_ms"].astype(np.float64) + cols["model_ms"] + cols["post_ms"]
+        latencies = total[total > 0]
+    elif (run_dir / "events.jsonl").exists():
         try:
-            for line in events_path.read_text(encoding="utf-8").splitlines():
+            for line in (run_dir / "events.jsonl").read_text(encoding="utf-8").splitlines():
                 if not line.strip():
                     continue
                 obj = json.loads(line)
@@ -37,18 +48,36 @@ def build_pdf_report(run_dir: Path) -> Path:
                     latencies.append(total)
         except Exception:
             latencies = []
-        if latencies:
-            fig, ax = plt.subplots(figsize=(4, 2.5), dpi=150)
-            ax.hist(latencies, bins=10, color="#02ABC1")
-            ax.set_title("Latency (ms)")
-            ax.set_xlabel("ms")
-            ax.set_ylabel("count")
-            buf = io.BytesIO()
-            plt.tight_layout()
-            fig.savefig(buf, format="png")
-            plt.close(fig)
-            data = base64.b64encode(buf.getvalue()).decode("utf-8")
-            hist_data_uri = f"data:image/png;base64,{data}"
+    if len(latencies):
+        fig, ax = plt.subplots(figsize=(4, 2.5), dpi=150)
+        ax.hist(latencies, bins=10, color="#02ABC1")
+        ax.set_title("Latency (ms)")
+        ax.set_xlabel("ms")
+        ax.set_ylabel("count")
+        buf = io.BytesIO()
+        plt.tight_layout()
+        fig.savefig(buf, format="png")
+        plt.close(fig)
+        data = base64.b64encode(buf.getvalue()).decode("utf-8")
+        hist_data_uri = f"data:image/png;base64,{data}"
+
+    # Per-class AP and the confusion matrix (labels + background) from the COCO evaluator
+    per_class_rows = "".join(
+        f"<tr><td>{name}</td><td>{_fmt(v.get('ap'))}</td><td>{_fmt(v.get('ap50'))}</td><td>{_fmt(v.get('recall'))}</td><td>{v.get('gt', '')}</td></tr>"
+        for name, v in ((metrics_json.get("per_class") or {}).get("det") or {}).items()
+    )
+    cm = metrics_json.get("cm")
+    if isinstance(cm, dict) and cm.get("labels"):
+        head = "".join(f"<th>{lbl}</th>" for lbl in cm["labels"])
+        body = "".join(
+            f"<tr><th>{lbl}</th>" + "".join(f"<td>{n}</td>" for n in row) + "</tr>"
+            for lbl, row in zip(cm["labels"], cm.get("matrix", []))
+        )
+        cm_html = f"<table><tr><th>gt / pred</th>{head}</tr>{body}</table>"
+    elif cm is not None:
+        cm_html = "<pre>" + json.dumps(cm, indent=2) + "</pre>"
+    else:
+        cm_html = "<p>Not available.</p>"
 
     # Include raw profile JSON if present (for auditability)
     profile_json_block = ""
@@ -85,8 +114,9 @@ def build_pdf_report(run_dir: Path) -> Path:
             for task in (metrics_json.get('metrics', {}) or {}).keys()
           ])}
         </table>
+        {f"<h3>Per-class AP</h3><table><tr><th>Class</th><th>AP</th><th>AP50</th><th>Recall</th><th>GT</th></tr>{per_class_rows}</table>" if per_class_rows else ""}
         <h3>Confusion Matrix (if available)</h3>
-        {"<pre>" + json.dumps(metrics_json.get('cm'), indent=2) + "</pre>" if metrics_json.get('cm') is not None else "<p>Not available.</p>"}
+        {cm_html}
         <h2>Annotated Frames</h2>
         <div class='row'>{img_tags}</div>
         <h2>Latency Histogram</h2>
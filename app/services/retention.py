@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .storage import RunRegistry
+
+
+@dataclass
+class RetentionSettings:
+    enabled: bool = True
+    interval_s: float = 300.0  # time between retention passes
+    compact_idle_s: float = 900.0  # rotate + compress event logs of runs idle this long (0 = never)
+    empty_ttl_s: float = 0.0  # delete runs without a single frame once idle this long (0 = never)
+    max_age_days: float = 0.0  # delete runs idle longer than this (0 = keep)
+    max_runs: int = 0  # keep only the most recently active runs (0 = no cap)
+    batch: int = 200  # runs handled per rule and pass, so a backlog is worked off gradually
+    keep: Tuple[str, ...] = ("latest",)  # run dirs never touched
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any] | None) -> "RetentionSettings":
+        cfg = cfg or {}
+        return cls(
+            enabled=bool(cfg.get("enabled", cls.enabled)),
+            interval_s=float(cfg.get("interval_s", cls.interval_s)),
+            compact_idle_s=float(cfg.get("compact_idle_s", cls.compact_idle_s)),
+            empty_ttl_s=float(cfg.get("empty_ttl_s", cls.empty_ttl_s)),
+            max_age_days=float(cfg.get("max_age_days", cls.max_age_days)),
+            max_runs=int(cfg.get("max_runs", cls.max_runs)),
+            batch=int(cfg.get("batch", cls.batch)),
+            keep=tuple(cfg.get("keep", cls.keep) or ()),
+        )
+
+
+class RunJanitor:
+    """Background retention for ``runs/``: compresses, compacts and deletes runs.
+
+    A daemon thread compresses segments as soon as runs rotate them (checked
+    every second) and, every ``interval_s``, makes one pass over the run
+    index: idle runs get their active log rotated and compressed, runs that
+    never logged a frame and runs past ``max_age_days`` or beyond
+    ``max_runs`` are deleted. Each rule handles at most ``batch`` runs per
+    pass. Candidates come from the index (ordered by ``last_active``), so a
+    pass never lists the runs directory. Request handlers only ever wait on
+    the registry lock for a file swap, never for compression or deletion.
+    """
+
+    def __init__(self, registry: RunRegistry, settings: RetentionSettings | None = None) -> None:
+        self.registry = registry
+        self.settings = settings or RetentionSettings()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._counts: Dict[str, float] = {
+            "passes": 0.0,
+            "compacted": 0.0,
+            "segments_compressed": 0.0,
+            "deleted": 0.0,
+            "bytes_saved": 0.0,
+            "bytes_freed": 0.0,
+            "errors": 0.0,
+            "last_pass_ms": 0.0,
+        }
+
+    def start(self) -> None:
+        if self._thread is None and self.settings.enabled:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="run-janitor", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            return dict(self._counts)
+
+    def _add(self, **counts: float) -> None:
+        with self._stats_lock:
+            for key, val in counts.items():
+                self._counts[key] += val
+
+    def _loop(self) -> None:
+        next_pass = time.monotonic() + self.settings.interval_s
+        while not self._stop.wait(min(1.0, max(0.05, self.settings.interval_s))):
+            self.compress_rotated()
+            if time.monotonic() >= next_pass:
+                self.run_once()
+                next_pass = time.monotonic() + self.settings.interval_s
+
+    def compress_rotated(self) -> None:
+        for run_id in self.registry.take_rotated():
+            try:
+                out = self.registry.compress_segments(run_id)
+                self._add(segments_compressed=out["segments"], bytes_saved=out["saved_bytes"])
+            except OSError:
+                self._add(errors=1)
+
+    def _empty(self, candidates: List[str]) -> List[str]:
+        """Candidates whose event log really is empty; stale index counts are corrected instead."""
+        out = []
+        for run_id in candidates:
+            frames = self.registry.frame_count(run_id)
+            if frames:
+                self.registry.index.set_frames(run_id, frames)
+            else:
+                out.append(run_id)
+        return out
+
+    def run_once(self, now: float | None = None) -> Dict[str, int]:
+        """One retention pass; returns how many runs each rule acted on."""
+        t0 = time.perf_counter()
+        s = self.settings
+        now = time.time() if now is None else now
+        index = self.registry.index
+        done = {"compacted": 0, "deleted": 0}
+        self.compress_rotated()
+
+        doomed: list[str] = []
+        try:
+            if s.empty_ttl_s > 0:
+                doomed += self._empty(index.idle(now - s.empty_ttl_s, s.batch, empty=True))
+            if s.max_age_days > 0:
+                doomed += index.idle(now - s.max_age_days * 86400.0, s.batch)
+            if s.max_runs > 0:
+                doomed += index.overflow(s.max_runs, s.batch)
+        except sqlite3.Error:
+            self._add(errors=1)
+        for run_id in dict.fromkeys(doomed):
+            if run_id in s.keep:
+                continue
+            try:
+                freed = self.registry.delete_run(run_id)
+            except (OSError, sqlite3.Error):
+                self._add(errors=1)
+                continue
+            done["deleted"] += 1
+            self._add(deleted=1, bytes_freed=freed)
+
+        if s.compact_idle_s > 0:
+            try:
+                idle = index.idle(now - s.compact_idle_s, s.batch, uncompacted=True)
+            except sqlite3.Error:
+                idle = []
+                self._add(errors=1)
+            for run_id in idle:
+                if run_id in s.keep or run_id in doomed:
+                    continue
+                try:
+                    out = self.registry.compact(run_id)
+                    index.mark_compacted(run_id)
+                except (OSError, sqlite3.Error):
+                    self._add(errors=1)
+                    continue
+                done["compacted"] += 1
+                self._add(compacted=1, segments_compressed=out["segments"], bytes_saved=out["saved_bytes"])
+
+        self._add(passes=1)
+        with self._stats_lock:
+            self._counts["last_pass_ms"] = (time.perf_counter() - t0) * 1000.0
+        return done
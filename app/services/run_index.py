@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    created_at  REAL NOT NULL,
+    last_active REAL NOT NULL,
+    profile     TEXT,
+    scenario    TEXT,
+    provenance  TEXT NOT NULL DEFAULT '{}',
+    frames      INTEGER NOT NULL DEFAULT 0,
+    artifacts   TEXT NOT NULL DEFAULT '{}',
+    stats       TEXT NOT NULL DEFAULT '{}',
+    compacted_at REAL
+);
+CREATE INDEX IF NOT EXISTS runs_last_active ON runs (last_active);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created_at);
+CREATE INDEX IF NOT EXISTS runs_profile ON runs (profile, created_at);
+CREATE INDEX IF NOT EXISTS runs_scenario ON runs (scenario, created_at);
+"""
+
+_JSON_FIELDS = ("provenance", "artifacts", "stats")
+
+# Columns added after the first release: (name, declaration)
+_MIGRATIONS = (("compacted_at", "REAL"),)
+
+
+def _count_events(path: Path) -> int:
+    """Non-blank lines of an events.jsonl (one per frame)."""
+    n = 0
+    try:
+        with path.open("rb") as f:
+            for line in f:
+                n += bool(line.strip())
+    except OSError:
+        pass
+    return n
+
+
+class RunIndex:
+    """SQLite catalogue of runs under ``runs/`` (``runs/index.sqlite``).
+
+    One row per run with its profile, scenario, provider provenance, frame
+    count, artifact paths and aggregate stats. WAL mode plus a busy timeout
+    make it safe to share between threads and uvicorn worker processes;
+    each thread uses its own connection. Run directories created before the
+    index existed are picked up once, when the database is first created.
+    """
+
+    def __init__(self, path: Path, busy_timeout_ms: int = 5000) -> None:
+        self.path = Path(path)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fresh = not self.path.exists()
+        self._conn().executescript(_SCHEMA)
+        self._migrate()
+        if fresh:
+            self._backfill(self.path.parent)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self) -> None:
+        conn = self._conn()
+        have = {r["name"] for r in conn.execute("PRAGMA table_info(runs)")}
+        for name, decl in _MIGRATIONS:
+            if name not in have:
+                try:
+                    conn.execute(f"ALTER TABLE runs ADD COLUMN {name} {decl}")
+                except sqlite3.OperationalError:
+                    pass  # added by another process meanwhile
+
+    def _backfill(self, base: Path) -> None:
+        rows = []
+        for events in base.glob("*/events.jsonl"):
+            mtime = events.stat().st_mtime
+            rows.append((events.parent.name, events.parent.stat().st_mtime, mtime, _count_events(events)))
+        if rows:
+            self._conn().executemany(
+                "INSERT OR IGNORE INTO runs (run_id, created_at, last_active, frames) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def create(self, run_id: str, profile: Optional[str] = None, scenario: Optional[str] = None) -> bool:
+        """Insert a new run; False if the id is already taken (by any process)."""
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT OR IGNORE INTO runs (run_id, created_at, last_active, profile, scenario) VALUES (?, ?, ?, ?, ?)",
+            (run_id, now, now, profile, scenario),
+        )
+        return cur.rowcount == 1
+
+    def touch(
+        self,
+        run_id: str,
+        profile: Optional[str] = None,
+        scenario: Optional[str] = None,
+        provenance: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Mark a run active, registering it if unknown; given fields overwrite stored ones."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR IGNORE INTO runs (run_id, created_at, last_active) VALUES (?, ?, ?)", (run_id, now, now))
+        conn.execute(
+            "UPDATE runs SET last_active = ?, profile = COALESCE(?, profile), scenario = COALESCE(?, scenario),"
+            " provenance = json_patch(provenance, ?) WHERE run_id = ?",
+            (now, profile, scenario, json.dumps(provenance or {}), run_id),
+        )
+
+    def record_frames(self, run_id: str, frames: int, stats: Optional[Dict[str, Any]] = None) -> None:
+        """Set the committed frame count (and the aggregate stats when given); marks the run active."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR IGNORE INTO runs (run_id, created_at, last_active) VALUES (?, ?, ?)", (run_id, now, now))
+        conn.execute(
+            "UPDATE runs SET frames = ?, last_active = ?, stats = COALESCE(?, stats) WHERE run_id = ?",
+            (int(frames), now, json.dumps(stats) if stats is not None else None, run_id),
+        )
+
+    def set_stats(self, run_id: str, stats: Dict[str, Any]) -> None:
+        self._conn().execute("UPDATE runs SET stats = ? WHERE run_id = ?", (json.dumps(stats), run_id))
+
+    def add_artifact(self, run_id: str, kind: str, path: str) -> None:
+        self._conn().execute(
+            "UPDATE runs SET artifacts = json_set(artifacts, ?, ?) WHERE run_id = ?", (f'$."{kind}"', str(path), run_id)
+        )
+
+    def latest(self) -> Optional[str]:
+        row = self._conn().execute("SELECT run_id FROM runs ORDER BY last_active DESC LIMIT 1").fetchone()
+        return row["run_id"] if row else None
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def query(
+        self,
+        profile: Optional[str] = None,
+        scenario: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """Runs created in ``[since, until)`` (unix seconds), newest first."""
+        where, args = [], []
+        for clause, value in (
+            ("profile = ?", profile),
+            ("scenario = ?", scenario),
+            ("created_at >= ?", since),
+            ("created_at < ?", until),
+        ):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        sql = "SELECT * FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        args.append(max(1, int(limit)))
+        return [self._row(r) for r in self._conn().execute(sql, args).fetchall()]
+
+    def idle(self, before: float, limit: int = 100, empty: bool = False, uncompacted: bool = False) -> List[str]:
+        """Ids of runs last active before ``before``, least recently active first.
+
+        ``empty`` keeps runs that never committed a frame; ``uncompacted``
+        keeps runs with activity since their last compaction.
+        """
+        sql = "SELECT run_id FROM runs WHERE last_active < ?"
+        if empty:
+            sql += " AND frames = 0"
+        if uncompacted:
+            sql += " AND (compacted_at IS NULL OR compacted_at < last_active)"
+        sql += " ORDER BY last_active LIMIT ?"
+        return [r["run_id"] for r in self._conn().execute(sql, (before, max(1, int(limit)))).fetchall()]
+
+    def overflow(self, keep: int, limit: int = 100) -> List[str]:
+        """Ids of runs beyond the ``keep`` most recently active ones, least recent first."""
+        rows = self._conn().execute(
+            "SELECT run_id FROM runs WHERE run_id NOT IN"
+            " (SELECT run_id FROM runs ORDER BY last_active DESC LIMIT ?) ORDER BY last_active LIMIT ?",
+            (max(0, int(keep)), max(1, int(limit))),
+        ).fetchall()
+        return [r["run_id"] for r in rows]
+
+    def set_frames(self, run_id: str, frames: int) -> None:
+        """Correct the frame count without marking the run active."""
+        self._conn().execute("UPDATE runs SET frames = ? WHERE run_id = ?", (int(frames), run_id))
+
+    def mark_compacted(self, run_id: str) -> None:
+        self._conn().execute("UPDATE runs SET compacted_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def delete(self, run_id: str) -> None:
+        self._conn().execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        out = dict(row)
+        for key in _JSON_FIELDS:
+            try:
+                out[key] = json.loads(out.get(key) or "{}")
+            except ValueError:
+                out[key] = {}
+        return out
@@ -1,22 +1,43 @@
 from __future__ import annotations
 
-from typing import List, Literal, Optional
+from typing import Annotated, List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import AfterValidator, BaseModel, Field
+
+from .storage import check_run_id
 
 
 ProfileName = Literal["realtime", "accuracy"]
+# Run ids name directories under runs/, so only safe names are accepted
+RunId = Annotated[str, AfterValidator(check_run_id)]
 
 
 class RunFrameRequest(BaseModel):
-    image_b64: str
+    # JSON ingress only; /run_frame also takes raw image/* bodies and multipart uploads
+    image_b64: Optional[str] = None
     profile: ProfileName = Field(default="realtime")
+    # Reuse an existing run so tracker state (IDs, trails) carries across frames
+    run_id: Optional[RunId] = None
+    # Frame number recorded in the event (ground-truth key for /runs/{run_id}/live_eval)
+    frame_id: Optional[int] = None
     # Optional override of provider/model for showcase flexibility
     provider_override: dict | None = None
     # Optional overlay/threshold options
     overlay_opts: dict | None = None  # {"class_include": [str], "mask_opacity": float, "conf_thresh": float, "nms_iou": float}
 
 
+class RunFramesRequest(BaseModel):
+    images_b64: List[str] = Field(default_factory=list)
+    profile: ProfileName = Field(default="realtime")
+    run_id: Optional[RunId] = None
+    provider_override: dict | None = None
+    overlay_opts: dict | None = None
+    # Render/store annotated overlays per frame (off for bulk scoring)
+    annotate: bool = False
+    # Frames with provider calls in flight at once (default: batch.concurrency)
+    concurrency: Optional[int] = None
+
+
 class RunVideoRequest(BaseModel):
     video_path: str
     profile: ProfileName = Field(default="realtime")
@@ -25,9 +46,18 @@ class RunVideoRequest(BaseModel):
 class EvaluateRequest(BaseModel):
     dataset: str
     tasks: List[Literal["det", "seg", "track", "ocr"]]
+    # COCO results file ([{image_id, category_id, bbox, score}]) scored against ``dataset``
+    predictions: Optional[str] = None
+
+
+class LiveEvalRequest(BaseModel):
+    # COCO ground truth for the run's frames
+    dataset: str
+    # Frame ids are positions in the dataset's ``images`` list ("index") or image ids ("id")
+    frame_key: Literal["index", "id"] = "index"
 
 
 class ReportRequest(BaseModel):
-    run_id: str
+    run_id: RunId
 
 
@@ -2,44 +2,507 @@ from __future__ import annotations
 
 import datetime as dt
 import os
+import re
+import secrets
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
 from pathlib import Path
 
+import numpy as np
+
+from .event_log import EventLog, SegmentSettings
+from .event_writer import EventWriter, WriterSettings
+from .run_index import RunIndex
+from .telemetry import RunStats, TelemetryStore, event_rows
+
+_FRAME_ID = re.compile(rb'"frame_id":\s*(-?\d+)')
+_INDEX_DTYPE = np.dtype([("start", "<i8"), ("end", "<i8"), ("frame_id", "<i8")])
+_RUN_ID = re.compile(r"[A-Za-z0-9_.-]{1,128}")
+
+
+def check_run_id(run_id: str) -> str:
+    """Return ``run_id`` if it is safe as a directory name under runs/; raise ValueError otherwise."""
+    if not isinstance(run_id, str) or not _RUN_ID.fullmatch(run_id) or run_id in (".", ".."):
+        raise ValueError(f"invalid run_id {run_id!r}: use 1-128 of A-Z a-z 0-9 _ . -")
+    return run_id
+
+
+def tail_line(path: str | os.PathLike, block: int = 8192) -> str | None:
+    """Last non-empty line of a text file, read backwards from the end.
+
+    Cost depends on the length of the last line, not the file.
+    """
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        buf = b""
+        pos = end
+        while pos > 0:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+            stripped = buf.rstrip()
+            if not stripped:
+                buf = b""
+                continue
+            nl = stripped.rfind(b"\n")
+            if nl >= 0:
+                return stripped[nl + 1:].strip().decode("utf-8", "replace") or None
+        stripped = buf.strip()
+        return stripped.decode("utf-8", "replace") if stripped else None
+
+
+def _index_rows(data: bytes, base: int) -> np.ndarray:
+    """Index rows for the complete, non-empty lines of ``data`` (found at file offset ``base``)."""
+    rows = []
+    pos = 0
+    while True:
+        nl = data.find(b"\n", pos)
+        if nl < 0:
+            break
+        line = data[pos:nl]
+        if line.strip():
+            m = _FRAME_ID.search(line)
+            rows.append((base + pos, base + nl + 1, int(m.group(1)) if m else -1))
+        pos = nl + 1
+    return np.array(rows, dtype=_INDEX_DTYPE)
+
+
+class EventIndex:
+    """Sidecar ``events.idx`` next to ``events.jsonl``.
+
+    One fixed-size ``(start, end, frame_id)`` int64 row per event line, so a
+    page of events is located with a binary search or a slice instead of a
+    scan of the log. Offsets are logical (see ``EventLog``), so the index
+    spans rotated segments too. The index is derived data: whatever it does
+    not cover yet (writes from another process, pre-index runs) is caught up
+    from the log on the next ``sync``, and it is rebuilt if it stops matching.
+    """
+
+    def __init__(self, events_path: Path) -> None:
+        self.events = Path(events_path)
+        self.log = EventLog(self.events.parent)
+        self.path = self.events.with_suffix(".idx")
+
+    def covered(self) -> int:
+        """Log offset up to which lines are indexed."""
+        try:
+            with self.path.open("rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size < _INDEX_DTYPE.itemsize or size % _INDEX_DTYPE.itemsize:
+                    return 0 if size == 0 else -1
+                f.seek(size - _INDEX_DTYPE.itemsize)
+                return int(np.frombuffer(f.read(_INDEX_DTYPE.itemsize), dtype=_INDEX_DTYPE)[0]["end"])
+        except OSError:
+            return 0
+
+    def append(self, rows: np.ndarray) -> None:
+        if rows.size:
+            with self.path.open("ab") as f:
+                f.write(rows.tobytes())
+
+    def sync(self) -> np.ndarray:
+        """Index rows covering every complete line of the log (memory-mapped)."""
+        if not self.log.exists():
+            return np.zeros(0, dtype=_INDEX_DTYPE)
+        size = self.log.end()
+        covered = self.covered()
+        if covered < 0 or covered > size:
+            # Torn index or a truncated/replaced log: rebuild from scratch
+            self.path.unlink(missing_ok=True)
+            covered = 0
+        if covered < size:
+            self.append(_index_rows(self.log.read(covered, size), covered))
+        return self.rows()
+
+    def rows(self) -> np.ndarray:
+        try:
+            if self.path.stat().st_size >= _INDEX_DTYPE.itemsize:
+                return np.memmap(self.path, dtype=_INDEX_DTYPE, mode="r")
+        except OSError:
+            pass
+        return np.zeros(0, dtype=_INDEX_DTYPE)
+
 
 class RunRegistry:
-    def __init__(self, base_dir: str | os.PathLike | None = None) -> None:
+    # Live runs whose last event and stats are kept in memory
+    _LIVE_RUNS_MAX = 64
+
+    def __init__(
+        self,
+        base_dir: str | os.PathLike | None = None,
+        writer: WriterSettings | None = None,
+        segments: SegmentSettings | None = None,
+    ) -> None:
         self.base = Path(base_dir or Path.cwd() / "runs")
         self.base.mkdir(parents=True, exist_ok=True)
-        self._last_run_id: str | None = None
+        # Shared by every process using this runs/ directory (latest run, queries, frame counts)
+        self.index = RunIndex(self.base / "index.sqlite")
+        # run_id -> (events.jsonl size after our write, last line written)
+        self._last_events: "OrderedDict[str, tuple[int, str]]" = OrderedDict()
+        # run_id -> streaming stats, folded forward as events are committed
+        self._stats: "OrderedDict[str, RunStats]" = OrderedDict()
+        # Guards the in-memory caches only; a run's files are guarded by its own lock (``_run_lock``)
+        self._lock = threading.Lock()
+        self._run_locks: dict[str, threading.RLock] = {}
+        self._run_locks_guard = threading.Lock()
+        # Runs being deleted; appends to them are dropped
+        self._deleting: set[str] = set()
+        # Size/age rotation of events.jsonl into segments; off unless configured
+        self.segments = segments or SegmentSettings(segment_mb=0, segment_max_age_s=0)
+        # run_id -> when its active segment got its first commit (monotonic)
+        self._opened: "OrderedDict[str, float]" = OrderedDict()
+        # Runs with freshly closed segments waiting for compression
+        self._rotated: set[str] = set()
+        # Optional background batching of appends; without it every append is written in place
+        self.writer: EventWriter | None = None
+        if writer is not None and writer.enabled:
+            self.writer = EventWriter(self.base, self._commit, writer, on_rotate=self._rotate_now)
+
+    def _run_lock(self, run_id: str) -> threading.RLock:
+        """Lock for one run's files (log, index, telemetry). Taken before ``_lock``, never while holding it."""
+        with self._run_locks_guard:
+            lock = self._run_locks.get(run_id)
+            if lock is None:
+                lock = self._run_locks[run_id] = threading.RLock()
+            return lock
 
     def new_run_id(self) -> str:
+        # Timestamp prefix keeps ids sortable; the suffix keeps same-second runs apart
         ts = dt.datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S")
-        return ts
+        return f"{ts}_{secrets.token_hex(3)}"
+
+    def ensure_run(
+        self,
+        run_id: str | None = None,
+        profile: str | None = None,
+        scenario: str | None = None,
+        provenance: dict | None = None,
+    ) -> str:
+        """Create (or reopen) a run and mark it as the latest active one.
 
-    def ensure_run(self, run_id: str | None = None) -> str:
-        rid = run_id or self.new_run_id()
+        Generated ids are claimed in the run index, so concurrent requests
+        and worker processes never share one.
+        """
+        if run_id:
+            rid = check_run_id(run_id)
+            self.index.touch(rid, profile=profile, scenario=scenario, provenance=provenance)
+        else:
+            rid = self.new_run_id()
+            while not self.index.create(rid, profile=profile, scenario=scenario):
+                rid = self.new_run_id()
+            if provenance:
+                self.index.touch(rid, provenance=provenance)
         (self.base / rid).mkdir(parents=True, exist_ok=True)
         (self.base / rid / "plots").mkdir(parents=True, exist_ok=True)
         (self.base / rid / "events.jsonl").touch(exist_ok=True)
-        self._last_run_id = rid
         return rid
 
     def last_run_id(self) -> str | None:
-        return self._last_run_id
+        return self.index.latest()
+
+    def add_artifact(self, run_id: str, kind: str, path: str | os.PathLike) -> None:
+        self.index.add_artifact(run_id, kind, str(path))
 
     def append_event(self, run_id: str, event_json: str) -> None:
+        self.append_events(run_id, [event_json])
+
+    def append_events(self, run_id: str, events_json: list[str]) -> None:
+        """Append many events with a single write (queued when the background writer is on)."""
+        if self.writer is not None:
+            self.writer.submit(run_id, events_json)
+            return
+        lines = [e.strip() for e in events_json if e.strip()]
+        if not lines:
+            return
         path = self.base / run_id / "events.jsonl"
-        with path.open("a", encoding="utf-8") as f:
-            f.write(event_json.rstrip("\n") + "\n")
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with self._run_lock(run_id):
+            with self._lock:
+                if run_id in self._deleting:
+                    return
+            with path.open("ab") as f:
+                start = f.tell()
+                f.write(data)
+                size = f.tell()
+            rotate = self._commit(run_id, start, data, size, lines[-1])
+        if rotate:
+            self._rotate_now(run_id)
+
+    def _commit(self, run_id: str, start: int, data: bytes, size: int, last: str) -> bool:
+        """Index lines that reached events.jsonl, add their telemetry rows, remember the newest one.
+
+        ``start`` and ``size`` are offsets in the active file. Returns True
+        when the active file is due for rotation.
+        """
+        path = self.base / run_id / "events.jsonl"
+        index = EventIndex(path)
+        telemetry = TelemetryStore(path.parent)
+        with self._run_lock(run_id):
+            start += index.log.base()
+            cols = None
+            # Index the new lines directly when the index is current, else catch up from the log
+            if index.covered() == start:
+                rows = _index_rows(data, start)
+                have = len(index.rows())
+                index.append(rows)
+                frames = have + len(rows)
+                if len(telemetry) == have:
+                    cols = event_rows(ln for ln in data.split(b"\n") if ln.strip())
+                    telemetry.append(cols)
+                else:
+                    telemetry.sync(path, index.rows())
+            else:
+                have = -1
+                frames = len(index.sync())
+                telemetry.sync(path, index.rows())
+            with self._lock:
+                # Runs started by this process get stats from their first frame
+                stats = self._stats.get(run_id) or (RunStats() if have == 0 else None)
+                if cols is not None and stats is not None and stats.rows == have:
+                    stats.update(cols)
+                    self._stats[run_id] = stats
+                else:
+                    self._stats.pop(run_id, None)
+                self._remember_last(run_id, size, last)
+                while len(self._stats) > self._LIVE_RUNS_MAX:
+                    self._stats.popitem(last=False)
+                stats = self._stats.get(run_id)
+                summary = stats.as_dict() if stats is not None else None
+                rotate = self._due_rotation(run_id, size)
+        self.index.record_frames(run_id, frames, summary)
+        return rotate
+
+    def _due_rotation(self, run_id: str, size: int) -> bool:
+        seg = self.segments
+        if not seg.rotates:
+            return False
+        now = time.monotonic()
+        opened = self._opened.setdefault(run_id, now)
+        self._opened.move_to_end(run_id)
+        while len(self._opened) > self._LIVE_RUNS_MAX:
+            self._opened.popitem(last=False)
+        if seg.segment_mb > 0 and size >= seg.segment_mb * 1024 * 1024:
+            return True
+        return seg.segment_max_age_s > 0 and now - opened >= seg.segment_max_age_s
+
+    def _rotate_now(self, run_id: str) -> None:
+        """Close the active events.jsonl as a segment (no append handle may be open on it)."""
+        with self._run_lock(run_id):
+            seg = EventLog(self.base / run_id).rotate()
+            with self._lock:
+                self._opened.pop(run_id, None)
+                if seg is None:
+                    return
+                self._rotated.add(run_id)
+                cached = self._last_events.get(run_id)
+                if cached is not None:
+                    self._remember_last(run_id, 0, cached[1])
+
+    def rotate(self, run_id: str) -> None:
+        """Close a run's active events.jsonl as a segment now (no-op when it is empty)."""
+        if self.writer is not None:
+            self.writer.rotate(run_id)
+        else:
+            self._rotate_now(run_id)
+
+    def take_rotated(self) -> list[str]:
+        """Runs that closed segments since the last call (for background compression)."""
+        with self._lock:
+            runs, self._rotated = sorted(self._rotated), set()
+        return runs
+
+    def compress_segments(self, run_id: str, codec: str | None = None) -> dict:
+        """Compress a run's closed segments; ``{"segments", "saved_bytes"}``.
+
+        Compression runs outside the run's lock; only the file swap holds
+        it, so reads and appends of the run carry on meanwhile.
+        """
+        codec = codec or self.segments.compression
+        log = EventLog(self.base / run_id)
+        n = saved = 0
+        if codec == "none":
+            return {"segments": 0, "saved_bytes": 0}
+        for seg in log.uncompressed():
+            tmp = log.compress_segment(seg, codec)
+            with self._run_lock(run_id):
+                saved += log.commit_compressed(seg, tmp)
+            n += 1
+        return {"segments": n, "saved_bytes": saved}
+
+    def compact(self, run_id: str, codec: str | None = None) -> dict:
+        """Rotate the active log and compress every closed segment of an (idle) run."""
+        self.rotate(run_id)
+        return self.compress_segments(run_id, codec)
+
+    def frame_count(self, run_id: str) -> int:
+        """Frames in a run's event log, counted from the log itself (segments included)."""
+        self.flush(run_id)
+        path = self.base / run_id / "events.jsonl"
+        with self._run_lock(run_id):
+            if not EventLog(path.parent).exists():
+                return 0
+            return len(EventIndex(path).sync())
+
+    def delete_run(self, run_id: str) -> int:
+        """Remove a run's directory, bundle and index row; returns the bytes freed.
+
+        Events appended to the run while it is being deleted are dropped, so
+        none can recreate its directory.
+        """
+        with self._lock:
+            self._deleting.add(run_id)
+        try:
+            with self.writer.deleting(run_id) if self.writer is not None else nullcontext():
+                return self._delete_files(run_id)
+        finally:
+            with self._lock:
+                self._deleting.discard(run_id)
+
+    def _delete_files(self, run_id: str) -> int:
+        row = self.index.get(run_id) or {}
+        run_dir = (self.base / run_id).resolve()
+        paths = [Path(p) for p in (row.get("artifacts") or {}).values()]
+        freed = 0
+        with self._run_lock(run_id):
+            with self._lock:
+                for cache in (self._last_events, self._stats, self._opened):
+                    cache.pop(run_id, None)
+                self._rotated.discard(run_id)
+            if run_dir.is_dir():
+                freed += sum(p.stat().st_size for p in run_dir.rglob("*") if p.is_file())
+                shutil.rmtree(run_dir, ignore_errors=True)
+            # Artifacts kept elsewhere under runs/ (e.g. export bundles)
+            for p in paths:
+                p = p.resolve()
+                if p.is_file() and self.base.resolve() in p.parents and run_dir not in p.parents:
+                    freed += p.stat().st_size
+                    p.unlink(missing_ok=True)
+            self.index.delete(run_id)
+        return freed
+
+    def telemetry(self, run_id: str) -> TelemetryStore:
+        """Columnar telemetry of a run, brought up to date with its event log."""
+        self.flush(run_id)
+        path = self.base / run_id / "events.jsonl"
+        store = TelemetryStore(path.parent)
+        with self._run_lock(run_id):
+            if EventLog(path.parent).exists():
+                store.sync(path, EventIndex(path).sync())
+        return store
+
+    def run_stats(self, run_id: str) -> dict:
+        """``{"frames", "stats"}`` of a run; built once from its telemetry, then updated per commit."""
+        store = self.telemetry(run_id)
+        with self._run_lock(run_id), self._lock:
+            stats = self._stats.get(run_id)
+            rebuilt = stats is None or stats.rows != len(store)
+            if rebuilt:
+                stats = RunStats.from_store(store)
+            self._stats[run_id] = stats
+            self._stats.move_to_end(run_id)
+            while len(self._stats) > self._LIVE_RUNS_MAX:
+                self._stats.popitem(last=False)
+            out = {"frames": stats.rows, "stats": stats.as_dict()}
+        if rebuilt:
+            self.index.set_stats(run_id, out["stats"])
+        return out
+
+    def flush(self, run_id: str | None = None) -> None:
+        """Make queued events of ``run_id`` (or all runs) visible in events.jsonl."""
+        if self.writer is not None:
+            self.writer.flush(run_id)
+
+    def close(self) -> None:
+        """Write out queued events; later appends are written in place."""
+        writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.close()
+
+    def _remember_last(self, run_id: str, size: int, line: str) -> None:
+        self._last_events[run_id] = (size, line)
+        self._last_events.move_to_end(run_id)
+        while len(self._last_events) > self._LIVE_RUNS_MAX:
+            self._last_events.popitem(last=False)
 
     def read_last_event(self, run_id: str) -> str | None:
+        """Last event line of a run without scanning the file.
+
+        Live runs answer from memory; the file size guards against writes
+        from other processes. Cold runs are read backwards from the end.
+        """
+        if self.writer is not None:
+            queued = self.writer.pending(run_id)
+            if queued is not None:
+                return queued
         path = self.base / run_id / "events.jsonl"
-        if not path.exists():
+        try:
+            size = path.stat().st_size
+        except OSError:
             return None
-        last = None
-        with path.open("r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    last = line.strip()
-        return last
+        with self._lock:
+            cached = self._last_events.get(run_id)
+            if cached is not None and cached[0] == size:
+                return cached[1]
+        line = tail_line(path)
+        if line is None:
+            # Just rotated: the last line closes the newest segment
+            with self._run_lock(run_id):
+                rows = EventIndex(path).sync()
+                if len(rows):
+                    data = EventLog(path.parent).read(int(rows[-1]["start"]), int(rows[-1]["end"]))
+                    line = data.strip().decode("utf-8", "replace") or None
+        if line is not None:
+            with self._lock:
+                self._remember_last(run_id, size, line)
+        return line
+
+    def read_events(
+        self,
+        run_id: str,
+        cursor: int | None = None,
+        after_frame: int | None = None,
+        limit: int = 100,
+    ) -> tuple[list[str], int]:
+        """A page of event lines and the cursor to resume from.
+
+        ``cursor`` is a logical byte offset into the event log (as returned
+        by a previous call): events starting at or after it are returned.
+        ``after_frame`` starts at the first event whose ``frame_id`` is
+        greater. With neither, the last ``limit`` events are returned.
+        """
+        self.flush(run_id)
+        path = self.base / run_id / "events.jsonl"
+        log = EventLog(path.parent)
+        with self._run_lock(run_id):
+            if not log.exists():
+                return [], int(cursor or 0)
+            return self._page(log, EventIndex(path).sync(), cursor, after_frame, limit)
+
+    @staticmethod
+    def _page(
+        log: EventLog, rows: np.ndarray, cursor: int | None, after_frame: int | None, limit: int
+    ) -> tuple[list[str], int]:
+        n = len(rows)
+        limit = max(0, int(limit))
+        if cursor is not None:
+            i = int(np.searchsorted(rows["start"], int(cursor), side="left"))
+        elif after_frame is not None:
+            hits = np.flatnonzero(rows["frame_id"] > int(after_frame))
+            i = int(hits[0]) if hits.size else n
+        else:
+            i = max(0, n - limit)
+        j = min(n, i + limit)
+        if i >= j:
+            end = int(rows[n - 1]["end"]) if n else 0
+            # Past the end (e.g. the log was replaced): resume from what exists
+            return [], min(int(cursor), end) if cursor is not None else end
+        lo, hi = int(rows[i]["start"]), int(rows[j - 1]["end"])
+        data = log.read(lo, hi)
+        lines = [ln.strip().decode("utf-8", "replace") for ln in data.split(b"\n") if ln.strip()]
+        return lines, hi
 
 
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.utils.sketch import QuantileSketch
+
+from .event_log import EventLog
+
+# Numeric per-frame columns kept next to events.jsonl; row i is event line i
+COLUMNS: Dict[str, np.dtype] = {
+    "frame_id": np.dtype("<i8"),
+    "ts": np.dtype("<f8"),  # event time, unix seconds
+    "fps": np.dtype("<f4"),
+    "pre_ms": np.dtype("<f4"),
+    "model_ms": np.dtype("<f4"),
+    "post_ms": np.dtype("<f4"),
+    "boxes": np.dtype("<i4"),
+    "tracks": np.dtype("<i4"),
+    "errors": np.dtype("<i4"),
+}
+
+
+def _ts(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return dt.datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return float("nan")
+
+
+def _num(value, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def event_rows(lines: Iterable[bytes | str]) -> Dict[str, np.ndarray]:
+    """Column arrays for event JSON lines (unparseable lines give a row of defaults)."""
+    cols: Dict[str, List[float]] = {name: [] for name in COLUMNS}
+    for line in lines:
+        try:
+            ev = json.loads(line)
+            if not isinstance(ev, dict):
+                ev = {}
+        except ValueError:
+            ev = {}
+        t = ev.get("timings") or {}
+        cols["frame_id"].append(int(_num(ev.get("frame_id"), -1)))
+        cols["ts"].append(_ts(ev.get("ts")) if "ts" in ev else float("nan"))
+        cols["fps"].append(_num(ev.get("fps")))
+        # API events nest stage timings; offline/UI logs carry flat ``*_ms`` fields
+        cols["pre_ms"].append(_num(t.get("pre", ev.get("pre_ms"))))
+        cols["model_ms"].append(_num(t.get("model", ev.get("model_ms"))))
+        cols["post_ms"].append(_num(t.get("post", ev.get("post_ms"))))
+        cols["boxes"].append(len(ev.get("boxes") or ()))
+        cols["tracks"].append(len(ev.get("tracks") or ()))
+        cols["errors"].append(len(ev.get("errors") or ()))
+    return {name: np.asarray(vals, dtype=COLUMNS[name]) for name, vals in cols.items()}
+
+
+class TelemetryStore:
+    """Columnar per-frame telemetry of one run: ``runs/<id>/telemetry/<column>.bin``.
+
+    Each column is a flat little-endian array appended in chunks (one per
+    committed batch of events) and memory-mapped for reads, so aggregates
+    and time windows never touch JSON. The store is derived from
+    events.jsonl: ``sync`` fills in rows the log has but the store lacks.
+    """
+
+    def __init__(self, run_dir: Path) -> None:
+        self.dir = Path(run_dir) / "telemetry"
+
+    def _path(self, name: str) -> Path:
+        return self.dir / f"{name}.bin"
+
+    def __len__(self) -> int:
+        n = None
+        for name, dtype in COLUMNS.items():
+            try:
+                rows = self._path(name).stat().st_size // dtype.itemsize
+            except OSError:
+                rows = 0
+            n = rows if n is None else min(n, rows)
+        return int(n or 0)
+
+    def append(self, cols: Dict[str, np.ndarray]) -> None:
+        n = len(cols["frame_id"])
+        if not n:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        rows = len(self)
+        for name, dtype in COLUMNS.items():
+            path = self._path(name)
+            with path.open("ab") as f:
+                # A column left longer by an interrupted append is cut back to the common length
+                if f.tell() != rows * dtype.itemsize:
+                    f.truncate(rows * dtype.itemsize)
+                    f.seek(0, 2)
+                f.write(np.ascontiguousarray(cols[name], dtype=dtype).tobytes())
+
+    def clear(self) -> None:
+        for name in COLUMNS:
+            self._path(name).unlink(missing_ok=True)
+
+    def sync(self, events_path: Path, index: np.ndarray) -> None:
+        """Append rows for index entries (logical ``start``/``end`` offsets) not stored yet."""
+        have = len(self)
+        if have > len(index):
+            self.clear()  # log was replaced or truncated
+            have = 0
+        if have == len(index):
+            return
+        lo, hi = int(index[have]["start"]), int(index[len(index) - 1]["end"])
+        data = EventLog(Path(events_path).parent).read(lo, hi)
+        starts = np.asarray(index["start"][have:]) - lo
+        ends = np.asarray(index["end"][have:]) - lo
+        self.append(event_rows(data[s:e] for s, e in zip(starts.tolist(), ends.tolist())))
+
+    def columns(self, names: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """Read-only memory maps of the requested columns, all of equal length."""
+        n = len(self)
+        out: Dict[str, np.ndarray] = {}
+        for name in names or COLUMNS:
+            dtype = COLUMNS[name]
+            if n == 0:
+                out[name] = np.zeros(0, dtype=dtype)
+            else:
+                out[name] = np.memmap(self._path(name), dtype=dtype, mode="r", shape=(n,))
+        return out
+
+    def window(self, t0: Optional[float] = None, t1: Optional[float] = None, names: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """Rows with ``t0 <= ts < t1`` (unix seconds); ``ts`` is append-ordered, so this is a binary search."""
+        wanted = list(names) if names is not None else list(COLUMNS)
+        cols = self.columns(dict.fromkeys(wanted + ["ts"]))
+        ts = cols["ts"]
+        lo = 0 if t0 is None else int(np.searchsorted(ts, t0, side="left"))
+        hi = len(ts) if t1 is None else int(np.searchsorted(ts, t1, side="left"))
+        return {name: arr[lo:hi] for name, arr in cols.items()}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Mean/p50/p95/max per latency and fps column over the whole run."""
+        cols = self.columns(["fps", "pre_ms", "model_ms", "post_ms"])
+        out: Dict[str, Dict[str, float]] = {}
+        for name, arr in cols.items():
+            if not len(arr):
+                out[name] = {"count": 0.0}
+                continue
+            vals = np.asarray(arr, dtype=np.float64)
+            p50, p95 = np.percentile(vals, [50, 95])
+            out[name] = {
+                "count": float(vals.size),
+                "mean": float(vals.mean()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "max": float(vals.max()),
+            }
+        return out
+
+
+# Columns summarized by ``RunStats`` (``total_ms`` = pre + model + post)
+STAT_COLUMNS = ("fps", "pre_ms", "model_ms", "post_ms", "total_ms")
+
+
+class _Summary:
+    __slots__ = ("count", "sum", "min", "max", "sketch")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.sketch = QuantileSketch()
+
+    def add(self, vals: np.ndarray) -> None:
+        vals = vals[~np.isnan(vals)]
+        if not vals.size:
+            return
+        self.count += int(vals.size)
+        self.sum += float(vals.sum())
+        self.min = min(self.min, float(vals.min()))
+        self.max = max(self.max, float(vals.max()))
+        self.sketch.add_many(vals)
+
+    def as_dict(self) -> Dict[str, float]:
+        if not self.count:
+            return {"count": 0.0}
+        qs = self.sketch.quantiles((0.5, 0.95, 0.99))
+        return {
+            "count": float(self.count),
+            "mean": self.sum / self.count,
+            "min": self.min,
+            "max": self.max,
+            "p50": qs[0.5],
+            "p95": qs[0.95],
+            "p99": qs[0.99],
+        }
+
+
+class RunStats:
+    """Running mean/min/max and p50/p95/p99 sketches for one run's telemetry.
+
+    Updated with each committed chunk of telemetry rows; reading the stats
+    costs the same whether the run has a hundred frames or ten million.
+    ``rows`` is the number of telemetry rows folded in so far.
+    """
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self._cols = {name: _Summary() for name in STAT_COLUMNS}
+
+    def update(self, cols: Dict[str, np.ndarray]) -> None:
+        n = len(cols["fps"])
+        if not n:
+            return
+        vals = {name: np.asarray(cols[name], dtype=np.float64) for name in ("fps", "pre_ms", "model_ms", "post_ms")}
+        vals["total_ms"] = vals["pre_ms"] + vals["model_ms"] + vals["post_ms"]
+        for name, arr in vals.items():
+            self._cols[name].add(arr)
+        self.rows += n
+
+    @classmethod
+    def from_store(cls, store: TelemetryStore, chunk: int = 1 << 20) -> "RunStats":
+        stats = cls()
+        cols = store.columns(["fps", "pre_ms", "model_ms", "post_ms"])
+        n = len(cols["fps"])
+        for lo in range(0, n, chunk):
+            stats.update({name: arr[lo:lo + chunk] for name, arr in cols.items()})
+        return stats
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {name: summary.as_dict() for name, summary in self._cols.items()}
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+try:  # scipy ships with scikit-learn; keep a pure NumPy path for slim installs
+    from scipy.optimize import linear_sum_assignment as _scipy_lsa
+except Exception:  # pragma: no cover - optional at runtime
+    _scipy_lsa = None
+
+
+def _hungarian(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Min-cost assignment for a dense (n, m) matrix with n <= m.
+
+    Shortest-augmenting-path Hungarian algorithm with potentials; the inner
+    scan over columns is vectorized, so cost is O(n^2 m) NumPy-level work.
+    """
+    n, m = cost.shape
+    inf = np.inf
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)  # p[j]: row (1-based) matched to column j
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used
+            free[0] = False
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            better = free[1:] & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            cand = np.where(free, minv, inf)
+            j1 = int(np.argmin(cand))
+            delta = cand[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    cols = np.nonzero(p[1:])[0]
+    rows = p[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def _solve(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    if _scipy_lsa is not None:
+        r, c = _scipy_lsa(cost)
+        return np.asarray(r, dtype=np.int64), np.asarray(c, dtype=np.int64)
+    if cost.shape[0] <= cost.shape[1]:
+        return _hungarian(cost)
+    c, r = _hungarian(cost.T)
+    order = np.argsort(r)
+    return r[order], c[order]
+
+
+def sparse_assignment(
+    n: int,
+    m: int,
+    rows: np.ndarray,
+    cols: np.ndarray,
+    cost: np.ndarray,
+    thresh: float = np.inf,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Optimal one-to-one matching over candidate edges with ``cost <= thresh``.
+
+    Edges whose row and column have no other admissible edge are matched
+    directly (the common case for tracking and evaluation); only the rows and
+    columns of the remaining contested edges go to the dense solver. Returns ``(matches (K,2), unmatched_rows,
+    unmatched_cols)`` with matches sorted by row.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    cost = np.asarray(cost, dtype=np.float64)
+    keep = cost <= thresh
+    rows, cols, cost = rows[keep], cols[keep], cost[keep]
+    if rows.size == 0:
+        return np.empty((0, 2), dtype=np.int64), np.arange(n, dtype=np.int64), np.arange(m, dtype=np.int64)
+    rdeg = np.bincount(rows, minlength=n)
+    cdeg = np.bincount(cols, minlength=m)
+    trivial = (rdeg[rows] == 1) & (cdeg[cols] == 1)
+    parts = [np.stack([rows[trivial], cols[trivial]], axis=1)]
+    rest = ~trivial
+    if rest.any():
+        # One dense problem over the rows/cols left; blocks stay independent
+        # because missing pairs cost more than any admissible assignment.
+        rr, rc, rcost = rows[rest], cols[rest], cost[rest]
+        brows, ri = np.unique(rr, return_inverse=True)
+        bcols, ci = np.unique(rc, return_inverse=True)
+        big = float(np.abs(rcost).sum() + 1.0)
+        sub = np.full((brows.size, bcols.size), big)
+        sub[ri, ci] = rcost
+        r, c = _solve(sub)
+        ok = sub[r, c] < big
+        parts.append(np.stack([brows[r[ok]], bcols[c[ok]]], axis=1))
+    out = np.concatenate(parts, axis=0).astype(np.int64)
+    out = out[np.argsort(out[:, 0], kind="stable")]
+    unmatched_rows = np.setdiff1d(np.arange(n), out[:, 0])
+    unmatched_cols = np.setdiff1d(np.arange(m), out[:, 1])
+    return out, unmatched_rows, unmatched_cols
+
+
+def linear_assignment(cost: np.ndarray, thresh: float = np.inf) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Optimal one-to-one matching on a dense cost matrix, accepting ``cost <= thresh``.
+
+    Returns ``(matches (K,2), unmatched_rows, unmatched_cols)``.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    n, m = cost.shape if cost.ndim == 2 else (0, 0)
+    rows, cols = np.nonzero(cost <= thresh) if n and m else (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    return sparse_assignment(n, m, rows, cols, cost[rows, cols] if n and m else np.zeros(0), thresh)
+
+
+def max_weight_assignment(
+    n: int, m: int, rows: np.ndarray, cols: np.ndarray, weight: np.ndarray
+) -> np.ndarray:
+    """Matching of maximum total ``weight`` over candidate edges (weights > 0); ``(K,2)`` sorted by row.
+
+    Unlike :func:`sparse_assignment`, which first maximizes the number of
+    matches, pairs without an edge cost nothing here, so a heavy edge is
+    never given up to match more rows (IDF1 and HOTA assignments).
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    weight = np.asarray(weight, dtype=np.float64)
+    keep = weight > 0
+    rows, cols, weight = rows[keep], cols[keep], weight[keep]
+    if rows.size == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    rdeg = np.bincount(rows, minlength=n)
+    cdeg = np.bincount(cols, minlength=m)
+    trivial = (rdeg[rows] == 1) & (cdeg[cols] == 1)
+    parts = [np.stack([rows[trivial], cols[trivial]], axis=1)]
+    rest = ~trivial
+    if rest.any():
+        brows, ri = np.unique(rows[rest], return_inverse=True)
+        bcols, ci = np.unique(cols[rest], return_inverse=True)
+        sub = np.zeros((brows.size, bcols.size))
+        sub[ri, ci] = -weight[rest]
+        r, c = _solve(sub)
+        ok = sub[r, c] < 0
+        parts.append(np.stack([brows[r[ok]], bcols[c[ok]]], axis=1))
+    out = np.concatenate(parts, axis=0).astype(np.int64)
+    return out[np.argsort(out[:, 0], kind="stable")]
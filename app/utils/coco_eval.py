@@ -0,0 +1,429 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.metrics import box_areas_xyxy, iou_matrix_xyxy, match_max_iou
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+REC_THRESHOLDS = np.linspace(0.0, 1.0, 101)
+
+# One image: (gt boxes (G,4) xyxy, gt category index (G,), gt ignore (G,), gt crowd (G,),
+#             det boxes (D,4) xyxy, det category index (D,), det scores (D,))
+ImageData = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def _xywh_to_xyxy(bbox: Sequence[float]) -> Tuple[float, float, float, float]:
+    x, y, w, h = (float(v) for v in bbox)
+    return x, y, x + w, y + h
+
+
+def _crowd_iou(dt: np.ndarray, gt: np.ndarray, crowd: np.ndarray, iou: Optional[np.ndarray] = None) -> np.ndarray:
+    """IoU as COCO defines it: against crowd regions the union is the detection's own area."""
+    iou = iou_matrix_xyxy(dt, gt) if iou is None else iou.copy()
+    if crowd.any() and iou.size:
+        g = gt[crowd]
+        iw = np.clip(np.minimum(dt[:, None, 2], g[None, :, 2]) - np.maximum(dt[:, None, 0], g[None, :, 0]), 0.0, None)
+        ih = np.clip(np.minimum(dt[:, None, 3], g[None, :, 3]) - np.maximum(dt[:, None, 1], g[None, :, 1]), 0.0, None)
+        area_d = box_areas_xyxy(dt)[:, None]
+        iou[:, crowd] = np.divide(iw * ih, area_d, out=np.zeros(iw.shape), where=area_d > 0)
+    return iou
+
+
+def _last_argmax(x: np.ndarray) -> np.ndarray:
+    return x.shape[1] - 1 - np.argmax(x[:, ::-1], axis=1)
+
+
+def match_image(
+    iou: np.ndarray, ignore: np.ndarray, crowd: np.ndarray, thresholds: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """COCO matching of score-sorted detections to gts (ignored gts last) at every threshold.
+
+    Each detection, in order, takes the free gt with the highest IoU at or
+    above the threshold, preferring non-ignored gts; equal IoUs go to the
+    later gt and crowd gts can absorb any number of detections, as in
+    pycocotools. ``iou`` may hold ``-inf`` for pairs that can never match
+    (e.g. other categories). Returns ``(matched (T,D) bool, ignored (T,D) bool)``.
+    """
+    d_n, g_n = iou.shape
+    t_n = len(thresholds)
+    matched = np.zeros((t_n, d_n), dtype=bool)
+    ignored = np.zeros((t_n, d_n), dtype=bool)
+    if d_n == 0 or g_n == 0:
+        return matched, ignored
+    thr = np.minimum(np.asarray(thresholds, dtype=np.float64), 1 - 1e-10)
+    n_real = int(g_n - ignore.sum())
+    hit = iou[None, :, :] >= thr[:, None, None]  # (T, D, G)
+    if not (hit.sum(axis=1) > 1)[:, ~crowd].any():
+        # No gt is wanted by two detections: every detection simply takes its best candidate
+        cand = np.where(hit, iou[None, :, :], -np.inf)
+        real = cand[:, :, :n_real]
+        best_real = real.max(axis=2) if n_real else np.full((t_n, d_n), -np.inf)
+        ok = np.isfinite(best_real) | (hit[:, :, n_real:].any(axis=2) if n_real < g_n else False)
+        matched[:] = ok
+        ignored[:] = ok & ~np.isfinite(best_real)
+        return matched, ignored
+    taken = np.zeros((t_n, g_n), dtype=bool)
+    t_idx = np.arange(t_n)
+    for d in range(d_n):
+        row = iou[d][None, :]
+        cand = np.where((~taken | crowd[None, :]) & hit[:, d, :], row, -np.inf)
+        j = np.zeros(t_n, dtype=np.int64)
+        best = np.full(t_n, -np.inf)
+        if n_real:
+            j = _last_argmax(cand[:, :n_real])
+            best = cand[t_idx, j]
+        if n_real < g_n:
+            fall = ~np.isfinite(best)
+            if fall.any():
+                j2 = n_real + _last_argmax(cand[:, n_real:])
+                j = np.where(fall, j2, j)
+                best = cand[t_idx, j]
+        ok = np.isfinite(best)
+        if ok.any():
+            matched[ok, d] = True
+            ignored[ok, d] = ignore[j[ok]]
+            taken[t_idx[ok], j[ok]] = True
+    return matched, ignored
+
+
+def _match_dets(
+    image: ImageData, iou_all: np.ndarray, thresholds: np.ndarray, max_dets: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Match one image's top ``max_dets`` detections per class; ``(det indices by score, matched, ignored)``."""
+    g_box, g_cls, g_ign, g_crowd, d_box, d_cls, d_score = image
+    # All categories of an image are matched together; IoU across categories is masked out
+    gi = np.argsort(g_ign, kind="stable")  # ignored gts last
+    order = np.lexsort((-d_score, d_cls))  # by category, then score (stable)
+    rank = np.arange(order.size) - np.searchsorted(d_cls[order], d_cls[order], side="left")
+    di = np.sort(order[rank < max_dets], kind="stable")
+    di = di[np.argsort(-d_score[di], kind="stable")]
+    if g_box.size:
+        iou = _crowd_iou(d_box[di], g_box[gi], g_crowd[gi], iou_all[np.ix_(di, gi)])
+        iou[d_cls[di][:, None] != g_cls[gi][None, :]] = -np.inf
+        m, ig = match_image(iou, g_ign[gi], g_crowd[gi], thresholds)
+    else:
+        m = ig = np.zeros((len(thresholds), di.size), dtype=bool)
+    return di, m, ig
+
+
+def _cm_codes(
+    g_cls: np.ndarray, g_ign: np.ndarray, d_cls: np.ndarray, d_score: np.ndarray,
+    iou_all: np.ndarray, n_cls: int, conf: float, cm_iou: float,
+) -> np.ndarray:
+    """Confusion-matrix cells (``gt * (n_cls + 1) + pred``, ``n_cls`` = background) of one image.
+
+    Class-agnostic best-IoU matching of the detections scoring at least ``conf``.
+    """
+    bg = n_cls
+    gk = np.flatnonzero(~g_ign)
+    dk = np.flatnonzero(d_score >= conf)
+    matches, un_g, un_d = match_max_iou(iou_all[np.ix_(dk, gk)].T, cm_iou)
+    return np.concatenate([
+        g_cls[gk[matches[:, 0]]] * (n_cls + 1) + d_cls[dk[matches[:, 1]]],
+        g_cls[gk[un_g]] * (n_cls + 1) + bg,
+        bg * (n_cls + 1) + d_cls[dk[un_d]],
+    ])
+
+
+def _eval_images(
+    images: List[ImageData], n_cls: int, thresholds: np.ndarray, max_dets: int, conf: float, cm_iou: float
+) -> Tuple[Dict[int, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]], np.ndarray, np.ndarray]:
+    """Per-class ``(scores, matched, ignored)`` chunks, non-ignored gt counts and the confusion matrix."""
+    per_cls: Dict[int, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {}
+    n_gt = np.zeros(n_cls, dtype=np.int64)
+    cm_codes: List[np.ndarray] = []  # gt label * (n_cls + 1) + predicted label
+    bg = n_cls
+    for g_box, g_cls, g_ign, g_crowd, d_box, d_cls, d_score in images:
+        n_gt += np.bincount(g_cls[~g_ign], minlength=n_cls)
+        if not d_score.size:
+            cm_codes.append(g_cls[~g_ign] * (n_cls + 1) + bg)
+            continue
+        # One class-agnostic IoU matrix serves both the COCO matching and the confusion matrix
+        iou_all = iou_matrix_xyxy(d_box, g_box)
+        di, m, ig = _match_dets((g_box, g_cls, g_ign, g_crowd, d_box, d_cls, d_score), iou_all, thresholds, max_dets)
+        dc = d_cls[di]
+        for k in np.unique(dc).tolist():
+            sel = np.flatnonzero(dc == k)
+            per_cls.setdefault(k, []).append((d_score[di][sel], m[:, sel], ig[:, sel]))
+
+        cm_codes.append(_cm_codes(g_cls, g_ign, d_cls, d_score, iou_all, n_cls, conf, cm_iou))
+    codes = np.concatenate(cm_codes) if cm_codes else np.zeros(0, dtype=np.int64)
+    cm = np.bincount(codes, minlength=(n_cls + 1) ** 2).reshape(n_cls + 1, n_cls + 1)
+    return per_cls, n_gt, cm
+
+
+def _eval_shard(args: Tuple[List[ImageData], int, np.ndarray, int, float, float]):
+    return _eval_images(*args)
+
+
+def _accumulate(chunks: List[Tuple[np.ndarray, np.ndarray, np.ndarray]], n_gt: int, t_n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """AP (101-point interpolated) and recall per threshold for one class; -1 when it has no gts."""
+    if n_gt == 0:
+        return np.full(t_n, -1.0), np.full(t_n, -1.0)
+    if not chunks:
+        return np.zeros(t_n), np.zeros(t_n)
+    scores = np.concatenate([c[0] for c in chunks])
+    order = np.argsort(-scores, kind="mergesort")
+    matched = np.concatenate([c[1] for c in chunks], axis=1)[:, order]
+    ignored = np.concatenate([c[2] for c in chunks], axis=1)[:, order]
+    tp = np.cumsum(matched & ~ignored, axis=1, dtype=np.float64)
+    fp = np.cumsum(~matched & ~ignored, axis=1, dtype=np.float64)
+    ap = np.zeros(t_n)
+    recall = np.zeros(t_n)
+    for t in range(t_n):
+        rc = tp[t] / n_gt
+        pr = tp[t] / np.maximum(tp[t] + fp[t], np.spacing(1))
+        if not rc.size:
+            continue
+        recall[t] = rc[-1]
+        env = np.maximum.accumulate(pr[::-1])[::-1]
+        idx = np.searchsorted(rc, REC_THRESHOLDS, side="left")
+        q = np.zeros(len(REC_THRESHOLDS))
+        ok = idx < len(env)
+        q[ok] = env[idx[ok]]
+        ap[t] = q.mean()
+    return ap, recall
+
+
+def _mean(x: np.ndarray) -> float:
+    x = x[x > -1]
+    return float(x.mean()) if x.size else 0.0
+
+
+def _summary(
+    ap: np.ndarray, rec: np.ndarray, n_gt: np.ndarray, dets: Sequence[int], names: List[str], thresholds: np.ndarray
+) -> Dict[str, Any]:
+    """``map``/``map50``/``map75``/``recall`` and ``per_class`` from (T,K) AP and recall (-1 = no gts)."""
+
+    def _at(t: float) -> Optional[int]:
+        hit = np.flatnonzero(np.isclose(thresholds, t))
+        return int(hit[0]) if hit.size else None
+
+    i50, i75 = _at(0.5), _at(0.75)
+    per_class = {}
+    for k, name in enumerate(names):
+        has_gt = n_gt[k] > 0
+        per_class[name] = {
+            "ap": _mean(ap[:, k]) if has_gt else None,
+            "ap50": float(ap[i50, k]) if has_gt and i50 is not None else None,
+            "recall": _mean(rec[:, k]) if has_gt else None,
+            "gt": int(n_gt[k]),
+            "dets": int(dets[k]),
+        }
+    return {
+        "map": _mean(ap),
+        "map50": _mean(ap[i50]) if i50 is not None else None,
+        "map75": _mean(ap[i75]) if i75 is not None else None,
+        "recall": _mean(rec),
+        "per_class": per_class,
+    }
+
+
+def _categories(data: dict) -> Tuple[Dict[int, int], List[str]]:
+    """Category id -> index (in id order) and the category names."""
+    cats = data.get("categories") or [{"id": c, "name": str(c)} for c in sorted({int(a["category_id"]) for a in data.get("annotations", [])})]
+    cats = sorted(cats, key=lambda c: int(c["id"]))
+    return {int(c["id"]): i for i, c in enumerate(cats)}, [str(c.get("name", c["id"])) for c in cats]
+
+
+def _group_images(data: dict, predictions: List[dict], cat_index: Dict[int, int]) -> List[ImageData]:
+    gts: Dict[int, list] = {int(im["id"]): [] for im in data.get("images", [])}
+    for ann in data.get("annotations", []):
+        if int(ann.get("category_id", -1)) in cat_index:
+            gts.setdefault(int(ann["image_id"]), []).append(ann)
+    dts: Dict[int, list] = {}
+    for det in predictions:
+        if int(det.get("category_id", -1)) in cat_index and int(det["image_id"]) in gts:
+            dts.setdefault(int(det["image_id"]), []).append(det)
+    images: List[ImageData] = []
+    for img_id in sorted(gts):
+        g, d = gts[img_id], dts.get(img_id, [])
+        crowd = np.array([bool(a.get("iscrowd", 0)) for a in g], dtype=bool)
+        images.append((
+            np.array([_xywh_to_xyxy(a["bbox"]) for a in g], dtype=np.float64).reshape(-1, 4),
+            np.array([cat_index[int(a["category_id"])] for a in g], dtype=np.int64),
+            crowd | np.array([bool(a.get("ignore", 0)) for a in g], dtype=bool),
+            crowd,
+            np.array([_xywh_to_xyxy(p["bbox"]) for p in d], dtype=np.float64).reshape(-1, 4),
+            np.array([cat_index[int(p["category_id"])] for p in d], dtype=np.int64),
+            np.array([float(p.get("score", 1.0)) for p in d], dtype=np.float64),
+        ))
+    return images
+
+
+def evaluate_detections(
+    data: dict,
+    predictions: List[dict],
+    iou_thresholds: Sequence[float] = IOU_THRESHOLDS,
+    max_dets: int = 100,
+    workers: int = 0,
+    min_parallel_images: int = 500,
+    shard_images: int = 250,
+    conf_thresh: float = 0.25,
+    cm_iou: float = 0.5,
+) -> Dict[str, Any]:
+    """COCO bbox evaluation of ``predictions`` (COCO results format) against ``data``.
+
+    Returns ``map`` (AP@[.5:.95]), ``map50``, ``map75``, ``recall`` (AR at
+    ``max_dets``), ``per_class`` AP/recall and a confusion matrix
+    (``cm``: labels plus a trailing ``background``). Images are matched
+    independently, so with ``workers`` > 1 (0 = one per CPU) and at least
+    ``min_parallel_images`` images they are sharded across a process pool;
+    the result does not depend on the sharding.
+    """
+    cat_index, names = _categories(data)
+    thresholds = np.asarray(iou_thresholds, dtype=np.float64)
+    images = _group_images(data, predictions, cat_index)
+    n_cls, t_n = len(names), len(thresholds)
+
+    workers = int(workers) or (os.cpu_count() or 1)
+    args = (n_cls, thresholds, int(max_dets), float(conf_thresh), float(cm_iou))
+    if workers > 1 and len(images) >= max(1, min_parallel_images):
+        size = max(1, int(shard_images))
+        shards = [images[i:i + size] for i in range(0, len(images), size)]
+        # Spawned, not forked: the API process calling this runs writer/janitor threads and pools
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(_eval_shard, [(s, *args) for s in shards]))
+    else:
+        parts = [_eval_images(images, *args)]
+
+    # Merge shards in image order (detection order decides score ties, as in pycocotools)
+    per_cls: Dict[int, list] = {}
+    n_gt = np.zeros(n_cls, dtype=np.int64)
+    cm = np.zeros((n_cls + 1, n_cls + 1), dtype=np.int64)
+    for chunk, gt, part_cm in parts:
+        for k, lst in chunk.items():
+            per_cls.setdefault(k, []).extend(lst)
+        n_gt += gt
+        cm += part_cm
+
+    ap = np.full((t_n, n_cls), -1.0)
+    rec = np.full((t_n, n_cls), -1.0)
+    for k in range(n_cls):
+        ap[:, k], rec[:, k] = _accumulate(per_cls.get(k, []), int(n_gt[k]), t_n)
+
+    dets = [int(sum(c[0].size for c in per_cls.get(k, []))) for k in range(n_cls)]
+    out = _summary(ap, rec, n_gt, dets, names, thresholds)
+    out.update(images=len(images), predictions=int(sum(len(im[6]) for im in images)))
+    out["cm"] = {"labels": names + ["background"], "matrix": cm.tolist()}
+    return out
+
+
+class StreamingDetectionEval:
+    """COCO bbox AP over frames as they arrive, in memory that does not grow with the run.
+
+    Each frame is matched against its ground truth as soon as it is added
+    (same rules as :func:`evaluate_detections`); only per-class true/false
+    positive counts per score bin (``(K, T, score_bins)``), gt counts and
+    the confusion matrix are kept. AP is read off the binned PR curve, so
+    it equals the batch result whenever no two detections of a class share
+    a bin. Frames map to images by position in ``data["images"]``
+    (``frame_key="index"``, e.g. decoded video frames) or by image id
+    (``"id"``); detections name their class, matched case-insensitively to
+    the category names. Frames without an image and frames seen before are
+    counted as skipped. Not thread-safe.
+    """
+
+    def __init__(
+        self,
+        data: dict,
+        frame_key: str = "index",
+        iou_thresholds: Sequence[float] = IOU_THRESHOLDS,
+        max_dets: int = 100,
+        score_bins: int = 500,
+        conf_thresh: float = 0.25,
+        cm_iou: float = 0.5,
+    ) -> None:
+        if frame_key not in ("index", "id"):
+            raise ValueError(f"frame_key must be 'index' or 'id', got {frame_key!r}")
+        cat_index, self.names = _categories(data)
+        self._cls = {name.lower(): k for k, name in enumerate(self.names)}
+        self.thresholds = np.asarray(iou_thresholds, dtype=np.float64)
+        self.max_dets = int(max_dets)
+        self.bins = max(1, int(score_bins))
+        self.conf_thresh = float(conf_thresh)
+        self.cm_iou = float(cm_iou)
+        images = _group_images(data, [], cat_index)  # sorted by image id
+        self._gt = [im[:4] for im in images]
+        ids = sorted(int(im["id"]) for im in data.get("images", []))
+        pos = {img_id: i for i, img_id in enumerate(ids)}
+        if frame_key == "index":
+            self._frames = {i: pos[int(im["id"])] for i, im in enumerate(data.get("images", []))}
+        else:
+            self._frames = pos
+        n_cls, t_n = len(self.names), len(self.thresholds)
+        self.tp = np.zeros((n_cls, t_n, self.bins), dtype=np.uint32)
+        self.fp = np.zeros((n_cls, t_n, self.bins), dtype=np.uint32)
+        self.n_gt = np.zeros(n_cls, dtype=np.int64)
+        self.dets = np.zeros(n_cls, dtype=np.int64)
+        self.cm = np.zeros((n_cls + 1, n_cls + 1), dtype=np.int64)
+        self._seen = np.zeros(len(self._gt), dtype=bool)
+        self.frames = 0
+        self.skipped = 0
+        self.unknown_cls = 0
+
+    def add_frame(self, frame_id: int, boxes: Sequence[Dict[str, Any]]) -> bool:
+        """Score one frame's detections (``x1, y1, x2, y2, score, cls``); False if it was skipped."""
+        i = self._frames.get(int(frame_id))
+        if i is None or self._seen[i]:
+            self.skipped += 1
+            return False
+        self._seen[i] = True
+        self.frames += 1
+        g_box, g_cls, g_ign, g_crowd = self._gt[i]
+        n_cls = len(self.names)
+        self.n_gt += np.bincount(g_cls[~g_ign], minlength=n_cls)
+
+        keep = [b for b in boxes if str(b.get("cls", "")).lower() in self._cls]
+        self.unknown_cls += len(boxes) - len(keep)
+        d_box = np.array([[b["x1"], b["y1"], b["x2"], b["y2"]] for b in keep], dtype=np.float64).reshape(-1, 4)
+        d_cls = np.array([self._cls[str(b["cls"]).lower()] for b in keep], dtype=np.int64)
+        d_score = np.array([float(b.get("score", 1.0)) for b in keep], dtype=np.float64)
+        iou_all = iou_matrix_xyxy(d_box, g_box)
+        self.cm += np.bincount(
+            _cm_codes(g_cls, g_ign, d_cls, d_score, iou_all, n_cls, self.conf_thresh, self.cm_iou), minlength=(n_cls + 1) ** 2
+        ).reshape(n_cls + 1, n_cls + 1)
+        if not d_score.size:
+            return True
+
+        di, m, ig = _match_dets((g_box, g_cls, g_ign, g_crowd, d_box, d_cls, d_score), iou_all, self.thresholds, self.max_dets)
+        k = d_cls[di]
+        b = np.clip((d_score[di] * self.bins).astype(np.int64), 0, self.bins - 1)
+        t = np.arange(len(self.thresholds))[:, None]
+        np.add.at(self.tp, (k[None, :], t, b[None, :]), (m & ~ig).astype(np.uint32))
+        np.add.at(self.fp, (k[None, :], t, b[None, :]), (~m & ~ig).astype(np.uint32))
+        self.dets += np.bincount(k, minlength=n_cls)
+        return True
+
+    def summary(self) -> Dict[str, Any]:
+        """Running ``map``/``map50``/``map75``/``recall``, ``per_class`` and ``cm`` over the frames so far."""
+        n_cls, t_n = len(self.names), len(self.thresholds)
+        ap = np.full((t_n, n_cls), -1.0)
+        rec = np.full((t_n, n_cls), -1.0)
+        # Highest bin first: cumulative counts are the PR curve sampled at bin edges
+        tp = np.cumsum(self.tp[:, :, ::-1], axis=2, dtype=np.float64)
+        fp = np.cumsum(self.fp[:, :, ::-1], axis=2, dtype=np.float64)
+        pr = tp / np.maximum(tp + fp, np.spacing(1))
+        env = np.maximum.accumulate(pr[:, :, ::-1], axis=2)[:, :, ::-1]
+        for k in np.flatnonzero(self.n_gt > 0).tolist():
+            rc = tp[k] / self.n_gt[k]
+            rec[:, k] = rc[:, -1]
+            for t in range(t_n):
+                idx = np.searchsorted(rc[t], REC_THRESHOLDS, side="left")
+                ok = idx < self.bins
+                ap[t, k] = np.where(ok, env[k, t, np.minimum(idx, self.bins - 1)], 0.0).mean()
+        out = _summary(ap, rec, self.n_gt, self.dets.tolist(), self.names, self.thresholds)
+        out.update(
+            frames=self.frames,
+            images=len(self._gt),
+            skipped=self.skipped,
+            predictions=int(self.dets.sum()),
+            unknown_cls=self.unknown_cls,
+            cm={"labels": self.names + ["background"], "matrix": self.cm.tolist()},
+        )
+        return out
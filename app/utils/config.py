@@ -13,3 +13,12 @@ def load_providers_config(path: str | Path = None) -> Dict[str, Any]:
     return yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
 
 
+def load_profile(name: str, base: str | Path = None) -> Dict[str, Any]:
+    """Load ``configs/profiles/<name>.yaml``; unknown profiles yield ``{}``."""
+    base_dir = Path(base) if base else Path(__file__).resolve().parents[1] / "configs" / "profiles"
+    path = base_dir / f"{Path(str(name)).name}.yaml"
+    if not path.exists():
+        return {}
+    return yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+
+
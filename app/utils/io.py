@@ -12,6 +12,11 @@ def to_b64(data: bytes) -> str:
     return base64.b64encode(data).decode("utf-8")
 
 
+def as_b64(image: str | bytes) -> str:
+    """Base64 text for a provider payload; ``str`` input is taken as already encoded."""
+    return image if isinstance(image, str) else to_b64(image)
+
+
 def from_b64(data: str) -> bytes:
     return base64.b64decode(data.encode("utf-8"))
 
@@ -2,6 +2,10 @@ from __future__ import annotations
 
 from typing import List, Tuple
 
+import numpy as np
+
+from app.utils.assignment import linear_assignment
+
 
 def iou_xyxy(a: Tuple[float, float, float, float], b: Tuple[float, float, float, float]) -> float:
     ax1, ay1, ax2, ay2 = a
@@ -21,23 +25,180 @@ def iou_xyxy(a: Tuple[float, float, float, float], b: Tuple[float, float, float,
     return inter / union if union > 0 else 0.0
 
 
-def map50_placeholder(pred: List[Tuple[float, float, float, float]], gt: List[Tuple[float, float, float, float]]) -> float:
-    # Very rough placeholder: fraction of gt matched by IoU>=0.5
-    matched = 0
-    used = [False] * len(pred)
-    for g in gt:
-        best_iou = 0.0
-        best_idx = -1
-        for i, p in enumerate(pred):
-            if used[i]:
-                continue
-            iou = iou_xyxy(p, g)
-            if iou >= 0.5 and iou > best_iou:
-                best_iou = iou
-                best_idx = i
-        if best_idx >= 0:
-            used[best_idx] = True
-            matched += 1
-    return matched / max(1, len(gt))
+def box_areas_xyxy(boxes: np.ndarray) -> np.ndarray:
+    """Areas of (N,4) xyxy boxes; inverted boxes count as empty."""
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.clip(b[:, 2] - b[:, 0], 0.0, None) * np.clip(b[:, 3] - b[:, 1], 0.0, None)
+
+
+def clip_boxes_xyxy(boxes: np.ndarray, width: float, height: float) -> np.ndarray:
+    """(N,4) xyxy boxes clipped to a ``width`` x ``height`` image (a new array)."""
+    b = np.array(boxes, dtype=np.float64).reshape(-1, 4)
+    np.clip(b[:, 0::2], 0.0, float(width), out=b[:, 0::2])
+    np.clip(b[:, 1::2], 0.0, float(height), out=b[:, 1::2])
+    return b
+
+
+def iou_matrix_xyxy(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (N,4) and (M,4) xyxy boxes as an (N,M) array.
+
+    Agrees with ``iou_xyxy`` pair by pair; memory is a few N x M float64
+    temporaries (1k x 1k: ~8 MB each).
+    """
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    if a.shape[0] == 0 or b.shape[0] == 0:
+        return np.zeros((a.shape[0], b.shape[0]), dtype=np.float64)
+    iw = np.minimum(a[:, None, 2], b[None, :, 2])
+    iw -= np.maximum(a[:, None, 0], b[None, :, 0])
+    ih = np.minimum(a[:, None, 3], b[None, :, 3])
+    ih -= np.maximum(a[:, None, 1], b[None, :, 1])
+    np.clip(iw, 0.0, None, out=iw)
+    np.clip(ih, 0.0, None, out=ih)
+    inter = np.multiply(iw, ih, out=iw)
+    union = box_areas_xyxy(a)[:, None] + box_areas_xyxy(b)[None, :]
+    union -= inter
+    out = np.zeros_like(inter)
+    np.divide(inter, union, out=out, where=(inter > 0) & (union > 0))
+    return out
+
+
+def iou_pairs_xyxy(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """IoU for overlapping pairs only, as ``(rows, cols, iou)`` with iou > 0.
+
+    Candidates come from a sweep over ``b`` sorted by x1 (a pair can only
+    overlap if ``b.x1`` lies in ``[a.x1 - max_w(b), a.x2)``), so sparse scenes
+    cost roughly O((N + M) log M + pairs) instead of a dense N x M matrix.
+    """
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    n, m = a.shape[0], b.shape[0]
+    if n == 0 or m == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    order = np.argsort(b[:, 0], kind="stable")
+    bx1 = b[order, 0]
+    max_w = float(np.clip(b[:, 2] - b[:, 0], 0.0, None).max())
+    lo = np.searchsorted(bx1, a[:, 0] - max_w, side="left")
+    hi = np.searchsorted(bx1, a[:, 2], side="left")
+    counts = np.clip(hi - lo, 0, None)
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    rows = np.repeat(np.arange(n, dtype=np.int64), counts)
+    starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+    cols = order[starts + np.arange(total)]
+    # np.take is much cheaper than 2-D fancy indexing at these sizes
+    pa, pb = np.take(a, rows, axis=0), np.take(b, cols, axis=0)
+    iw = np.minimum(pa[:, 2], pb[:, 2]) - np.maximum(pa[:, 0], pb[:, 0])
+    ih = np.minimum(pa[:, 3], pb[:, 3]) - np.maximum(pa[:, 1], pb[:, 1])
+    hit = np.nonzero((iw > 0) & (ih > 0))[0]
+    rows, cols = rows.take(hit), cols.take(hit)
+    inter = iw.take(hit) * ih.take(hit)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a.take(rows) + area_b.take(cols) - inter
+    keep = union > 0
+    return rows[keep], cols[keep], inter[keep] / union[keep]
+
 
+def match_greedy(
+    iou: np.ndarray, iou_thresh: float = 0.5, order: np.ndarray | None = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Greedy one-to-one matching in row priority (COCO-style for rows = predictions).
 
+    Rows are visited in ``order`` (default: row order, e.g. pass predictions
+    sorted by descending score); each takes its highest-IoU free column if
+    that IoU is at least ``iou_thresh`` (ties go to the lower column).
+    Returns ``(matches (K,2), unmatched_rows, unmatched_cols)`` like
+    ``linear_assignment``, with matches sorted by row.
+    """
+    best = match_thresholds(iou, [iou_thresh], order)[0]
+    rows = np.flatnonzero(best >= 0)
+    matches = np.stack([rows, best[rows]], axis=1).astype(np.int64)
+    m = np.shape(iou)[1] if np.ndim(iou) == 2 else 0
+    return matches, np.flatnonzero(best < 0), np.setdiff1d(np.arange(m), matches[:, 1])
+
+
+def match_thresholds(iou: np.ndarray, thresholds, order: np.ndarray | None = None) -> np.ndarray:
+    """Row-priority greedy matching at several IoU thresholds at once.
+
+    Returns a (T, N) array holding the matched column of each row at each
+    threshold, or -1. One pass over the rows; the work per row is a
+    vectorized (T, M) update, so COCO's ten thresholds cost about as much
+    as one.
+    """
+    iou = np.asarray(iou, dtype=np.float64)
+    thr = np.asarray(thresholds, dtype=np.float64).reshape(-1)
+    n, m = iou.shape if iou.ndim == 2 else (0, 0)
+    out = np.full((thr.size, n), -1, dtype=np.int64)
+    if n == 0 or m == 0:
+        return out
+    rows = np.arange(n) if order is None else np.asarray(order, dtype=np.int64)
+    taken = np.zeros((thr.size, m), dtype=bool)
+    t_idx = np.arange(thr.size)
+    for i in rows.tolist():
+        cand = np.where(taken, -1.0, iou[i][None, :])
+        j = cand.argmax(axis=1)
+        best = cand[t_idx, j]
+        ok = best >= thr
+        if ok.any():
+            out[ok, i] = j[ok]
+            taken[t_idx[ok], j[ok]] = True
+    return out
+
+
+def match_max_iou(iou: np.ndarray, iou_thresh: float = 0.5) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Greedy one-to-one matching by descending IoU over all pairs (ties: lower row, then column).
+
+    Each round matches every pair that is the best of both its row and its
+    column among what is left, which is exactly what the sequential greedy
+    would pick; rounds repeat on the remaining rows and columns. Returns
+    ``(matches (K,2), unmatched_rows, unmatched_cols)`` sorted by row.
+    """
+    iou = np.asarray(iou, dtype=np.float64)
+    n, m = iou.shape if iou.ndim == 2 else (0, 0)
+    parts = []
+    rows, cols = np.arange(n), np.arange(m)
+    if n and m:
+        keep_r = (iou >= iou_thresh).any(axis=1)
+        rows = rows[keep_r]
+        if rows.size:
+            cols = cols[(iou[rows] >= iou_thresh).any(axis=0)]
+    while rows.size and cols.size:
+        sub = iou[np.ix_(rows, cols)]
+        sub[sub < iou_thresh] = -1.0
+        rbest = sub.argmax(axis=1)
+        cbest = sub.argmax(axis=0)
+        ok = (cbest[rbest] == np.arange(rows.size)) & (sub[np.arange(rows.size), rbest] >= iou_thresh)
+        if not ok.any():
+            break
+        r = np.flatnonzero(ok)
+        parts.append(np.stack([rows[r], cols[rbest[r]]], axis=1))
+        left_r = np.ones(rows.size, dtype=bool)
+        left_r[r] = False
+        left_c = np.ones(cols.size, dtype=bool)
+        left_c[rbest[r]] = False
+        rows, cols = rows[left_r], cols[left_c]
+    matches = np.concatenate(parts, axis=0).astype(np.int64) if parts else np.empty((0, 2), dtype=np.int64)
+    matches = matches[np.argsort(matches[:, 0], kind="stable")]
+    free_r = np.ones(n, dtype=bool)
+    free_r[matches[:, 0]] = False
+    free_c = np.ones(m, dtype=bool)
+    free_c[matches[:, 1]] = False
+    return matches, np.flatnonzero(free_r), np.flatnonzero(free_c)
+
+
+def match_optimal(iou: np.ndarray, iou_thresh: float = 0.5) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Maximum-cardinality, then maximum-total-IoU matching over pairs with IoU >= ``iou_thresh``."""
+    iou = np.asarray(iou, dtype=np.float64)
+    if iou.ndim != 2:
+        iou = iou.reshape(0, 0)
+    return linear_assignment(-iou, thresh=-float(iou_thresh))
+
+
+def map50_placeholder(pred: List[Tuple[float, float, float, float]], gt: List[Tuple[float, float, float, float]]) -> float:
+    # Very rough placeholder: fraction of gt matched by IoU>=0.5 (each gt, in order, takes its best free prediction)
+    if not gt:
+        return 0.0
+    matches, _, _ = match_greedy(iou_matrix_xyxy(gt, pred), 0.5)
+    return len(matches) / len(gt)
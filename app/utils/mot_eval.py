@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.assignment import max_weight_assignment, sparse_assignment
+from app.utils.metrics import iou_matrix_xyxy
+
+HOTA_ALPHAS = np.arange(0.05, 0.99, 0.05)  # 19 localization thresholds, as in TrackEval
+
+# One frame: (gt ids (G,), gt boxes (G,4) xyxy, predicted ids (P,), predicted boxes (P,4) xyxy)
+Frame = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+_EPS = float(np.finfo(np.float64).eps)
+_EMPTY_IDS = np.zeros(0, dtype=np.int64)
+_EMPTY_BOXES = np.zeros((0, 4), dtype=np.float64)
+
+
+class _Ids:
+    """Dense indices for external track ids, with a detection count per id."""
+
+    def __init__(self) -> None:
+        self._index: Dict[int, int] = {}
+        self.counts = np.zeros(64, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def add(self, ids: np.ndarray) -> np.ndarray:
+        idx = np.fromiter((self._index.setdefault(int(i), len(self._index)) for i in ids.tolist()), dtype=np.int64, count=len(ids))
+        if len(self._index) > self.counts.size:
+            self.counts = np.concatenate([self.counts, np.zeros(max(self.counts.size, len(self._index)), dtype=np.int64)])
+        np.add.at(self.counts, idx, 1)
+        return idx
+
+    def lookup(self, ids: np.ndarray) -> np.ndarray:
+        return np.fromiter((self._index.get(int(i), -1) for i in ids.tolist()), dtype=np.int64, count=len(ids))
+
+
+class _PairSums:
+    """Sums per (gt index, predicted index) pair, kept as sorted int64 keys.
+
+    Memory grows with the number of distinct pairs that ever overlapped, not
+    with the number of frames: additions are buffered and merged in batches.
+    """
+
+    def __init__(self, flush_at: int = 1 << 16) -> None:
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.vals = np.zeros(0, dtype=np.float64)
+        self._buf: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._pending = 0
+        self.flush_at = int(flush_at)
+
+    def add(self, rows: np.ndarray, cols: np.ndarray, vals: np.ndarray | float) -> None:
+        if not rows.size:
+            return
+        vals = np.full(rows.shape, vals, dtype=np.float64) if np.isscalar(vals) else np.asarray(vals, dtype=np.float64)
+        self._buf.append(((rows << 32) | cols, vals))
+        self._pending += rows.size
+        if self._pending >= self.flush_at:
+            self.compact()
+
+    def compact(self) -> None:
+        if not self._buf:
+            return
+        keys = np.concatenate([self.keys, *(k for k, _ in self._buf)])
+        vals = np.concatenate([self.vals, *(v for _, v in self._buf)])
+        self.keys, inv = np.unique(keys, return_inverse=True)
+        self.vals = np.bincount(inv, weights=vals, minlength=self.keys.size)
+        self._buf, self._pending = [], 0
+
+    def lookup(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        self.compact()
+        keys = (rows << 32) | cols
+        pos = np.minimum(np.searchsorted(self.keys, keys), max(0, self.keys.size - 1))
+        hit = self.keys[pos] == keys if self.keys.size else np.zeros(keys.shape, dtype=bool)
+        return np.where(hit, self.vals[pos] if self.keys.size else 0.0, 0.0)
+
+    def items(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self.compact()
+        return self.keys >> 32, self.keys & 0xFFFFFFFF, self.vals
+
+
+def _clear_pass(frames: Iterable[Frame], iou_thresh: float) -> Tuple[Dict[str, float], _Ids, _Ids, _PairSums, _PairSums]:
+    """CLEAR-MOT counts plus the id-pair sums IDF1 and HOTA's global alignment need."""
+    gids, pids = _Ids(), _Ids()
+    id_pairs, potential = _PairSums(), _PairSums()
+    last = np.full(64, -1, dtype=np.int64)  # last predicted index matched to each gt index
+    c = {"frames": 0, "gt": 0, "pred": 0, "matches": 0, "fp": 0, "fn": 0, "idsw": 0, "iou_sum": 0.0}
+    for gt_ids, gt_boxes, pr_ids, pr_boxes in frames:
+        c["frames"] += 1
+        g, p = gids.add(gt_ids), pids.add(pr_ids)
+        if len(gids) > last.size:
+            last = np.concatenate([last, np.full(max(last.size, len(gids)), -1, dtype=np.int64)])
+        c["gt"] += g.size
+        c["pred"] += p.size
+        if not g.size or not p.size:
+            c["fn"] += g.size
+            c["fp"] += p.size
+            continue
+        iou = iou_matrix_xyxy(gt_boxes, pr_boxes)
+        ok = iou >= iou_thresh
+        r, k = np.nonzero(ok)
+        id_pairs.add(g[r], p[k], 1.0)
+
+        # HOTA: per-frame Jaccard-normalized similarity, summed per id pair
+        denom = iou.sum(axis=0)[None, :] + iou.sum(axis=1)[:, None] - iou
+        sim = np.divide(iou, denom, out=np.zeros_like(iou), where=denom > _EPS)
+        r, k = np.nonzero(sim > 0)
+        potential.add(g[r], p[k], sim[r, k])
+
+        # CLEAR: keep last frame's correspondences that still overlap, then match the rest optimally
+        col = {int(v): j for j, v in enumerate(p.tolist())}
+        prev = np.array([col.get(int(h), -1) for h in last[g].tolist()], dtype=np.int64)
+        keep = np.flatnonzero(prev >= 0)
+        keep = keep[ok[keep, prev[keep]]]
+        free_r = np.ones(g.size, dtype=bool)
+        free_c = np.ones(p.size, dtype=bool)
+        free_r[keep] = False
+        free_c[prev[keep]] = False
+        r, k = np.nonzero(ok & free_r[:, None] & free_c[None, :])
+        matches, _, _ = sparse_assignment(g.size, p.size, r, k, 1.0 - iou[r, k])
+        mr, mc = matches[:, 0], matches[:, 1]
+        c["idsw"] += int(((last[g[mr]] >= 0) & (last[g[mr]] != p[mc])).sum())
+        rows = np.concatenate([keep, mr])
+        cols = np.concatenate([prev[keep], mc])
+        last[g[rows]] = p[cols]
+        c["matches"] += rows.size
+        c["iou_sum"] += float(iou[rows, cols].sum())
+        c["fn"] += g.size - rows.size
+        c["fp"] += p.size - rows.size
+    return c, gids, pids, id_pairs, potential
+
+
+def _hota_pass(frames: Iterable[Frame], gids: _Ids, pids: _Ids, potential: _PairSums) -> Dict[str, Any]:
+    """HOTA counts per alpha; needs the global alignment from a first pass over the same frames."""
+    a_n = len(HOTA_ALPHAS)
+    tp, fn, fp, loc = np.zeros(a_n), np.zeros(a_n), np.zeros(a_n), np.zeros(a_n)
+    # Matched pairs per level (number of alphas their IoU reaches), so one accumulator serves all alphas
+    matched = _PairSums()
+    gc, pc = gids.counts.astype(np.float64), pids.counts.astype(np.float64)
+    alphas = HOTA_ALPHAS - _EPS
+    for gt_ids, gt_boxes, pr_ids, pr_boxes in frames:
+        g, p = gids.lookup(gt_ids), pids.lookup(pr_ids)
+        if not g.size or not p.size:
+            fn += g.size
+            fp += p.size
+            continue
+        iou = iou_matrix_xyxy(gt_boxes, pr_boxes)
+        r, k = np.nonzero(iou > 0)
+        pot = potential.lookup(g[r], p[k])
+        align = pot / np.maximum(gc[g[r]] + pc[p[k]] - pot, _EPS)
+        matches = max_weight_assignment(g.size, p.size, r, k, align * iou[r, k])
+        sim = iou[matches[:, 0], matches[:, 1]]
+        hit = sim[None, :] >= alphas[:, None]  # (A, M)
+        n = hit.sum(axis=1)
+        tp += n
+        fn += g.size - n
+        fp += p.size - n
+        loc += (hit * sim[None, :]).sum(axis=1)
+        level = hit.sum(axis=0)
+        keep = level > 0
+        matched.add(g[matches[keep, 0]], p[matches[keep, 1]] * (a_n + 1) + level[keep], 1.0)
+    ass = np.zeros(a_n)
+    rows, cols, n = matched.items()
+    if n.size:
+        pair, pos = np.unique((rows << 32) | (cols // (a_n + 1)), return_inverse=True)
+        per_level = np.zeros((pair.size, a_n + 1))
+        np.add.at(per_level, (pos, cols % (a_n + 1)), n)
+        # A pair counts as matched at alpha index a in frames where its level exceeds a
+        counts = np.cumsum(per_level[:, ::-1], axis=1)[:, ::-1][:, 1:]  # (pairs, A)
+        denom = gc[pair >> 32][:, None] + pc[pair & 0xFFFFFFFF][:, None] - counts
+        ass = (counts * counts / np.maximum(1.0, denom)).sum(axis=0)
+    return {"tp": tp, "fn": fn, "fp": fp, "loc": loc, "ass": ass}
+
+
+def evaluate_mot(frames: Callable[[], Iterable[Frame]], iou_thresh: float = 0.5) -> Dict[str, Any]:
+    """MOTA/MOTP, IDF1 and HOTA of one sequence, streamed frame by frame.
+
+    ``frames`` returns a fresh iterator over the sequence; it is consumed
+    twice, because HOTA's per-frame matching depends on id-pair alignment
+    scores over the whole sequence. Memory is bounded by the number of
+    track ids and of overlapping id pairs, not by the sequence length.
+    CLEAR-MOT follows the MOTChallenge devkit (correspondences carried over
+    while IoU stays at ``iou_thresh``, remaining pairs matched optimally),
+    IDF1 uses the optimal global id assignment and HOTA follows TrackEval.
+    """
+    counts, gids, pids, id_pairs, potential = _clear_pass(frames(), iou_thresh)
+    rows, cols, n = id_pairs.items()
+    matches = max_weight_assignment(len(gids), len(pids), rows, cols, n)
+    idtp = float(id_pairs.lookup(matches[:, 0], matches[:, 1]).sum()) if matches.size else 0.0
+    hota = _hota_pass(frames(), gids, pids, potential)
+    return _finish({**counts, "idtp": idtp, "gt_ids": len(gids), "pred_ids": len(pids), "hota": hota})
+
+
+def _finish(c: Dict[str, Any]) -> Dict[str, Any]:
+    """Metrics from summed counts (one sequence or several)."""
+    gt, pred, h = c["gt"], c["pred"], c["hota"]
+    det_a = h["tp"] / np.maximum(1.0, h["tp"] + h["fn"] + h["fp"])
+    ass_a = h["ass"] / np.maximum(1.0, h["tp"])
+    hota = np.sqrt(det_a * ass_a)
+    return {
+        "mota": 1.0 - (c["fn"] + c["fp"] + c["idsw"]) / gt if gt else 0.0,
+        "motp": c["iou_sum"] / c["matches"] if c["matches"] else 0.0,
+        "idf1": 2.0 * c["idtp"] / (gt + pred) if gt + pred else 0.0,
+        "idp": c["idtp"] / pred if pred else 0.0,
+        "idr": c["idtp"] / gt if gt else 0.0,
+        "hota": float(hota.mean()),
+        "deta": float(det_a.mean()),
+        "assa": float(ass_a.mean()),
+        "loca": float((np.maximum(1e-10, h["loc"]) / np.maximum(1e-10, h["tp"])).mean()),
+        "hota50": float(hota[np.argmin(np.abs(HOTA_ALPHAS - 0.5))]),
+        "frames": int(c["frames"]),
+        "gt": int(gt),
+        "pred": int(pred),
+        "matches": int(c["matches"]),
+        "fp": int(c["fp"]),
+        "fn": int(c["fn"]),
+        "idsw": int(c["idsw"]),
+        "gt_ids": int(c["gt_ids"]),
+        "pred_ids": int(c["pred_ids"]),
+        "_counts": c,
+    }
+
+
+def combine(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Metrics over several sequences, from their summed counts (not a mean of per-sequence scores)."""
+    keys = ("frames", "gt", "pred", "matches", "fp", "fn", "idsw", "iou_sum", "idtp", "gt_ids", "pred_ids")
+    total: Dict[str, Any] = {k: sum(r["_counts"][k] for r in results) for k in keys}
+    total["hota"] = {k: sum((r["_counts"]["hota"][k] for r in results), np.zeros(len(HOTA_ALPHAS))) for k in ("tp", "fn", "fp", "loc", "ass")}
+    return _finish(total)
+
+
+def _spill_runs(path: Path, gt: bool, chunk_lines: int, out: Path) -> List[Tuple[Path, Path]]:
+    """One chunked pass over a MOTChallenge text file, saving each chunk frame-sorted as a run.
+
+    Rows are (frame, id, x, y, w, h, conf); each run is a ``rows``/``frames``
+    pair of ``.npy`` files under ``out``. Any row order is accepted (MOT17
+    ``gt.txt`` is sorted by track); only one chunk is in memory at a time.
+    """
+    out.mkdir(parents=True, exist_ok=True)
+    runs: List[Tuple[Path, Path]] = []
+    with path.open("r", encoding="utf-8") as f:
+        n_col = 0
+        while True:
+            lines = [ln for ln in f.readlines(max(1, chunk_lines) * 64) if ln.strip()]
+            if not lines:
+                return runs
+            n_col = n_col or len(lines[0].strip().split(","))
+            block = np.loadtxt(lines, delimiter=",", usecols=range(min(7, n_col)), ndmin=2, dtype=np.float64)
+            if block.shape[1] < 7:
+                block = np.concatenate([block, np.ones((block.shape[0], 7 - block.shape[1]))], axis=1)
+            if gt:
+                block = block[block[:, 6] != 0]  # gt conf 0 marks entries to ignore
+            if not len(block):
+                continue
+            block = block[np.argsort(block[:, 0], kind="stable")]
+            rows_path, frames_path = out / f"{len(runs)}.rows.npy", out / f"{len(runs)}.frames.npy"
+            np.save(rows_path, block)
+            np.save(frames_path, np.ascontiguousarray(block[:, 0]))
+            runs.append((rows_path, frames_path))
+
+
+def _merge_runs(runs: List[Tuple[Path, Path]], chunk_lines: int) -> Iterator[np.ndarray]:
+    """Frame-ordered row blocks from sorted runs; every block holds whole frames.
+
+    A k-way merge over memory-mapped runs: each step takes about
+    ``chunk_lines / k`` rows from every run, up to the smallest last frame
+    among them, so memory stays near one chunk. Rows of a frame keep their
+    file order. Runs of a frame-sorted file do not overlap and are simply
+    read one after another.
+    """
+    rows = [np.load(r, mmap_mode="r") for r, _ in runs]
+    frames = [np.load(f, mmap_mode="r") for _, f in runs]
+    heads = [0] * len(runs)
+    while True:
+        live = [i for i in range(len(runs)) if heads[i] < len(frames[i])]
+        if not live:
+            return
+        window = max(1, chunk_lines // len(live))
+        bound = min(frames[i][min(heads[i] + window, len(frames[i])) - 1] for i in live)
+        parts = []
+        for i in live:
+            end = heads[i] + int(np.searchsorted(frames[i][heads[i]:], bound, side="right"))
+            if end > heads[i]:
+                parts.append(np.asarray(rows[i][heads[i]:end]))
+                heads[i] = end
+        block = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        yield block[np.argsort(block[:, 0], kind="stable")] if len(parts) > 1 else block
+
+
+def _run_frames(runs: List[Tuple[Path, Path]], chunk_lines: int) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    for block in _merge_runs(runs, chunk_lines):
+        yield from _split_frames(block)
+
+
+def read_mot_frames(path: str | Path, gt: bool = False, chunk_lines: int = 65536) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """``(frame, ids, boxes xyxy)`` per frame of a MOTChallenge ``frame,id,x,y,w,h,conf,...`` file.
+
+    The file may be in any row order; it is sorted externally in chunks of
+    about ``chunk_lines`` rows (see :func:`_spill_runs`).
+    """
+    with tempfile.TemporaryDirectory(prefix="mot-") as tmp:
+        yield from _run_frames(_spill_runs(Path(path), gt, chunk_lines, Path(tmp)), chunk_lines)
+
+
+def _split_frames(rows: np.ndarray) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    if not rows.size:
+        return
+    starts = np.flatnonzero(np.r_[True, rows[1:, 0] != rows[:-1, 0]])
+    for a, b in zip(starts, np.r_[starts[1:], len(rows)]):
+        r = rows[a:b]
+        boxes = np.stack([r[:, 2], r[:, 3], r[:, 2] + r[:, 4], r[:, 3] + r[:, 5]], axis=1)
+        yield int(r[0, 0]), r[:, 1].astype(np.int64), boxes
+
+
+def zip_frames(
+    gt: Iterable[Tuple[int, np.ndarray, np.ndarray]], pred: Iterable[Tuple[int, np.ndarray, np.ndarray]]
+) -> Iterator[Frame]:
+    """Align two frame-ordered streams; a frame missing on one side is empty there."""
+    gi, pi = iter(gt), iter(pred)
+    g, p = next(gi, None), next(pi, None)
+    while g is not None or p is not None:
+        if p is None or (g is not None and g[0] < p[0]):
+            yield g[1], g[2], _EMPTY_IDS, _EMPTY_BOXES
+            g = next(gi, None)
+        elif g is None or p[0] < g[0]:
+            yield _EMPTY_IDS, _EMPTY_BOXES, p[1], p[2]
+            p = next(pi, None)
+        else:
+            yield g[1], g[2], p[1], p[2]
+            g, p = next(gi, None), next(pi, None)
+
+
+def evaluate_mot_files(
+    gt_path: str | Path, pred_path: str | Path, iou_thresh: float = 0.5, chunk_lines: int = 65536
+) -> Dict[str, Any]:
+    """:func:`evaluate_mot` on a MOTChallenge ground-truth / tracker-output file pair.
+
+    Each text file is parsed once into sorted runs; every metric pass merges those.
+    """
+    with tempfile.TemporaryDirectory(prefix="mot-") as tmp:
+        gt_runs = _spill_runs(Path(gt_path), True, chunk_lines, Path(tmp) / "gt")
+        pred_runs = _spill_runs(Path(pred_path), False, chunk_lines, Path(tmp) / "pred")
+        return evaluate_mot(
+            lambda: zip_frames(_run_frames(gt_runs, chunk_lines), _run_frames(pred_runs, chunk_lines)), iou_thresh
+        )
+
+
+def evaluate_tracking_set(path: str | Path, iou_thresh: float = 0.5) -> Dict[str, Any]:
+    """Score a tracking eval set: a JSON list of ``{"name", "gt", "pred"}`` MOTChallenge file pairs.
+
+    Paths are relative to the set file. Returns the combined metrics plus
+    ``sequences`` with each sequence's own.
+    """
+    path = Path(path)
+    entries = json.loads(path.read_text(encoding="utf-8")) if path.exists() else []
+    results: Dict[str, Dict[str, Any]] = {}
+    for i, entry in enumerate(entries if isinstance(entries, list) else []):
+        name = str(entry.get("name", i))
+        results[name] = evaluate_mot_files(path.parent / entry["gt"], path.parent / entry["pred"], iou_thresh)
+    out = combine(list(results.values())) if results else _finish(_zero_counts())
+    out.pop("_counts")
+    out["sequences"] = {name: {k: v for k, v in r.items() if k != "_counts"} for name, r in results.items()}
+    return out
+
+
+def _zero_counts() -> Dict[str, Any]:
+    zeros = np.zeros(len(HOTA_ALPHAS))
+    base: Dict[str, Any] = dict.fromkeys(("frames", "gt", "pred", "matches", "fp", "fn", "idsw", "iou_sum", "idtp", "gt_ids", "pred_ids"), 0)
+    base["hota"] = {k: zeros for k in ("tp", "fn", "fp", "loc", "ass")}
+    return base
+
+
+def frames_from_lists(frames: List[Dict[str, Any]]) -> Callable[[], Iterator[Frame]]:
+    """Frame factory over in-memory ``[{"gt": [[id, x, y, w, h], ...], "pred": [...]}, ...]``."""
+
+    def _arr(items: Optional[List[List[float]]]) -> Tuple[np.ndarray, np.ndarray]:
+        a = np.asarray(items or [], dtype=np.float64).reshape(-1, 5)
+        return a[:, 0].astype(np.int64), np.stack([a[:, 1], a[:, 2], a[:, 1] + a[:, 3], a[:, 2] + a[:, 4]], axis=1)
+
+    def _iter() -> Iterator[Frame]:
+        for fr in frames:
+            yield (*_arr(fr.get("gt")), *_arr(fr.get("pred")))
+
+    return _iter
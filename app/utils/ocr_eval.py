@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.assignment import linear_assignment
+from app.utils.metrics import iou_matrix_xyxy
+
+# Per-sample counts; summed over a set before rates are taken
+_COUNTS = ("char_edits", "chars", "word_edits", "words", "exact", "matched", "gt", "pred")
+
+
+def _banded(a: Sequence[Any], b: Sequence[Any], k: int) -> int:
+    """Levenshtein distance if it is at most ``k``, else ``k + 1``; O(len(a) * k).
+
+    Only cells within ``k`` of the diagonal are computed (Ukkonen): row ``i``
+    keeps columns ``j = i - k .. i + k`` at band offsets ``t = j - i + k``.
+    """
+    n, m = len(a), len(b)
+    if abs(n - m) > k:
+        return k + 1
+    big = k + 1
+    width = 2 * k + 1
+    prev = [t - k if 0 <= t - k <= m else big for t in range(width)] + [big]
+    for i in range(1, n + 1):
+        ai = a[i - 1]
+        cur = [big] * (width + 1)
+        left = big
+        for t in range(width):
+            j = i + t - k
+            if j < 0 or j > m:
+                left = big
+                continue
+            if j == 0:
+                v = i
+            else:
+                v = prev[t] + (ai != b[j - 1])
+                if prev[t + 1] + 1 < v:
+                    v = prev[t + 1] + 1
+                if left + 1 < v:
+                    v = left + 1
+            cur[t] = left = v if v < big else big
+        if min(cur) > k:
+            return big
+        prev = cur
+    return prev[m - n + k]
+
+
+def edit_distance(a: Sequence[Any], b: Sequence[Any]) -> int:
+    """Levenshtein distance between two strings (or token lists).
+
+    Common prefixes and suffixes are stripped, then a banded computation is
+    run with the band doubled until the distance fits inside it, so cost is
+    O(n * d) for ``d`` edits rather than O(n * m).
+    """
+    lo = 0
+    hi_a, hi_b = len(a), len(b)
+    while lo < hi_a and lo < hi_b and a[lo] == b[lo]:
+        lo += 1
+    while hi_a > lo and hi_b > lo and a[hi_a - 1] == b[hi_b - 1]:
+        hi_a -= 1
+        hi_b -= 1
+    a, b = a[lo:hi_a], b[lo:hi_b]
+    if not a or not b:
+        return max(len(a), len(b))
+    k = max(1, abs(len(a) - len(b)))
+    while True:
+        d = _banded(a, b, k)
+        if d <= k:
+            return d
+        k = min(2 * k, max(len(a), len(b)))
+
+
+def normalize_text(text: str) -> str:
+    """NFKC, case-folded, whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def _boxes(items: List[Dict[str, Any]]) -> np.ndarray:
+    return np.array([[float(v) for v in it["box"]] for it in items], dtype=np.float64).reshape(-1, 4)
+
+
+def score_sample(
+    gt: List[Dict[str, Any]], pred: List[Dict[str, Any]], iou_thresh: float = 0.5, normalize: bool = True
+) -> Dict[str, int]:
+    """Edit counts of one image's ``{"text", "box"}`` predictions against its ground truth.
+
+    Items are paired one-to-one by box IoU (optimal, at least ``iou_thresh``;
+    boxes are ``[x1, y1, x2, y2]``). A missed gt line costs all its
+    characters and words, an unmatched prediction all of its own.
+    """
+    norm = normalize_text if normalize else (lambda s: s)
+    g_txt = [norm(str(it.get("text", ""))) for it in gt]
+    p_txt = [norm(str(it.get("text", ""))) for it in pred]
+    out = dict.fromkeys(_COUNTS, 0)
+    out.update(gt=len(gt), pred=len(pred), chars=sum(len(t) for t in g_txt), words=sum(len(t.split()) for t in g_txt))
+    matches = np.empty((0, 2), dtype=np.int64)
+    if gt and pred:
+        iou = iou_matrix_xyxy(_boxes(gt), _boxes(pred))
+        matches, _, _ = linear_assignment(1.0 - iou, 1.0 - iou_thresh)
+        matches = matches[iou[matches[:, 0], matches[:, 1]] >= iou_thresh]
+    g_hit = np.zeros(len(gt), dtype=bool)
+    p_hit = np.zeros(len(pred), dtype=bool)
+    for gi, pi in matches.tolist():
+        g_hit[gi] = p_hit[pi] = True
+        ref, hyp = g_txt[gi], p_txt[pi]
+        out["char_edits"] += edit_distance(ref, hyp)
+        out["word_edits"] += edit_distance(ref.split(), hyp.split())
+        out["exact"] += int(ref == hyp)
+    out["matched"] = int(len(matches))
+    for i in np.flatnonzero(~g_hit).tolist():
+        out["char_edits"] += len(g_txt[i])
+        out["word_edits"] += len(g_txt[i].split())
+    for i in np.flatnonzero(~p_hit).tolist():
+        out["char_edits"] += len(p_txt[i])
+        out["word_edits"] += len(p_txt[i].split())
+    return out
+
+
+def sample_key(sample: Dict[str, Any], iou_thresh: float, normalize: bool) -> str:
+    """Content hash of a sample and the scoring options; unchanged samples keep their key."""
+    blob = json.dumps(
+        {"gt": sample.get("gt") or [], "pred": sample.get("pred") or [], "iou": iou_thresh, "norm": normalize},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _score_shard(args: Tuple[List[Dict[str, Any]], float, bool]) -> List[Dict[str, int]]:
+    samples, iou_thresh, normalize = args
+    return [score_sample(s.get("gt") or [], s.get("pred") or [], iou_thresh, normalize) for s in samples]
+
+
+def _load_cache(path: Optional[Path]) -> Dict[str, Dict[str, int]]:
+    if path is None:
+        return {}
+    try:
+        return dict(json.loads(path.read_text(encoding="utf-8")))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path: Path, cache: Dict[str, Dict[str, int]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(cache, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def evaluate_ocr(
+    samples: List[Dict[str, Any]],
+    iou_thresh: float = 0.5,
+    normalize: bool = True,
+    workers: int = 0,
+    min_parallel_samples: int = 2000,
+    shard_samples: int = 500,
+    cache_path: str | Path | None = None,
+) -> Dict[str, Any]:
+    """CER/WER of OCR predictions over ``[{"gt": [...], "pred": [...]}, ...]`` samples.
+
+    Returns ``cer`` and ``wer`` (edits over ground-truth characters/words,
+    so they can exceed 1), ``acc`` (gt lines read exactly), box ``recall``
+    and ``precision`` plus the summed counts. Per-sample counts are cached
+    in ``cache_path`` by :func:`sample_key`, so a rerun only scores samples
+    that changed; with ``workers`` > 1 (0 = one per CPU) and at least
+    ``min_parallel_samples`` of them they are sharded across a process pool.
+    """
+    path = Path(cache_path) if cache_path else None
+    cache = _load_cache(path)
+    keys = [sample_key(s, iou_thresh, normalize) for s in samples]
+    first: Dict[str, int] = {}
+    for i, k in enumerate(keys):
+        first.setdefault(k, i)
+    todo = [k for k in first if k not in cache]
+    fresh = [samples[first[k]] for k in todo]
+
+    workers = int(workers) or (os.cpu_count() or 1)
+    if workers > 1 and len(fresh) >= max(1, min_parallel_samples):
+        size = max(1, int(shard_samples))
+        shards = [fresh[i:i + size] for i in range(0, len(fresh), size)]
+        # Spawned, not forked: reached from /evaluate inside the multi-threaded API process
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=multiprocessing.get_context("spawn")) as pool:
+            scored = [r for part in pool.map(_score_shard, [(s, iou_thresh, normalize) for s in shards]) for r in part]
+    else:
+        scored = _score_shard((fresh, iou_thresh, normalize))
+    for k, res in zip(todo, scored):
+        cache[k] = res
+    if path is not None and scored:
+        _save_cache(path, cache)
+
+    total = dict.fromkeys(_COUNTS, 0)
+    for k in keys:
+        for name in _COUNTS:
+            total[name] += int(cache[k][name])
+    return {
+        "cer": total["char_edits"] / total["chars"] if total["chars"] else 0.0,
+        "wer": total["word_edits"] / total["words"] if total["words"] else 0.0,
+        "acc": total["exact"] / total["gt"] if total["gt"] else 0.0,
+        "recall": total["matched"] / total["gt"] if total["gt"] else 0.0,
+        "precision": total["matched"] / total["pred"] if total["pred"] else 0.0,
+        "samples": len(samples),
+        "scored": len(scored),
+        "cached": len(samples) - len(scored),
+        **total,
+    }
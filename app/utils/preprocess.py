@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import cv2
+
+_PAD_VALUE = 114  # YOLO letterbox gray
+
+
+@dataclass(frozen=True)
+class FrameTransform:
+    """Geometry of one source frame -> upload image resize.
+
+    Provider outputs are in upload coordinates (``dst_w`` x ``dst_h``);
+    the ``*_to_source`` helpers map them back onto the source frame.
+    """
+
+    src_w: int
+    src_h: int
+    dst_w: int
+    dst_h: int
+    scale: float = 1.0
+    pad_x: int = 0
+    pad_y: int = 0
+
+    @property
+    def identity(self) -> bool:
+        return self.dst_w == self.src_w and self.dst_h == self.src_h and not (self.pad_x or self.pad_y)
+
+    def box_to_source(self, box: Sequence[float]) -> List[float]:
+        x1, y1, x2, y2 = (float(v) for v in box)
+        if self.identity:
+            return [x1, y1, x2, y2]
+        s = self.scale
+        return [
+            min(max((x1 - self.pad_x) / s, 0.0), float(self.src_w)),
+            min(max((y1 - self.pad_y) / s, 0.0), float(self.src_h)),
+            min(max((x2 - self.pad_x) / s, 0.0), float(self.src_w)),
+            min(max((y2 - self.pad_y) / s, 0.0), float(self.src_h)),
+        ]
+
+    def boxes_to_source(self, boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Box dicts (``x1``..``y2`` keys) mapped to source pixels; other keys kept."""
+        if self.identity:
+            return boxes
+        out = []
+        for b in boxes:
+            x1, y1, x2, y2 = self.box_to_source((b["x1"], b["y1"], b["x2"], b["y2"]))
+            out.append({**b, "x1": x1, "y1": y1, "x2": x2, "y2": y2})
+        return out
+
+    def mask_to_source(self, mask: np.ndarray) -> np.ndarray:
+        """Upload-sized mask cropped out of the padding and resized to the source frame."""
+        if self.identity:
+            return mask
+        w = max(1, int(round(self.src_w * self.scale)))
+        h = max(1, int(round(self.src_h * self.scale)))
+        roi = mask[self.pad_y:self.pad_y + h, self.pad_x:self.pad_x + w]
+        return cv2.resize(roi, (self.src_w, self.src_h), interpolation=cv2.INTER_NEAREST)
+
+
+def plan_resize(width: int, height: int, input_size: int, letterbox: bool = False) -> FrameTransform:
+    """Downscale so the long side is ``input_size`` (never upscale).
+
+    With ``letterbox`` the result is padded to an ``input_size`` square,
+    centered, as square-input detectors expect.
+    """
+    if input_size <= 0 or width <= 0 or height <= 0:
+        return FrameTransform(width, height, width, height)
+    scale = min(1.0, float(input_size) / max(width, height))
+    w = max(1, int(round(width * scale)))
+    h = max(1, int(round(height * scale)))
+    if not letterbox:
+        return FrameTransform(width, height, w, h, scale)
+    side = max(input_size, w, h)
+    return FrameTransform(width, height, side, side, scale, (side - w) // 2, (side - h) // 2)
+
+
+def apply_resize(frame: np.ndarray, xf: FrameTransform) -> np.ndarray:
+    if xf.identity:
+        return frame
+    w = max(1, int(round(xf.src_w * xf.scale)))
+    h = max(1, int(round(xf.src_h * xf.scale)))
+    small = frame if (w, h) == (xf.src_w, xf.src_h) else cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+    if not (xf.pad_x or xf.pad_y or (w, h) != (xf.dst_w, xf.dst_h)):
+        return small
+    return cv2.copyMakeBorder(
+        small,
+        xf.pad_y,
+        xf.dst_h - h - xf.pad_y,
+        xf.pad_x,
+        xf.dst_w - w - xf.pad_x,
+        cv2.BORDER_CONSTANT,
+        value=(_PAD_VALUE, _PAD_VALUE, _PAD_VALUE),
+    )
+
+
+def encode_jpeg(frame: np.ndarray, quality: int = 90) -> Optional[bytes]:
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return buf.tobytes() if ok else None
+
+
+def prepare_upload(
+    image: bytes, input_size: int, quality: int = 90, letterbox: bool = False
+) -> Tuple[bytes, FrameTransform, Optional[np.ndarray]]:
+    """Encoded frame -> (upload bytes, transform, decoded source frame or None).
+
+    Frames that already fit go up as received (no re-encode); undecodable
+    input is passed through with an identity transform.
+    """
+    frame = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return image, FrameTransform(0, 0, 0, 0), None
+    h, w = frame.shape[:2]
+    xf = plan_resize(w, h, input_size, letterbox)
+    if xf.identity:
+        return image, xf, frame
+    data = encode_jpeg(apply_resize(frame, xf), quality)
+    if data is None:
+        return image, FrameTransform(w, h, w, h), frame
+    return data, xf, frame
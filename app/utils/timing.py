@@ -18,6 +18,10 @@ class StageTimer:
         if start is None:
             return
         elapsed_ms = (time.perf_counter() - start) * 1000.0
+        self.record(name, elapsed_ms)
+
+    def record(self, name: str, elapsed_ms: float) -> None:
+        """Add an externally measured duration (e.g. from a worker thread)."""
         self.timings_ms[name] = self.timings_ms.get(name, 0.0) + elapsed_ms
 
 
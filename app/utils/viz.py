@@ -1,45 +1,75 @@
 from __future__ import annotations
 
-from typing import List, Tuple
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
 
 import numpy as np
 import cv2
 
 
-def draw_boxes(image: np.ndarray, boxes: List[Tuple[int, int, int, int]], color=(2, 171, 193)) -> np.ndarray:
-    out = image.copy()
-    bgr = (int(color[2]) if len(color) == 3 else 193, int(color[1]) if len(color) == 3 else 171, int(color[0]) if len(color) == 3 else 2)
-    for x1, y1, x2, y2 in boxes:
-        cv2.rectangle(out, (int(x1), int(y1)), (int(x2), int(y2)), bgr, 2)
-    return out
+def _bgr(color) -> Tuple[int, int, int]:
+    # Public colors are RGB (brand palette); OpenCV draws BGR
+    return (int(color[2]), int(color[1]), int(color[0])) if len(color) == 3 else (193, 171, 2)
 
 
-def draw_track_ids(image: np.ndarray, tracks: List[dict]) -> np.ndarray:
-    out = image.copy()
-    for t in tracks:
+@dataclass
+class OverlaySpec:
+    """Everything drawn onto one annotated frame.
+
+    ``boxes`` are (x1, y1, x2, y2) tuples or box dicts; ``masks`` are
+    full-frame uint8/bool arrays; ``hud`` lines are printed top-left.
+    """
+
+    boxes: Sequence = ()
+    masks: Sequence[np.ndarray] = ()
+    tracks: Sequence[dict] = ()
+    ocr: Sequence[dict] = ()
+    hud: Sequence[str] = ()
+    box_color: Tuple[int, int, int] = (2, 171, 193)
+    mask_color: Tuple[int, int, int] = (2, 171, 193)
+    mask_alpha: float = 0.35
+
+
+def _blend_mask(out: np.ndarray, mask: np.ndarray, bgr: Tuple[int, int, int], alpha: float) -> None:
+    if mask.shape[:2] != out.shape[:2]:
+        return
+    m = mask.view(np.uint8) if mask.dtype == bool else mask
+    x, y, w, h = cv2.boundingRect(m)
+    if w == 0 or h == 0:
+        return
+    # Blend only inside the mask's bounding ROI, written back through the mask in place
+    roi = out[y:y + h, x:x + w]
+    tint = np.empty_like(roi)
+    tint[:] = bgr
+    cv2.copyTo(cv2.addWeighted(tint, alpha, roi, 1.0 - alpha, 0), m[y:y + h, x:x + w], roi)
+
+
+def compose(image: np.ndarray, spec: OverlaySpec, inplace: bool = False) -> np.ndarray:
+    """Draw all overlay layers in one pass into a single output buffer.
+
+    Order: masks, boxes, track IDs and trails, OCR, HUD. The input is copied
+    once (or drawn on directly with ``inplace=True``).
+    """
+    out = image if inplace else image.copy()
+    mask_bgr = _bgr(spec.mask_color)
+    for m in spec.masks:
+        _blend_mask(out, m, mask_bgr, spec.mask_alpha)
+
+    box_bgr = _bgr(spec.box_color)
+    for b in spec.boxes:
+        x1, y1, x2, y2 = (b["x1"], b["y1"], b["x2"], b["y2"]) if isinstance(b, dict) else b
+        cv2.rectangle(out, (int(x1), int(y1)), (int(x2), int(y2)), box_bgr, 2)
+
+    for t in spec.tracks:
         x1, y1 = int(t.get("x1", 0)), int(t.get("y1", 0))
         tid = str(t.get("id", "?"))
         cv2.putText(out, f"ID {tid}", (x1, max(0, y1 - 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1, cv2.LINE_AA)
         trail = t.get("trail") or []
-        for i in range(1, len(trail)):
-            x_prev, y_prev = trail[i - 1]
-            x_cur, y_cur = trail[i]
-            cv2.line(out, (int(x_prev), int(y_prev)), (int(x_cur), int(y_cur)), (0, 255, 255), 1)
-    return out
-
-
-def overlay_soft_masks(image: np.ndarray, masks: List[np.ndarray], color=(2, 171, 193), alpha: float = 0.35) -> np.ndarray:
-    out = image.copy()
-    overlay = image.copy()
-    bgr = (int(color[2]), int(color[1]), int(color[0]))
-    for m in masks:
-        overlay[m > 0] = bgr
-    return cv2.addWeighted(overlay, alpha, out, 1 - alpha, 0)
-
+        if len(trail) > 1:
+            pts = np.asarray(trail, dtype=np.int32).reshape(-1, 1, 2)
+            cv2.polylines(out, [pts], False, (0, 255, 255), 1)
 
-def draw_ocr_labels(image: np.ndarray, ocr_items: List[dict]) -> np.ndarray:
-    out = image.copy()
-    for o in ocr_items:
+    for o in spec.ocr:
         box = o.get("box") or []
         if len(box) == 4:
             x1, y1, x2, y2 = map(int, box)
@@ -47,6 +77,27 @@ def draw_ocr_labels(image: np.ndarray, ocr_items: List[dict]) -> np.ndarray:
             text = str(o.get("text", ""))
             if text:
                 cv2.putText(out, text, (x1, max(0, y1 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 200, 120), 1, cv2.LINE_AA)
+
+    for i, line in enumerate(spec.hud):
+        org = (8, 20 + 18 * i)
+        cv2.putText(out, str(line), org, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 3, cv2.LINE_AA)
+        cv2.putText(out, str(line), org, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
     return out
 
 
+# Single-layer helpers; prefer ``compose`` when drawing more than one layer.
+
+def draw_boxes(image: np.ndarray, boxes: List[Tuple[int, int, int, int]], color=(2, 171, 193)) -> np.ndarray:
+    return compose(image, OverlaySpec(boxes=boxes, box_color=color))
+
+
+def draw_track_ids(image: np.ndarray, tracks: List[dict]) -> np.ndarray:
+    return compose(image, OverlaySpec(tracks=tracks))
+
+
+def overlay_soft_masks(image: np.ndarray, masks: List[np.ndarray], color=(2, 171, 193), alpha: float = 0.35) -> np.ndarray:
+    return compose(image, OverlaySpec(masks=masks, mask_color=color, mask_alpha=alpha))
+
+
+def draw_ocr_labels(image: np.ndarray, ocr_items: List[dict]) -> np.ndarray:
+    return compose(image, OverlaySpec(ocr=ocr_items))
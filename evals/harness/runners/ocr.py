@@ -1,26 +1,32 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
 from typing import Any, Dict
 
 
-def run_ocr_eval(dataset_path: str | Path) -> Dict[str, Any]:
-    p = Path(dataset_path)
-    total = 0
-    if p.exists():
-        try:
-            import json
+def run_ocr_eval(
+    dataset_path: str | Path, cache_path: str | Path | None = "runs/_cache/ocr_eval.json", workers: int = 0
+) -> Dict[str, Any]:
+    """CER/WER over an OCR eval set: a JSON list of ``{"gt": [...], "pred": [...]}`` samples.
+
+    Items are ``{"text", "box": [x1, y1, x2, y2]}`` as the OCR providers
+    return them; ``accuracy`` is the share of gt lines read exactly.
+    Per-sample scores are cached by content hash in ``cache_path``.
+    """
+    from app.utils.ocr_eval import evaluate_ocr
 
-            data = json.loads(p.read_text(encoding="utf-8"))
-            total = len(data) if isinstance(data, list) else 0
-        except Exception:
-            total = 0
+    p = Path(dataset_path)
+    data = json.loads(p.read_text(encoding="utf-8")) if p.exists() else []
+    res = evaluate_ocr(data if isinstance(data, list) else [], workers=workers, cache_path=cache_path)
     return {
         "task": "ocr",
-        "samples": int(total),
-        "accuracy": 0.0,
+        "samples": res["samples"],
+        "accuracy": res["acc"],
+        "cer": res["cer"],
+        "wer": res["wer"],
+        "scored": res["scored"],
+        "cached": res["cached"],
         "p95_latency_ms": 0.0,
         "cost_usd": 0.0,
     }
-
-
@@ -4,23 +4,24 @@ from pathlib import Path
 from typing import Any, Dict
 
 
-def run_tracking_eval(dataset_path: str | Path) -> Dict[str, Any]:
-    p = Path(dataset_path)
-    total = 0
-    if p.exists():
-        try:
-            import json
+def run_tracking_eval(dataset_path: str | Path, iou_thresh: float = 0.5) -> Dict[str, Any]:
+    """MOTA/IDF1/HOTA over the sequences of a tracking eval set.
 
-            data = json.loads(p.read_text(encoding="utf-8"))
-            total = len(data) if isinstance(data, list) else 0
-        except Exception:
-            total = 0
+    The set is a JSON list of ``{"name", "gt", "pred"}`` MOTChallenge text
+    file pairs (paths relative to the set); ``accuracy`` is the combined HOTA.
+    """
+    from app.utils.mot_eval import evaluate_tracking_set
+
+    res = evaluate_tracking_set(dataset_path, iou_thresh=iou_thresh)
     return {
         "task": "tracking",
-        "samples": int(total),
-        "accuracy": 0.0,
+        "samples": len(res["sequences"]),
+        "accuracy": res["hota"],
+        "mota": res["mota"],
+        "idf1": res["idf1"],
+        "hota": res["hota"],
+        "frames": res["frames"],
+        "sequences": res["sequences"],
         "p95_latency_ms": 0.0,
         "cost_usd": 0.0,
     }
-
-
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from app.utils.metrics import iou_matrix_xyxy, iou_pairs_xyxy, iou_xyxy, match_greedy, match_max_iou, match_optimal, match_thresholds
+
+
+def _boxes(n: int, rng: np.random.Generator) -> np.ndarray:
+    """``n`` boxes of 20-60 px scattered over a 1920x1080 frame."""
+    xy = rng.random((n, 2)) * np.array([1860.0, 1020.0])
+    wh = rng.random((n, 2)) * 40 + 20
+    return np.concatenate([xy, xy + wh], axis=1)
+
+
+def _ms(fn, repeat: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / repeat
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pairwise IoU and matching kernels vs the scalar iou_xyxy loop")
+    ap.add_argument("--n", type=int, default=1000, help="boxes per side")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    a = _boxes(args.n, rng)
+    # Jittered copies, so most rows have a true match plus a few neighbours
+    b = a + rng.normal(0.0, 3.0, a.shape)
+    al, bl = [tuple(r) for r in a.tolist()], [tuple(r) for r in b.tolist()]
+
+    t0 = time.perf_counter()
+    ref = [[iou_xyxy(p, q) for q in bl] for p in al]
+    scalar = (time.perf_counter() - t0) * 1000.0
+    iou = iou_matrix_xyxy(a, b)
+    assert np.allclose(iou, np.array(ref))
+    order = np.arange(args.n)
+    thresholds = np.linspace(0.5, 0.95, 10)
+
+    print(f"{args.n}x{args.n} boxes")
+    print(f"  iou_xyxy loop          {scalar:9.1f} ms")
+    print(f"  iou_matrix_xyxy        {_ms(lambda: iou_matrix_xyxy(a, b), args.repeat):9.1f} ms")
+    print(f"  iou_pairs_xyxy         {_ms(lambda: iou_pairs_xyxy(a, b), args.repeat):9.1f} ms")
+    print(f"  match_greedy @0.5      {_ms(lambda: match_greedy(iou, 0.5, order), args.repeat):9.1f} ms")
+    print(f"  match_thresholds x10   {_ms(lambda: match_thresholds(iou, thresholds, order), args.repeat):9.1f} ms")
+    print(f"  match_max_iou @0.5     {_ms(lambda: match_max_iou(iou, 0.5), args.repeat):9.1f} ms")
+    print(f"  match_optimal @0.5     {_ms(lambda: match_optimal(iou, 0.5), args.repeat):9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
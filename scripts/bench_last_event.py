@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.storage import RunRegistry
+
+
+def _time(fn, repeat: int) -> float:
+    """Median milliseconds per call."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return float(np.median(times))
+
+
+def _scan(path: Path) -> str | None:
+    # Previous implementation: walk every line
+    last = None
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last = line.strip()
+    return last
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="RunRegistry.read_last_event latency vs events.jsonl length")
+    ap.add_argument("--lines", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.lines:
+            reg = RunRegistry(tmp)
+            rid = reg.ensure_run(f"bench-{n}")
+            path = Path(tmp) / rid / "events.jsonl"
+            event = '{"frame_id": %d, "fps": 24.0, "boxes": [], "timings": {"pre": 1.0, "model": 30.0}}\n'
+            with path.open("w", encoding="utf-8") as f:
+                f.writelines(event % i for i in range(n))
+            cold = _time(lambda: RunRegistry(tmp).read_last_event(rid), args.repeat)
+            reg.append_event(rid, (event % n).strip())
+            live = _time(lambda: reg.read_last_event(rid), args.repeat)
+            scan = _time(lambda: _scan(path), max(1, args.repeat // 10))
+            print(f"{n:>9} lines: scan={scan:9.3f}ms  cold tail={cold:.3f}ms  live={live:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from app.utils.viz import OverlaySpec, compose
+
+
+def _legacy_chain(img: np.ndarray, spec: OverlaySpec) -> np.ndarray:
+    """The previous run_frame overlay path: one full copy per layer, full-frame mask blend."""
+    out = img.copy()
+    for x1, y1, x2, y2 in spec.boxes:
+        cv2.rectangle(out, (int(x1), int(y1)), (int(x2), int(y2)), (193, 171, 2), 2)
+    base, overlay = out.copy(), out.copy()
+    for m in spec.masks:
+        overlay[m > 0] = (193, 171, 2)
+    out = cv2.addWeighted(overlay, spec.mask_alpha, base, 1 - spec.mask_alpha, 0)
+    out = out.copy()
+    for t in spec.tracks:
+        cv2.putText(out, f"ID {t['id']}", (int(t["x1"]), max(0, int(t["y1"]) - 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1, cv2.LINE_AA)
+        trail = t["trail"]
+        for i in range(1, len(trail)):
+            cv2.line(out, tuple(trail[i - 1]), tuple(trail[i]), (0, 255, 255), 1)
+    out = out.copy()
+    for o in spec.ocr:
+        x1, y1, x2, y2 = map(int, o["box"])
+        cv2.rectangle(out, (x1, y1), (x2, y2), (0, 200, 120), 1)
+        cv2.putText(out, o["text"], (x1, max(0, y1 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 200, 120), 1, cv2.LINE_AA)
+    return out
+
+
+def _scene(w: int, h: int, n_boxes: int, n_masks: int, seed: int = 0) -> tuple[np.ndarray, OverlaySpec]:
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+    xy = rng.random((n_boxes, 2)) * [w - 120, h - 120]
+    boxes = [(x, y, x + 100, y + 80) for x, y in xy.tolist()]
+    masks = []
+    for _ in range(n_masks):
+        m = np.zeros((h, w), dtype=np.uint8)
+        cx, cy = int(rng.random() * (w - 300)) + 150, int(rng.random() * (h - 300)) + 150
+        cv2.circle(m, (cx, cy), 120, 1, -1)
+        masks.append(m)
+    tracks = [
+        {"id": i, "x1": x1, "y1": y1, "trail": [(int(x1) + 4 * k, int(y1) + 2 * k) for k in range(10)]}
+        for i, (x1, y1, _, _) in enumerate(boxes)
+    ]
+    ocr = [{"box": [x1, y1, x1 + 60, y1 + 20], "text": "ABC123"} for x1, y1, _, _ in boxes[:5]]
+    return img, OverlaySpec(boxes=boxes, masks=masks, tracks=tracks, ocr=ocr)
+
+
+def _time(fn, reps: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - t0) / reps * 1000.0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Overlay compositing cost per frame: legacy chain vs compose()")
+    ap.add_argument("--width", type=int, default=1920)
+    ap.add_argument("--height", type=int, default=1080)
+    ap.add_argument("--boxes", type=int, default=30)
+    ap.add_argument("--masks", type=int, default=3)
+    ap.add_argument("--reps", type=int, default=50)
+    args = ap.parse_args()
+
+    img, spec = _scene(args.width, args.height, args.boxes, args.masks)
+    legacy = _time(lambda: _legacy_chain(img, spec), args.reps)
+    single = _time(lambda: compose(img, spec), args.reps)
+    work = img.copy()
+    inplace = _time(lambda: compose(work, spec, inplace=True), args.reps)
+    print(f"{args.width}x{args.height}, {args.boxes} boxes/tracks, {args.masks} masks")
+    print(f"legacy chain      {legacy:8.2f} ms/frame")
+    print(f"compose (copy)    {single:8.2f} ms/frame  ({legacy / single:.1f}x)")
+    print(f"compose (inplace) {inplace:8.2f} ms/frame  ({legacy / inplace:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,18 @@ import sys
 import json
 
 from app.agents.evaluator import EvaluatorAgent
+from app.utils.config import load_providers_config
 
 
 def main() -> None:
     if len(sys.argv) < 3:
-        print("Usage: python scripts/run_evaluate.py <dataset_json> <comma_tasks>")
+        print("Usage: python scripts/run_evaluate.py <dataset_json> <comma_tasks> [predictions_json]")
         sys.exit(1)
     dataset = sys.argv[1]
     tasks = sys.argv[2].split(",")
-    agent = EvaluatorAgent(config={})
-    result = agent.evaluate(dataset, tasks)
+    predictions = sys.argv[3] if len(sys.argv) > 3 else None
+    agent = EvaluatorAgent(config=load_providers_config())
+    result = agent.evaluate(dataset, tasks, predictions_path=predictions)
     print(json.dumps(result, indent=2))
 
 
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from fastapi.testclient import TestClient
-from app.services.api import app
+from app.services.api import app, registry
 
 
 client = TestClient(app)
@@ -38,3 +38,268 @@ def test_ab_compare_happy_path(tmp_path, monkeypatch) -> None:
     r = client.post("/ab_compare", json={"video_path": vid})
     assert r.status_code == 200
     assert r.json().get("ok") is True
+
+
+def test_run_frame_reports_stage_timings(monkeypatch) -> None:
+    import base64
+    import cv2
+    import numpy as np
+    monkeypatch.delenv("REPLICATE_API_TOKEN", raising=False)
+    ok, buf = cv2.imencode(".jpg", np.zeros((32, 48, 3), dtype=np.uint8))
+    assert ok
+    r = client.post("/run_frame", json={"image_b64": base64.b64encode(buf.tobytes()).decode("utf-8")})
+    assert r.status_code == 200
+    js = r.json()
+    assert set(js["timings"]) >= {"pre", "model", "det", "seg", "ocr"}
+    assert js["boxes"] == [] and js["errors"] == []
+
+
+def test_run_frames_streams_ndjson_and_logs_each_frame(monkeypatch) -> None:
+    import asyncio
+    import base64
+    import json
+    import uuid
+    from pathlib import Path
+
+    import cv2
+    import numpy as np
+    monkeypatch.delenv("REPLICATE_API_TOKEN", raising=False)
+    ok, buf = cv2.imencode(".png", np.zeros((16, 16, 3), dtype=np.uint8))
+    b64 = base64.b64encode(buf.tobytes()).decode("utf-8")
+    run_id = f"batch-{uuid.uuid4().hex[:8]}"
+    # A frame is in the run's log as soon as it is streamed; stopping early keeps it
+    from starlette.requests import Request
+    from app.services.api import run_frames
+
+    async def first_then_stop():
+        body = json.dumps({"images_b64": [b64] * 3, "run_id": run_id, "concurrency": 1}).encode()
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        scope = {"type": "http", "method": "POST", "path": "/run_frames", "query_string": b"", "headers": [(b"content-type", b"application/json")]}
+        stream = (await run_frames(Request(scope, receive))).body_iterator
+        first = json.loads(await stream.__anext__())
+        logged = registry.read_last_event(run_id)
+        await stream.aclose()
+        return first, logged
+
+    first, logged = asyncio.run(first_then_stop())
+    assert first["frame_id"] == 0 and json.loads(logged)["frame_id"] == 0
+    registry.flush(run_id)
+    assert len((Path("runs") / run_id / "events.jsonl").read_text().splitlines()) == 1
+    run_id = f"batch-{uuid.uuid4().hex[:8]}"
+    r = client.post("/run_frames", json={"images_b64": [b64] * 3, "run_id": run_id, "concurrency": 2})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in r.text.splitlines()]
+    assert [e["frame_id"] for e in events] == [0, 1, 2]
+    assert r.headers["x-run-id"] == run_id
+    # Appends are batched by the background writer; flush before reading the file directly
+    registry.flush(run_id)
+    assert len((Path("runs") / run_id / "events.jsonl").read_text().splitlines()) == 3
+
+    files = [("files", (f"f{i}.png", buf.tobytes(), "image/png")) for i in range(2)]
+    r = client.post("/run_frames", files=files, data={"run_id": run_id, "annotate": "true"})
+    events = [json.loads(line) for line in r.text.splitlines()]
+    assert len(events) == 2 and events[0]["annotated_b64"]
+    registry.flush(run_id)
+    assert len((Path("runs") / run_id / "events.jsonl").read_text().splitlines()) == 5
+
+
+def test_ws_run_video_streams_events(tmp_path) -> None:
+    import cv2
+    import numpy as np
+    vid = str(tmp_path / "tiny.mp4")
+    out = cv2.VideoWriter(vid, cv2.VideoWriter_fourcc(*"mp4v"), 5.0, (64, 48))
+    for _ in range(4):
+        out.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    out.release()
+    events = []
+    with client.websocket_connect(f"/ws/run_video?video_path={vid}") as ws:
+        try:
+            while True:
+                events.append(ws.receive_json())
+        except Exception:
+            pass
+    assert [e["frame_id"] for e in events] == list(range(len(events)))
+    assert len(events) == 4
+    assert client.get("/health").status_code == 200
+
+
+def test_binary_frame_ingress(monkeypatch) -> None:
+    import cv2
+    import numpy as np
+    monkeypatch.delenv("REPLICATE_API_TOKEN", raising=False)
+    ok, buf = cv2.imencode(".jpg", np.zeros((24, 32, 3), dtype=np.uint8))
+    jpeg = buf.tobytes()
+    r = client.post("/run_frame?run_id=binary-ingress", content=jpeg, headers={"Content-Type": "image/jpeg"})
+    assert r.status_code == 200 and r.json()["run_id"] == "binary-ingress" and r.json()["annotated_b64"]
+    r = client.post("/run_frame", files={"file": ("f.jpg", jpeg, "image/jpeg")}, data={"run_id": "binary-ingress"})
+    assert r.status_code == 200 and r.json()["annotated_b64"]
+    assert client.post("/run_frame", json={"profile": "realtime"}).status_code == 422
+
+    with client.websocket_connect("/ws/run_frames?run_id=binary-ws") as ws:
+        for _ in range(3):
+            ws.send_bytes(jpeg)
+        ws.send_text("end")
+        events = [ws.receive_json() for _ in range(3)]
+    assert [e["frame_id"] for e in events] == [0, 1, 2]
+    assert all(e["run_id"] == "binary-ws" and e["errors"] == [] for e in events)
+
+
+def test_ws_run_frames_bounds_inference_in_flight(monkeypatch) -> None:
+    import asyncio
+
+    from app.providers.detection.replicate import ReplicateDetector
+
+    state = {"now": 0, "peak": 0}
+
+    async def slow_infer(self, image):
+        state["now"] += 1
+        state["peak"] = max(state["peak"], state["now"])
+        await asyncio.sleep(0.02)
+        state["now"] -= 1
+        return []
+
+    monkeypatch.setattr(ReplicateDetector, "ainfer", slow_infer)
+    with client.websocket_connect("/ws/run_frames") as ws:
+        for _ in range(8):
+            ws.send_bytes(b"frame")
+        ws.send_text("end")
+        events = [ws.receive_json() for _ in range(8)]
+    assert [e["frame_id"] for e in events] == list(range(8))
+    assert state["peak"] == 2  # detection.concurrency
+
+def test_run_frame_uploads_at_profile_input_size(monkeypatch) -> None:
+    import cv2
+    import numpy as np
+    from app.providers.detection.replicate import Detection, ReplicateDetector
+    seen = []
+
+    def _infer(self, image, deadline=None):
+        seen.append(cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR).shape[:2])
+        return [Detection(x1=64, y1=36, x2=128, y2=72, score=0.9, cls="car")]
+
+    monkeypatch.setattr(ReplicateDetector, "infer", _infer)
+    jpeg = cv2.imencode(".jpg", np.zeros((720, 1280, 3), dtype=np.uint8))[1].tobytes()
+    r = client.post("/run_frame?profile=realtime&run_id=preprocess", content=jpeg, headers={"Content-Type": "image/jpeg"})
+    assert r.status_code == 200 and seen == [(360, 640)]
+    box = r.json()["boxes"][0]
+    assert (box["x1"], box["y1"], box["x2"], box["y2"]) == (128, 72, 256, 144)
+    assert r.json()["timings"]["pre"] > 0
+
+
+def test_events_cursor_and_etag() -> None:
+    import uuid
+
+    rid = registry.ensure_run(f"events-{uuid.uuid4().hex[:8]}")
+    registry.append_events(rid, [f'{{"frame_id": {i}, "fps": 10}}' for i in range(3)])
+    r = client.get(f"/events?run_id={rid}&cursor=0")
+    js = r.json()
+    assert [e["frame_id"] for e in js["events"]] == [0, 1, 2]
+    r2 = client.get(f"/events?run_id={rid}&cursor={js['cursor']}")
+    assert r2.json()["events"] == []
+    etag = r2.headers["etag"]
+    assert client.get(f"/events?run_id={rid}&cursor={js['cursor']}", headers={"If-None-Match": etag}).status_code == 304
+    registry.append_event(rid, '{"frame_id": 3, "fps": 10}')
+    r3 = client.get(f"/events?run_id={rid}&cursor={js['cursor']}", headers={"If-None-Match": etag})
+    assert r3.status_code == 200 and [e["frame_id"] for e in r3.json()["events"]] == [3]
+    snap = client.get("/events_snapshot?limit=2").json()
+    assert snap["run_id"] == rid and snap["frame_ids"] == [2, 3]
+
+
+def test_run_stats_endpoint_tracks_appends() -> None:
+    import json
+    import uuid
+    from app.services.api import registry
+
+    rid = registry.ensure_run(f"stats-{uuid.uuid4().hex[:8]}")
+    registry.append_events(rid, [json.dumps({"frame_id": i, "fps": 20.0, "timings": {"pre": 1.0, "model": float(i)}}) for i in range(1, 101)])
+    js = client.get(f"/runs/{rid}/stats").json()
+    assert js["frames"] == 100 and js["stats"]["fps"]["mean"] == 20.0
+    assert abs(js["stats"]["model_ms"]["p95"] - 95) <= 1 and js["stats"]["total_ms"]["max"] == 101.0
+    registry.append_event(rid, json.dumps({"frame_id": 101, "fps": 20.0, "timings": {"model": 1000.0}}))
+    js = client.get(f"/runs/{rid}/stats").json()
+    assert js["frames"] == 101 and js["stats"]["model_ms"]["max"] == 1000.0
+    assert client.get("/runs/no-such-run/stats").status_code == 404
+
+
+def test_live_eval_tracks_run_events(tmp_path) -> None:
+    import json
+    import uuid
+    from app.utils.coco_eval import evaluate_detections
+
+    gt = {
+        "images": [{"id": 10}, {"id": 11}, {"id": 12}],
+        "categories": [{"id": 1, "name": "car"}, {"id": 2, "name": "person"}],
+        "annotations": [
+            {"id": 1, "image_id": 10, "category_id": 1, "bbox": [0, 0, 10, 10]},
+            {"id": 2, "image_id": 11, "category_id": 2, "bbox": [20, 20, 10, 20]},
+            {"id": 3, "image_id": 12, "category_id": 1, "bbox": [5, 5, 10, 10]},
+            {"id": 4, "image_id": 12, "category_id": 2, "bbox": [50, 50, 10, 10]},
+        ],
+    }
+    path = tmp_path / "gt.json"
+    path.write_text(json.dumps(gt), encoding="utf-8")
+    frames = [
+        [{"x1": 0, "y1": 0, "x2": 10, "y2": 10, "score": 0.9, "cls": "car"}],
+        [{"x1": 20, "y1": 20, "x2": 30, "y2": 40, "score": 0.6, "cls": "Person"}, {"x1": 0, "y1": 0, "x2": 5, "y2": 5, "score": 0.3, "cls": "car"}],
+        [{"x1": 6, "y1": 5, "x2": 16, "y2": 15, "score": 0.8, "cls": "car"}, {"x1": 0, "y1": 0, "x2": 1, "y2": 1, "score": 0.5, "cls": "dog"}],
+    ]
+    rid = registry.ensure_run(f"live-{uuid.uuid4().hex[:8]}")
+    registry.append_events(rid, [json.dumps({"frame_id": i, "boxes": b}) for i, b in enumerate(frames[:2])])
+
+    js = client.post(f"/runs/{rid}/live_eval", json={"dataset": str(path)}).json()
+    assert js["frames"] == 2 and js["map50"] == 1.0
+    registry.append_event(rid, json.dumps({"frame_id": 2, "boxes": frames[2]}))
+    registry.append_event(rid, json.dumps({"frame_id": 2, "boxes": frames[2]}))  # replayed frame is not double counted
+    js = client.get(f"/runs/{rid}/live_eval").json()
+    assert (js["frames"], js["skipped"], js["unknown_cls"]) == (3, 1, 1)
+
+    # Same numbers as the batch evaluator on the equivalent COCO results
+    cat = {"car": 1, "person": 2}
+    preds = [
+        {"image_id": 10 + i, "category_id": cat[b["cls"].lower()], "bbox": [b["x1"], b["y1"], b["x2"] - b["x1"], b["y2"] - b["y1"]], "score": b["score"]}
+        for i, bs in enumerate(frames) for b in bs if b["cls"] != "dog"
+    ]
+    ref = evaluate_detections(gt, preds, workers=1)
+    for key in ("map", "map50", "map75", "recall", "per_class", "cm"):
+        assert js[key] == ref[key], key
+
+    text = client.get("/metrics").text
+    assert f'live_eval{{run_id="{rid}",stat="frames"}} 3.0' in text
+    assert client.delete(f"/runs/{rid}/live_eval").json() == {"ok": True}
+    assert client.get(f"/runs/{rid}/live_eval").status_code == 404
+    assert f'run_id="{rid}"' not in client.get("/metrics").text
+    assert client.post(f"/runs/{rid}/live_eval", json={"dataset": str(tmp_path / "missing.json")}).status_code == 404
+
+
+def test_run_ids_must_be_safe_directory_names(tmp_path) -> None:
+    from pathlib import Path
+
+    jpeg = b"\xff\xd8\xff\xd9"
+    for bad in ("../escaped", "..", "a/b", "x" * 129):
+        r = client.post("/run_frame", params={"run_id": bad}, content=jpeg, headers={"Content-Type": "image/jpeg"})
+        assert r.status_code == 422, bad
+    assert not (Path("runs").resolve().parent / "escaped").exists()
+    assert client.post("/run_frames", json={"images_b64": [], "run_id": "../escaped"}).status_code == 422
+    assert client.post("/report", json={"run_id": ".."}).status_code == 422
+    assert client.get("/runs/bad%20id/stats").status_code == 422
+    assert client.get("/runs/bad%20id/live_eval").status_code == 422
+    assert client.post("/runs/bad%20id/live_eval", json={"dataset": str(tmp_path / "gt.json")}).status_code == 422
+    assert client.delete("/runs/bad%20id/live_eval").status_code == 422
+    assert client.get("/events", params={"run_id": "../x"}).status_code == 422
+    with client.websocket_connect("/ws/run_frames?run_id=../escaped") as ws:
+        assert "invalid run_id" in ws.receive_json()["error"]
+
+
+def test_evaluate_rejects_unreadable_predictions(tmp_path) -> None:
+    bad = tmp_path / "preds.json"
+    bad.write_text("{not json", encoding="utf-8")
+    r = client.post("/evaluate", json={"dataset": "missing.json", "tasks": ["det"], "predictions": str(tmp_path / "none.json")})
+    assert r.status_code == 404 and "predictions not found" in r.json()["error"]
+    r = client.post("/evaluate", json={"dataset": "missing.json", "tasks": ["det"], "predictions": str(bad)})
+    assert r.status_code == 422 and "not valid JSON" in r.json()["error"]
+    bad.write_text('{"image_id": 1}', encoding="utf-8")
+    r = client.post("/evaluate", json={"dataset": "missing.json", "tasks": ["det"], "predictions": str(bad)})
+    assert r.status_code == 422 and "JSON list" in r.json()["error"]
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.agents.evaluator import EvaluatorAgent
+from app.utils.coco_eval import evaluate_detections
+
+DATA = {
+    "images": [{"id": 1}, {"id": 2}],
+    "annotations": [
+        {"id": 1, "image_id": 1, "category_id": 1, "bbox": [0, 0, 10, 10]},
+        {"id": 2, "image_id": 2, "category_id": 1, "bbox": [50, 50, 10, 10]},
+        {"id": 3, "image_id": 2, "category_id": 1, "bbox": [0, 0, 40, 40], "iscrowd": 1},
+        {"id": 4, "image_id": 2, "category_id": 2, "bbox": [100, 100, 20, 20]},
+    ],
+    "categories": [{"id": 1, "name": "car"}, {"id": 2, "name": "person"}, {"id": 3, "name": "bus"}],
+}
+PREDS = [
+    {"image_id": 1, "category_id": 1, "bbox": [0, 0, 10, 10], "score": 0.9},
+    {"image_id": 1, "category_id": 1, "bbox": [200, 200, 10, 10], "score": 0.8},  # false positive
+    {"image_id": 2, "category_id": 1, "bbox": [50, 50, 10, 10], "score": 0.7},
+    {"image_id": 2, "category_id": 1, "bbox": [5, 5, 10, 10], "score": 0.95},  # inside the crowd region: ignored
+    {"image_id": 2, "category_id": 1, "bbox": [100, 100, 20, 20], "score": 0.6},  # wrong class for the person
+]
+# car: precision 1 up to recall 0.5, then 2/3 (the person-shaped car is a later false positive)
+CAR_AP = (51 * 1.0 + 50 * (2 / 3)) / 101
+
+
+@pytest.fixture()
+def coco_files(tmp_path):
+    (tmp_path / "gt.json").write_text(json.dumps(DATA), encoding="utf-8")
+    (tmp_path / "preds.json").write_text(json.dumps(PREDS), encoding="utf-8")
+    return str(tmp_path / "gt.json"), str(tmp_path / "preds.json")
+
+
+def test_per_class_ap_and_map_hand_computed() -> None:
+    out = evaluate_detections(DATA, PREDS, workers=1)
+    assert abs(out["per_class"]["car"]["ap"] - CAR_AP) < 1e-12
+    assert out["per_class"]["person"]["ap"] == 0.0 and out["per_class"]["bus"]["ap"] is None
+    assert abs(out["map"] - CAR_AP / 2) < 1e-12 and abs(out["map50"] - CAR_AP / 2) < 1e-12
+    assert out["recall"] == 0.5 and out["images"] == 2 and out["predictions"] == 5
+
+
+def test_confusion_matrix_leaves_out_crowd_ground_truth() -> None:
+    cm = evaluate_detections(DATA, PREDS, workers=1)["cm"]
+    assert cm["labels"] == ["car", "person", "bus", "background"]
+    # rows = ground truth, columns = predictions
+    assert cm["matrix"] == [[2, 0, 0, 0], [1, 0, 0, 0], [0, 0, 0, 0], [2, 0, 0, 0]]
+
+
+def test_sharded_process_pool_matches_serial() -> None:
+    serial = evaluate_detections(DATA, PREDS, workers=1)
+    assert evaluate_detections(DATA, PREDS, workers=2, min_parallel_images=1, shard_images=1) == serial
+
+
+def test_evaluator_scores_detections_from_files(coco_files) -> None:
+    out = evaluate_detections(DATA, PREDS, workers=1)
+    res = EvaluatorAgent({"evaluation": {"workers": 1}}).evaluate(coco_files[0], ["det"], coco_files[1])
+    assert res["metrics"]["det"]["map50"] == out["map50"] and res["metrics"]["track"] == {}
+    assert res["per_class"]["det"] == out["per_class"] and res["cm"] == out["cm"]
+
+
+def test_evaluator_rejects_tracks_against_coco(coco_files) -> None:
+    # A COCO file has no sequence ground truth to score tracks against
+    with pytest.raises(ValueError, match="sequence ground truth"):
+        EvaluatorAgent({}).evaluate(coco_files[0], ["det", "track"], coco_files[1])
@@ -1,7 +1,21 @@
 from __future__ import annotations
 
+import itertools
+
+import numpy as np
+
 from app.services.metrics import get_metrics_registry
-from app.utils.metrics import iou_xyxy
+from app.utils.metrics import (
+    box_areas_xyxy,
+    clip_boxes_xyxy,
+    iou_matrix_xyxy,
+    iou_xyxy,
+    map50_placeholder,
+    match_greedy,
+    match_max_iou,
+    match_optimal,
+    match_thresholds,
+)
 
 
 def test_metrics_registry() -> None:
@@ -16,3 +30,93 @@ def test_iou_xyxy_basic() -> None:
     i = iou_xyxy(a, b)
     # Intersection area 25, union 175 => ~0.142857
     assert 0.14 < i < 0.15
+
+
+def _boxes(rng, n: int, grid: bool = False) -> np.ndarray:
+    xy = rng.integers(0, 60, (n, 2)) if grid else rng.random((n, 2)) * 100
+    wh = rng.integers(1, 30, (n, 2)) if grid else rng.random((n, 2)) * 30
+    return np.concatenate([xy, xy + wh], axis=1).astype(float)
+
+
+def _trials(count: int = 30):
+    """Random (iou, row order, threshold) cases; integer grid boxes produce exact IoU ties."""
+    rng = np.random.default_rng(2)
+    for _ in range(count):
+        a, b = _boxes(rng, int(rng.integers(0, 9)), grid=True), _boxes(rng, int(rng.integers(0, 9)), grid=True)
+        yield iou_matrix_xyxy(a, b), rng.permutation(len(a)), float(rng.choice([0.1, 0.3, 0.5]))
+
+
+def _row_priority(iou: np.ndarray, order: np.ndarray, thr: float) -> list[tuple[int, int]]:
+    """Each row in turn takes its best free column."""
+    used, ref = set(), []
+    for i in order.tolist():
+        free = [(iou[i, j], -j) for j in range(iou.shape[1]) if j not in used and iou[i, j] >= thr]
+        if free:
+            j = -max(free)[1]
+            used.add(j)
+            ref.append((i, j))
+    return sorted(ref)
+
+
+def test_iou_matrix_matches_scalar_iou() -> None:
+    rng = np.random.default_rng(1)
+    a, b = _boxes(rng, 40), _boxes(rng, 30)
+    b[0] = [5, 5, 1, 1]  # inverted box: empty
+    m = iou_matrix_xyxy(a, b)
+    assert m.shape == (40, 30)
+    ref = np.array([[iou_xyxy(tuple(p), tuple(q)) for q in b] for p in a])
+    assert np.allclose(m, ref, rtol=0, atol=1e-12)
+    assert iou_matrix_xyxy(a, np.zeros((0, 4))).shape == (40, 0)
+
+
+def test_box_areas_and_clipping() -> None:
+    assert box_areas_xyxy([[0, 0, 2, 3], [4, 4, 1, 1]]).tolist() == [6.0, 0.0]
+    assert clip_boxes_xyxy([[-5, 2, 120, 90]], 100, 50).tolist() == [[0, 2, 100, 50]]
+
+
+def test_match_greedy_follows_row_priority() -> None:
+    for iou, order, thr in _trials():
+        matches, un_r, un_c = match_greedy(iou, thr, order)
+        assert sorted(map(tuple, matches.tolist())) == _row_priority(iou, order, thr)
+        assert len(un_r) + len(matches) == iou.shape[0] and len(un_c) + len(matches) == iou.shape[1]
+
+
+def test_match_thresholds_agrees_with_greedy_per_threshold() -> None:
+    for iou, order, thr in _trials():
+        multi = match_thresholds(iou, [0.1, 0.3, 0.5], order)
+        t = [0.1, 0.3, 0.5].index(thr)
+        assert sorted((i, int(j)) for i, j in enumerate(multi[t].tolist()) if j >= 0) == _row_priority(iou, order, thr)
+
+
+def test_match_max_iou_takes_best_pairs_first() -> None:
+    for iou, _, thr in _trials():
+        # Highest IoU pair first, ties to the lower row then column
+        pairs = sorted((-iou[i, j], i, j) for i in range(iou.shape[0]) for j in range(iou.shape[1]) if iou[i, j] >= thr)
+        ur, uc, ref = set(), set(), []
+        for _, i, j in pairs:
+            if i not in ur and j not in uc:
+                ur.add(i), uc.add(j), ref.append((i, j))
+        assert sorted(map(tuple, match_max_iou(iou, thr)[0].tolist())) == sorted(ref)
+
+
+def test_match_optimal_maximises_count_then_total_iou() -> None:
+    for iou, _, thr in _trials():
+        n, k = iou.shape
+        if n > 6 or k > 6:
+            continue
+        if n <= k:
+            cands = [list(zip(range(n), p)) for p in itertools.permutations(range(k), n)]
+        else:
+            cands = [list(zip(p, range(k))) for p in itertools.permutations(range(n), k)]
+        best = (0, 0.0)
+        for cand in cands:
+            ok = [(i, j) for i, j in cand if iou[i, j] >= thr]
+            best = max(best, (len(ok), round(sum(iou[i, j] for i, j in ok), 9)))
+        opt = match_optimal(iou, thr)[0]
+        assert (len(opt), round(float(sum(iou[i, j] for i, j in opt.tolist())), 9)) == best
+
+
+def test_map50_placeholder() -> None:
+    gt = [(0, 0, 10, 10), (20, 20, 30, 30)]
+    assert map50_placeholder([(0, 0, 10, 11), (50, 50, 60, 60)], gt) == 0.5
+    assert map50_placeholder([], gt) == 0.0 and map50_placeholder([(0, 0, 1, 1)], []) == 0.0
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import pytest
+
+from app.agents.evaluator import EvaluatorAgent
+from app.utils.mot_eval import evaluate_mot, evaluate_mot_files, evaluate_tracking_set, frames_from_lists, read_mot_frames
+
+B1, B2, FAR = [0, 0, 10, 10], [50, 0, 10, 10], [200, 200, 10, 10]
+# gt 1 and 2 tracked as 7 and 8, identities swap on frame 3, 8 drops out on frame 4 next to a false positive
+FRAMES = [
+    {"gt": [[1, *B1], [2, *B2]], "pred": [[7, *B1], [8, *B2]]},
+    {"gt": [[1, *B1], [2, *B2]], "pred": [[7, *B1], [8, *B2]]},
+    {"gt": [[1, *B1], [2, *B2]], "pred": [[8, *B1], [7, *B2]]},
+    {"gt": [[1, *B1], [2, *B2]], "pred": [[7, *B2], [9, *FAR]]},
+]
+
+
+def _public(res: dict) -> dict:
+    return {k: v for k, v in res.items() if k != "_counts"}
+
+
+@pytest.fixture()
+def seq(tmp_path):
+    """MOTChallenge files for FRAMES: gt sorted by track with one conf 0 row, plus a tracking set over them."""
+    seq = tmp_path / "seq"
+    seq.mkdir()
+    gt_rows = [(t + 1, i, *row[1:]) for i in (1, 2) for t, fr in enumerate(FRAMES) for row in fr["gt"] if row[0] == i]
+    lines = [f"{t},{i},{x},{y},{w},{h},1,1,1" for t, i, x, y, w, h in gt_rows] + ["2,3,300,300,10,10,0,1,1"]
+    (seq / "gt.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    pred = [f"{t + 1},{r[0]},{r[1]},{r[2]},{r[3]},{r[4]},0.9,-1,-1,-1" for t, fr in enumerate(FRAMES) for r in fr["pred"]]
+    (seq / "pred.txt").write_text("\n".join(pred) + "\n", encoding="utf-8")
+    (tmp_path / "tracking.json").write_text('[{"name": "seq", "gt": "seq/gt.txt", "pred": "seq/pred.txt"}]', encoding="utf-8")
+    return seq
+
+
+def test_clear_and_identity_metrics_hand_computed() -> None:
+    res = evaluate_mot(frames_from_lists(FRAMES))
+    assert (res["fn"], res["fp"], res["idsw"], res["matches"]) == (1, 1, 2, 7)
+    assert res["mota"] == 0.5 and res["motp"] == 1.0
+    assert res["idf1"] == 0.5  # 7->1 and 8->2 share 4 of 8 + 8 detections
+
+
+def test_hota_hand_computed() -> None:
+    res = evaluate_mot(frames_from_lists(FRAMES))
+    # DetA = 7/9; AssA = (2 * 1/3 + 2 * 2/5 + 1 * 1/6 + 2 * 1/3) / 7
+    assert abs(res["deta"] - 7 / 9) < 1e-12 and abs(res["assa"] - 2.3 / 7) < 1e-12
+    assert abs(res["hota"] - (2.3 / 9) ** 0.5) < 1e-12
+
+
+def test_chunked_read_matches_single_pass(seq) -> None:
+    chunked = [(f, i.tolist(), b.tolist()) for f, i, b in read_mot_frames(seq / "pred.txt", chunk_lines=1)]
+    whole = [(f, i.tolist(), b.tolist()) for f, i, b in read_mot_frames(seq / "pred.txt")]
+    assert chunked == whole and len(chunked) == 4
+
+
+def test_track_sorted_ground_truth_is_regrouped_by_frame(seq) -> None:
+    # Rows come sorted by track and are merged back into frames from sorted runs; conf 0 rows are ignored
+    gt_frames = [(f, i.tolist()) for f, i, _ in read_mot_frames(seq / "gt.txt", gt=True, chunk_lines=1)]
+    assert gt_frames == [(1, [1, 2]), (2, [1, 2]), (3, [1, 2]), (4, [1, 2])]
+
+
+def test_files_and_tracking_set_match_in_memory_scoring(seq) -> None:
+    res = _public(evaluate_mot(frames_from_lists(FRAMES)))
+    out = evaluate_tracking_set(seq.parent / "tracking.json")
+    assert out["sequences"]["seq"] == res
+    assert out["hota"] == res["hota"] and out["idf1"] == 0.5
+    assert _public(evaluate_mot_files(seq / "gt.txt", seq / "pred.txt", chunk_lines=1)) == res
+
+
+def test_evaluator_scores_a_file_pair(seq) -> None:
+    pair = EvaluatorAgent({}).evaluate(str(seq / "gt.txt"), ["track"], str(seq / "pred.txt"))["metrics"]["track"]
+    assert pair == _public(evaluate_mot(frames_from_lists(FRAMES)))
+
+
+def test_evaluator_scores_a_tracking_set(seq) -> None:
+    tracking = seq.parent / "tracking.json"
+    assert EvaluatorAgent({}).evaluate(str(tracking), ["track"])["metrics"]["track"] == evaluate_tracking_set(tracking)
+
+
+def test_evaluator_needs_tracker_output_for_a_sequence(seq) -> None:
+    with pytest.raises(ValueError, match="tracker output"):
+        EvaluatorAgent({}).evaluate(str(seq / "gt.txt"), ["track"])
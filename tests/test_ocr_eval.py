@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import json
+import random
+
+import pytest
+
+from app.agents.evaluator import EvaluatorAgent
+from app.utils.ocr_eval import edit_distance, evaluate_ocr
+
+SAMPLE = {
+    "gt": [
+        {"text": "STOP", "box": [0, 0, 10, 10]},
+        {"text": "Main St", "box": [20, 0, 40, 10]},
+        {"text": "EXIT", "box": [0, 50, 10, 60]},  # missed
+    ],
+    "pred": [
+        {"text": "st0p", "box": [0, 0, 10, 10]},
+        {"text": "Main  St", "box": [21, 0, 40, 10]},  # exact after normalization
+        {"text": "noise", "box": [100, 100, 110, 110]},  # unmatched
+    ],
+}
+OTHER = {"gt": [{"text": "A1", "box": [0, 0, 5, 5]}], "pred": [{"text": "A7", "box": [0, 0, 5, 5]}]}
+
+
+def _full_table(a, b) -> int:
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cur[j] = min(prev[j - 1] + (a[i - 1] != b[j - 1]), prev[j] + 1, cur[j - 1] + 1)
+        prev = cur
+    return prev[-1]
+
+
+def test_edit_distance_matches_full_table() -> None:
+    rng = random.Random(0)
+    for _ in range(300):
+        a = "".join(rng.choice("ab c") for _ in range(rng.randint(0, 25)))
+        b = "".join(rng.choice("ab c") for _ in range(rng.randint(0, 25))) if rng.random() < 0.5 else a[1:] + "x"
+        assert edit_distance(a, b) == _full_table(a, b)
+        assert edit_distance(a.split(), b.split()) == _full_table(a.split(), b.split())
+
+
+def test_cer_wer_with_box_matching_hand_computed() -> None:
+    out = evaluate_ocr([SAMPLE], workers=1)
+    # chars 4 + 7 + 4, edits 1 (st0p) + 4 (missed EXIT) + 5 (noise); words 1 + 2 + 1, edits 1 + 1 + 1
+    assert (out["char_edits"], out["chars"], out["word_edits"], out["words"]) == (10, 15, 3, 4)
+    assert out["cer"] == 10 / 15 and out["wer"] == 0.75 and out["acc"] == 1 / 3 and out["recall"] == 2 / 3
+
+
+def test_cache_skips_samples_already_scored(tmp_path) -> None:
+    cache = tmp_path / "ocr_cache.json"
+    evaluate_ocr([SAMPLE], cache_path=cache, workers=1)
+    again = evaluate_ocr([SAMPLE, OTHER, SAMPLE], cache_path=cache, workers=1)
+    assert (again["scored"], again["cached"], again["chars"]) == (1, 2, 32)
+
+
+def test_process_pool_scores_duplicates_once() -> None:
+    pooled = evaluate_ocr([SAMPLE, OTHER] * 3, workers=2, min_parallel_samples=1, shard_samples=1)
+    assert pooled["cer"] == (3 * 11) / (3 * 17) and pooled["scored"] == 2
+
+
+def test_evaluator_scores_inline_predictions(tmp_path) -> None:
+    (tmp_path / "ocr.json").write_text(json.dumps([SAMPLE, OTHER]), encoding="utf-8")
+    res = EvaluatorAgent({"evaluation": {"workers": 1}}).evaluate(str(tmp_path / "ocr.json"), ["ocr"])
+    assert res["metrics"]["ocr"]["cer"] == 11 / 17
+
+
+def test_evaluator_scores_a_separate_predictions_file(tmp_path) -> None:
+    agent = EvaluatorAgent({"evaluation": {"workers": 1}})
+    (tmp_path / "ocr.json").write_text(json.dumps([SAMPLE, OTHER]), encoding="utf-8")
+    (tmp_path / "gt_only.json").write_text(json.dumps([{"gt": s["gt"]} for s in (SAMPLE, OTHER)]), encoding="utf-8")
+    (tmp_path / "ocr_preds.json").write_text(json.dumps([SAMPLE["pred"], {"pred": OTHER["pred"]}]), encoding="utf-8")
+    inline = agent.evaluate(str(tmp_path / "ocr.json"), ["ocr"])["metrics"]["ocr"]
+    assert agent.evaluate(str(tmp_path / "gt_only.json"), ["ocr"], str(tmp_path / "ocr_preds.json"))["metrics"]["ocr"] == inline
+
+
+def test_evaluator_rejects_coco_for_ocr(tmp_path) -> None:
+    (tmp_path / "coco.json").write_text('{"images": [], "annotations": []}', encoding="utf-8")
+    with pytest.raises(ValueError, match="needs OCR samples"):
+        EvaluatorAgent({}).evaluate(str(tmp_path / "coco.json"), ["ocr"])
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import time
+
+from app.pipelines.fanout import fan_out
+from app.utils.timing import StageTimer
+
+
+def test_fan_out_runs_stages_concurrently() -> None:
+    timer = StageTimer()
+    t0 = time.perf_counter()
+    res = fan_out(
+        {"a": lambda: time.sleep(0.2) or 1, "b": lambda: time.sleep(0.2) or 2},
+        timer=timer,
+    )
+    assert time.perf_counter() - t0 < 0.35
+    assert res["a"].value == 1 and res["b"].value == 2
+    assert timer.timings_ms["a"] >= 150 and timer.timings_ms["b"] >= 150
+
+
+def test_fan_out_deadline_and_errors() -> None:
+    def boom() -> None:
+        raise RuntimeError("down")
+
+    res = fan_out(
+        {"slow": lambda: time.sleep(1.0), "bad": boom, "ok": lambda: "x"},
+        deadlines_s={"slow": 0.05},
+    )
+    assert res["slow"].error == "timeout" and res["slow"].value is None
+    assert res["bad"].error and "down" in res["bad"].error
+    assert res["ok"].value == "x" and res["ok"].error is None
+
+
+def test_video_pipeline_orders_frames_and_bounds_in_flight() -> None:
+    import asyncio
+    import random
+
+    import numpy as np
+
+    from app.pipelines.video_engine import VideoPipeline
+
+    frames = iter(range(20))
+    state = {"in_flight": 0, "peak": 0, "read": 0, "max_lead": 0}
+    emitted: list[int] = []
+
+    def read():
+        try:
+            i = next(frames)
+        except StopIteration:
+            return False, None
+        state["read"] += 1
+        return True, np.full((4, 4, 3), i, dtype=np.uint8)
+
+    async def infer(payload: str) -> list[dict]:
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(random.uniform(0.0, 0.01))
+        state["in_flight"] -= 1
+        return [{"x1": 0, "y1": 0, "x2": 1, "y2": 1, "v": int(payload)}]
+
+    async def emit(pkt) -> None:
+        # Slow consumer: decoding may only run a bounded distance ahead of it
+        state["max_lead"] = max(state["max_lead"], state["read"] - len(emitted))
+        assert pkt.boxes[0]["v"] == pkt.frame_id
+        emitted.append(pkt.frame_id)
+        await asyncio.sleep(0.005)
+
+    pipe = VideoPipeline(
+        read=read,
+        encode=lambda f: str(int(f[0, 0, 0])),
+        infer=infer,
+        track=lambda boxes: boxes,
+        emit=emit,
+        concurrency=3,
+        queue_size=2,
+    )
+    assert asyncio.run(pipe.run()) == 20
+    assert emitted == list(range(20))
+    assert state["peak"] <= 3
+    # decode/encode queues + encoder in hand + reorder window + emit queue + emitter in hand
+    assert state["max_lead"] <= 2 + 2 + 1 + (2 + 3) + 2 + 1 + 1
+    assert set(pipe.stats()) == {"decode", "encode", "infer", "track", "emit"}
+
+
+
+def test_video_pipeline_with_scheduler_infers_the_newest_frames() -> None:
+    import asyncio
+
+    import numpy as np
+
+    from app.pipelines.scheduler import FrameScheduler
+    from app.pipelines.video_engine import VideoPipeline
+
+    state = {"read": 0, "max_lag": 0}
+    emitted: list[int] = []
+
+    def read():
+        if state["read"] >= 40:
+            return False, None
+        state["read"] += 1
+        return True, np.full((4, 4, 3), state["read"] - 1, dtype=np.uint8)
+
+    async def infer(payload: str) -> list[dict]:
+        # Frames decoded since this one was admitted; it should not have waited behind others
+        state["max_lag"] = max(state["max_lag"], state["read"] - 1 - int(payload))
+        await asyncio.sleep(0.05)  # model far slower than the 100 fps source
+        return []
+
+    async def emit(pkt) -> None:
+        emitted.append(pkt.frame_id)
+
+    sched = FrameScheduler()
+    pipe = VideoPipeline(
+        read=read,
+        encode=lambda f: str(int(f[0, 0, 0])),
+        infer=infer,
+        track=lambda boxes: boxes,
+        emit=emit,
+        concurrency=2,
+        queue_size=4,
+        scheduler=sched,
+        source_fps=100.0,
+    )
+    asyncio.run(pipe.run())
+    assert sched.stats()["dropped"] > 0
+    assert emitted == sorted(emitted) and len(emitted) < 40
+    assert state["max_lag"] <= 1
+    assert emitted[-1] >= 38
+
+def test_frame_scheduler_paces_and_keeps_newest_frame() -> None:
+    import asyncio
+
+    from app.pipelines.scheduler import FrameScheduler
+
+    async def main():
+        sched = FrameScheduler(max_fps=20)
+        for i in range(5):
+            sched.offer(i)
+        first = await sched.take()
+        t0 = asyncio.get_running_loop().time()
+        sched.offer(5)
+        sched.offer(6)
+        second = await sched.take()
+        waited = asyncio.get_running_loop().time() - t0
+        sched.close()
+        return first, second, waited, await sched.take(), sched.stats()
+
+    first, second, waited, last, stats = asyncio.run(main())
+    assert first == (4, 4)
+    assert second == (6, 1)
+    assert waited >= 0.04
+    assert last == (None, 0)
+    assert stats["decoded"] == 7 and stats["dropped"] == 5 and stats["admitted"] == 2
@@ -3,3 +3,52 @@ from __future__ import annotations
 
 def test_nop() -> None:
     assert True
+
+
+def test_compose_blends_masks_in_roi_and_copies_once() -> None:
+    import cv2
+    import numpy as np
+
+    from app.utils.viz import OverlaySpec, compose
+
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 255, (90, 120, 3), dtype=np.uint8)
+    mask = np.zeros((90, 120), dtype=np.uint8)
+    mask[50:80, 60:110] = 1
+    out = compose(img, OverlaySpec(masks=[mask], hud=["fps 24"]))
+    # Same result as the old full-frame blend, inside the mask
+    full = cv2.addWeighted(np.full_like(img, (193, 171, 2)), 0.35, img, 0.65, 0)
+    assert np.array_equal(out[50:80, 60:110], full[50:80, 60:110])
+    assert np.array_equal(out[40:, :50], img[40:, :50])
+    assert not np.array_equal(out, img)
+
+    work = img.copy()
+    same = compose(work, OverlaySpec(boxes=[{"x1": 1, "y1": 1, "x2": 30, "y2": 30}]), inplace=True)
+    assert same is work and not np.array_equal(work, img)
+
+
+def test_upload_resize_maps_boxes_back() -> None:
+    import cv2
+    import numpy as np
+
+    from app.utils.preprocess import apply_resize, plan_resize, prepare_upload
+
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    frame[540:700, 960:1280] = 255
+    ok, buf = cv2.imencode(".jpg", frame)
+    upload, xf, decoded = prepare_upload(buf.tobytes(), 640, quality=80)
+    small = cv2.imdecode(np.frombuffer(upload, dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert small.shape[:2] == (360, 640) and decoded.shape[:2] == (1080, 1920)
+    assert len(upload) < buf.size
+    box = xf.boxes_to_source([{"x1": 320, "y1": 180, "x2": 426.67, "y2": 233.33, "cls": "car"}])[0]
+    assert abs(box["x1"] - 960) < 1 and abs(box["y2"] - 700) < 1 and box["cls"] == "car"
+
+    lb = plan_resize(1920, 1080, 640, letterbox=True)
+    padded = apply_resize(frame, lb)
+    assert padded.shape[:2] == (640, 640) and lb.pad_y == 140
+    assert np.allclose(lb.box_to_source([320, 320, 640, 640]), [960, 540, 1920, 1080])
+    assert lb.mask_to_source(np.ones((640, 640), np.uint8)).shape == (1080, 1920)
+    # Frames already within input_size go up untouched
+    tiny = cv2.imencode(".jpg", np.zeros((48, 64, 3), np.uint8))[1].tobytes()
+    same, ident, _ = prepare_upload(tiny, 640)
+    assert same is tiny and ident.identity
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    calls = 0
+    throttled = 1
+    prediction: dict = {}
+
+    def do_POST(self) -> None:  # noqa: N802
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        type(self).calls += 1
+        # First call is throttled to exercise the async backoff path
+        status = 429 if type(self).calls <= type(self).throttled else 200
+        body = json.dumps(type(self).prediction).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture()
+def fake_replicate(monkeypatch):
+    import app.providers.cache as cache
+    import app.providers.detection.replicate as rep
+    import app.providers.singleflight as singleflight
+
+    _Handler.calls = 0
+    _Handler.throttled = 1
+    _Handler.prediction = {"status": "succeeded", "output": [{"x1": 1, "y1": 2, "x2": 3, "y2": 4, "score": 0.9, "class": "car"}]}
+    monkeypatch.setattr(cache, "_singleton", cache.InferenceCache())
+    monkeypatch.setattr(singleflight, "_singleton", singleflight.SingleFlight())
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    monkeypatch.setattr(rep, "_URL", f"http://127.0.0.1:{srv.server_address[1]}/v1/predictions")
+    monkeypatch.setattr(rep, "_BACKOFFS", (0.01, 0.01, 0.01))
+    monkeypatch.setenv("REPLICATE_API_TOKEN", "t")
+    yield rep
+    srv.shutdown()
+
+
+def test_async_detector_retries_and_parses(fake_replicate) -> None:
+    from app.providers.cache import get_inference_cache
+    from app.providers.transport import get_async_transport
+
+    async def main():
+        dets = await fake_replicate.ReplicateDetector("m").ainfer("aGVsbG8=")
+        again = await fake_replicate.ReplicateDetector("m").ainfer("aGVsbG8=")
+        await get_async_transport().aclose()
+        return dets, again
+
+    dets, again = asyncio.run(main())
+    assert len(dets) == 1 and dets[0].cls == "car" and dets[0].x2 == 3.0
+    assert again == dets
+    # 429 + 200 upstream; the repeat of the same image is served from the cache
+    assert _Handler.calls == 2
+    assert get_inference_cache().stats()["memory"]["hits"] == 1.0
+
+
+
+def test_unfinished_predictions_are_not_cached(fake_replicate) -> None:
+    from app.providers.cache import get_inference_cache
+
+    for prediction in ({"status": "processing", "output": None}, {"status": "failed", "error": "oom"}, {"status": "succeeded", "output": []}):
+        _Handler.calls = 1  # skip the throttled first reply
+        _Handler.prediction = prediction
+        det = fake_replicate.ReplicateDetector("m")
+        assert det.infer("aGVsbG8=") == [] and det.infer("aGVsbG8=") == []
+        # Both calls went upstream; nothing was stored for the image
+        assert _Handler.calls == 3
+        assert get_inference_cache().stats()["memory"]["entries"] == 0.0
+
+
+def test_retries_stop_at_the_deadline(fake_replicate, monkeypatch) -> None:
+    _Handler.throttled = 100
+    monkeypatch.setattr(fake_replicate, "_BACKOFFS", (0.3, 0.3, 0.3))
+    det = fake_replicate.ReplicateDetector("m")
+    t0 = time.monotonic()
+    # A backoff that would end past the deadline is not slept; the fan-out thread is freed at once
+    assert det.infer("aGVsbG8=", deadline=t0 + 0.2) == []
+    assert time.monotonic() - t0 < 0.2 and _Handler.calls == 1
+    assert det.infer("aGVsbG8=", deadline=time.monotonic() - 1) == [] and _Handler.calls == 1
+
+
+def test_hf_error_replies_are_not_cacheable() -> None:
+    from app.providers.segmentation.hf import HfSegmentation
+
+    assert HfSegmentation._cacheable([{"label": "road", "mask": "..."}])
+    assert HfSegmentation._cacheable({"masks": [{"label": "road"}]})
+    assert not HfSegmentation._cacheable({"error": "Model is currently loading", "estimated_time": 20})
+    assert not HfSegmentation._cacheable([]) and not HfSegmentation._cacheable({"masks": []})
+
+def test_inference_cache_lru_and_disk_tier(tmp_path) -> None:
+    from app.providers.cache import CacheSettings, InferenceCache, cache_key
+
+    settings = CacheSettings(max_mb=30 / (1024 * 1024), disk=True, disk_dir=str(tmp_path / "cache"))
+    cache = InferenceCache(settings)
+    k1, k2 = cache_key("replicate", "m", "aaaa"), cache_key("replicate", "m", "bbbb")
+    assert k1 != cache_key("replicate", "other", "aaaa")
+    cache.put(k1, {"output": [1, 2, 3]})
+    cache.put(k2, {"output": [4, 5, 6]})
+    assert cache.stats()["memory"]["evictions"] == 1.0
+    # Evicted from memory, still on disk: promoted back on lookup
+    assert cache.get(k1) == {"output": [1, 2, 3]}
+    assert cache.get(cache_key("replicate", "m", "cccc")) is None
+    fresh = InferenceCache(settings)
+    assert fresh.get(k2) == {"output": [4, 5, 6]}
+    stats = fresh.stats()
+    assert stats["disk"]["hits"] == 1.0 and stats["disk"]["entries"] == 2.0
+
+
+
+def test_inference_cache_async_paths_keep_disk_io_off_the_loop(tmp_path) -> None:
+    import threading
+
+    from app.providers.cache import CacheSettings, InferenceCache
+
+    cache = InferenceCache(CacheSettings(disk=True, disk_dir=str(tmp_path / "cache")))
+    disk_threads: list[threading.Thread] = []
+
+    def on_thread(fn):
+        def wrapped(*args):
+            disk_threads.append(threading.current_thread())
+            return fn(*args)
+        return wrapped
+
+    cache._disk.get = on_thread(cache._disk.get)
+    cache._disk.put = on_thread(cache._disk.put)
+
+    async def main():
+        await cache.aput("k", {"output": [1]})
+        hit = await cache.aget("k")  # memory tier, answered inline
+        cache.clear()
+        return hit, await cache.aget("k"), await cache.aget("missing")
+
+    assert asyncio.run(main()) == ({"output": [1]}, {"output": [1]}, None)
+    assert len(disk_threads) == 3 and threading.main_thread() not in disk_threads
+    stats = cache.stats()
+    assert (stats["memory"]["hits"], stats["disk"]["hits"], stats["memory"]["misses"]) == (1.0, 1.0, 1.0)
+
+def test_concurrent_identical_calls_share_one_request(fake_replicate) -> None:
+    from app.providers.singleflight import get_single_flight
+    from app.providers.transport import get_async_transport
+
+    async def main():
+        det = fake_replicate.ReplicateDetector("m")
+        out = await asyncio.gather(*[det.ainfer("d29ybGQ=") for _ in range(4)])
+        await get_async_transport().aclose()
+        return out
+
+    results = asyncio.run(main())
+    assert all(r == results[0] and len(r) == 1 for r in results)
+    # One leader (429 then 200 upstream), three callers coalesced onto it
+    assert _Handler.calls == 2
+    assert get_single_flight().stats() == {"calls": 1.0, "coalesced": 3.0, "in_flight": 0.0}
+
+
+def test_single_flight_threads_share_result_and_errors() -> None:
+    from app.providers.singleflight import SingleFlight
+
+    flight = SingleFlight()
+    gate = threading.Event()
+    runs = []
+
+    def slow():
+        runs.append(1)
+        gate.wait(2)
+        return {"ok": True}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 2
+    while flight.stats()["coalesced"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert runs == [1] and results == [{"ok": True}] * 3
+
+    def boom():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", boom)
+    assert flight.stats()["in_flight"] == 0.0
+
+
+def test_provider_transport_reuses_connections(monkeypatch) -> None:
+    from app.providers.transport import PoolSettings, ProviderTransport
+    from app.services.metrics import get_metrics_registry
+
+    monkeypatch.setattr(_Handler, "throttled", 0)
+    monkeypatch.setattr(_Handler, "prediction", {})
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{srv.server_address[1]}/predict"
+        tr = ProviderTransport(PoolSettings(pool_maxsize=2, timeout_s=5))
+        for _ in range(5):
+            assert tr.post(url, json={"x": 1}).ok
+        stats = tr.stats()[f"127.0.0.1:{srv.server_address[1]}"]
+        assert stats["requests"] == 5
+        assert stats["connections"] == 1
+        assert stats["reuse_ratio"] == 0.8
+        m = get_metrics_registry()
+        m.update_provider_pools(tr.stats())
+        assert "provider_pool" in m.export_prometheus_text()[0]
+        tr.close()
+    finally:
+        srv.shutdown()
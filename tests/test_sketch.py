@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import numpy as np
+
+from app.utils.sketch import QuantileSketch
+
+
+def _lognormal() -> np.ndarray:
+    return np.random.default_rng(0).lognormal(3.0, 1.0, 20000)
+
+
+def test_merged_sketch_stays_within_relative_error() -> None:
+    vals = _lognormal()
+    a, b = QuantileSketch(0.01), QuantileSketch(0.01)
+    a.add_many(vals[:10000])
+    for v in vals[10000:].tolist():
+        b.add(v)
+    a.merge(b)
+    a.add_many([0.0, 0.0])
+    exact = np.quantile(np.concatenate([vals, [0.0, 0.0]]), [0.5, 0.95, 0.99], method="lower")
+    got = a.quantiles([0.5, 0.95, 0.99])
+    for q, e in zip((0.5, 0.95, 0.99), exact):
+        assert abs(got[q] - e) <= 0.011 * e
+
+
+def test_zeros_are_counted_and_bins_stay_bounded() -> None:
+    a = QuantileSketch(0.01)
+    a.add_many(_lognormal())
+    a.add_many([0.0, 0.0])
+    assert a.count == 20002 and a.quantile(0.0) == 0.0
+    assert len(a.bins) < 1000
@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+
+def test_read_last_event_from_memory_and_cold_tail(tmp_path) -> None:
+    from app.services.storage import RunRegistry, tail_line
+
+    reg = RunRegistry(tmp_path)
+    rid = reg.ensure_run("r1")
+    assert reg.read_last_event(rid) is None
+    reg.append_event(rid, '{"frame_id": 0}')
+    reg.append_events(rid, ['{"frame_id": 1}', '{"frame_id": 2}\n'])
+    assert reg.read_last_event(rid) == '{"frame_id": 2}'
+
+    # Another writer (or process) appended: the size check falls back to the file
+    path = tmp_path / rid / "events.jsonl"
+    with path.open("a", encoding="utf-8") as f:
+        f.write('{"frame_id": 3}\n\n')
+    assert reg.read_last_event(rid) == '{"frame_id": 3}'
+
+    # Cold registry: reverse reader, including lines longer than one block
+    long = '{"pad": "' + "x" * 20000 + '"}'
+    with path.open("a", encoding="utf-8") as f:
+        f.write(long + "\n")
+    assert RunRegistry(tmp_path).read_last_event(rid) == long
+    assert tail_line(path, block=7) == long
+    assert RunRegistry(tmp_path).read_last_event("missing") is None
+
+
+def test_read_events_pages_by_cursor_and_frame(tmp_path) -> None:
+    from app.services.storage import EventIndex, RunRegistry
+
+    reg = RunRegistry(tmp_path)
+    rid = reg.ensure_run("r2")
+    reg.append_events(rid, [f'{{"frame_id": {i}}}' for i in range(5)])
+    lines, cur = reg.read_events(rid, limit=2)
+    assert lines == ['{"frame_id": 3}', '{"frame_id": 4}']
+    lines, cur0 = reg.read_events(rid, cursor=0, limit=3)
+    assert [ln[-2] for ln in lines] == ["0", "1", "2"]
+    lines, cur1 = reg.read_events(rid, cursor=cur0)
+    assert [ln[-2] for ln in lines] == ["3", "4"] and cur1 == cur
+    assert reg.read_events(rid, cursor=cur1) == ([], cur1)
+    assert [ln[-2] for ln in reg.read_events(rid, after_frame=2)[0]] == ["3", "4"]
+
+    # Lines written behind the registry's back, and a lost index, are caught up
+    path = tmp_path / rid / "events.jsonl"
+    with path.open("a", encoding="utf-8") as f:
+        f.write('{"frame_id": 5}\n')
+    assert reg.read_events(rid, cursor=cur1)[0] == ['{"frame_id": 5}']
+    EventIndex(path).path.unlink()
+    assert len(reg.read_events(rid, cursor=0)[0]) == 6
+    assert len(EventIndex(path).rows()) == 6
+
+
+def test_background_writer_batches_and_flushes(tmp_path) -> None:
+    import time
+
+    from app.services.event_writer import WriterSettings
+    from app.services.storage import RunRegistry
+
+    settings = WriterSettings(durability="none", max_batch_events=1000, flush_interval_ms=60_000)
+    reg = RunRegistry(tmp_path, writer=settings)
+    rid = reg.ensure_run("w1")
+    path = tmp_path / rid / "events.jsonl"
+    for i in range(10):
+        reg.append_event(rid, f'{{"frame_id": {i}}}')
+    # Nothing written yet, but readers see the queued events
+    assert path.read_text() == ""
+    assert reg.read_last_event(rid) == '{"frame_id": 9}'
+    assert len(reg.read_events(rid, cursor=0)[0]) == 10
+    assert len(path.read_text().splitlines()) == 10
+    reg.append_events(rid, ['{"frame_id": 10}', '{"frame_id": 11}'])
+    reg.close()
+    assert path.read_text().splitlines()[-1] == '{"frame_id": 11}'
+    assert reg.read_events(rid, after_frame=9)[0] == ['{"frame_id": 10}', '{"frame_id": 11}']
+
+    # Size threshold: the writer thread appends without an explicit flush
+    reg = RunRegistry(tmp_path, writer=WriterSettings(durability="fsync", max_batch_events=4, flush_interval_ms=60_000))
+    rid = reg.ensure_run("w2")
+    reg.append_events(rid, [f'{{"frame_id": {i}}}' for i in range(4)])
+    deadline = time.monotonic() + 5
+    while reg.writer.stats()["commits"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len((tmp_path / rid / "events.jsonl").read_text().splitlines()) == 4
+    reg.close()
+
+
+def test_writer_survives_a_failing_commit_hook(tmp_path, monkeypatch) -> None:
+    import sqlite3
+    import threading
+
+    from app.services.event_writer import WriterSettings
+    from app.services.storage import RunRegistry
+
+    reg = RunRegistry(tmp_path, writer=WriterSettings(max_batch_events=2, max_pending_events=4, flush_interval_ms=1))
+    rid = reg.ensure_run("hook")
+    real = reg.index.record_frames
+
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(reg.index, "record_frames", locked)
+    # Past max_pending_events producers wait on the writer thread; it must still be draining
+    producer = threading.Thread(target=lambda: [reg.append_event(rid, f'{{"frame_id": {i}}}') for i in range(20)])
+    producer.start()
+    producer.join(timeout=10)
+    assert not producer.is_alive()
+    monkeypatch.setattr(reg.index, "record_frames", real)
+    reg.flush(rid)
+    stats = reg.writer.stats()
+    assert stats["errors"] >= 1 and stats["dropped"] == 0 and stats["pending"] == 0
+    assert len((tmp_path / rid / "events.jsonl").read_text().splitlines()) == 20
+    assert reg.index.get(rid)["frames"] == 20
+    reg.close()
+
+
+def test_unsynced_batches_still_reach_index_and_stats(tmp_path) -> None:
+    import time
+
+    from app.services.event_writer import WriterSettings
+    from app.services.storage import RunRegistry
+
+    reg = RunRegistry(tmp_path, writer=WriterSettings(durability="none", max_batch_events=4, flush_interval_ms=60_000))
+    rid = reg.ensure_run("lazy")
+    reg.append_events(rid, [f'{{"frame_id": {i}, "model_ms": 5}}' for i in range(4)])
+    deadline = time.monotonic() + 5
+    while reg.writer.stats()["commits"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # No flush: the writer thread's own commit updated the index row and the live stats
+    row = reg.index.get(rid)
+    assert row["frames"] == 4
+    assert row["stats"]["model_ms"]["count"] == 4
+    reg.close()
+
+
+def test_run_files_are_locked_per_run(tmp_path) -> None:
+    import threading
+
+    from app.services.storage import RunRegistry
+
+    reg = RunRegistry(tmp_path)
+    a, b = reg.ensure_run("a"), reg.ensure_run("b")
+    reg.append_event(b, '{"frame_id": 0}')
+    done = threading.Event()
+    with reg._run_lock(a):
+        # Run a's files are busy; run b still reads and appends
+        worker = threading.Thread(target=lambda: (reg.append_event(b, '{"frame_id": 1}'), reg.frame_count(b), done.set()))
+        worker.start()
+        assert done.wait(5)
+    assert reg.read_events(b, cursor=0)[0] == ['{"frame_id": 0}', '{"frame_id": 1}']
+    reg.close()
+
+
+def test_telemetry_columns_follow_the_log(tmp_path) -> None:
+    import json
+
+    import numpy as np
+
+    from app.services.storage import RunRegistry
+    from app.services.telemetry import TelemetryStore
+
+    reg = RunRegistry(tmp_path)
+    rid = reg.ensure_run("t1")
+    events = [
+        {"frame_id": i, "ts": 1000.0 + i, "fps": 10.0 + i, "timings": {"pre": 1.0, "model": 2.0 * i}, "boxes": [{}] * i}
+        for i in range(6)
+    ]
+    reg.append_events(rid, [json.dumps(e) for e in events[:4]])
+    reg.append_event(rid, json.dumps(events[4]))
+    with (tmp_path / rid / "events.jsonl").open("a", encoding="utf-8") as f:
+        f.write(json.dumps(events[5]) + "\n")  # written behind the registry's back
+    store = reg.telemetry(rid)
+    cols = store.columns()
+    assert len(store) == 6 and cols["frame_id"].tolist() == list(range(6))
+    assert np.allclose(cols["model_ms"], [0, 2, 4, 6, 8, 10]) and cols["boxes"].tolist() == list(range(6))
+    win = store.window(1002.0, 1004.0, names=["fps"])
+    assert np.allclose(win["fps"], [12.0, 13.0]) and set(win) == {"fps", "ts"}
+    assert store.summary()["model_ms"]["max"] == 10.0
+
+    # Rebuilt from the log if the store is lost
+    TelemetryStore(tmp_path / rid).clear()
+    assert len(reg.telemetry(rid)) == 6
+
+
+def _create_runs(base: str, n: int) -> list:
+    from app.services.storage import RunRegistry
+
+    reg = RunRegistry(base)
+    return [reg.ensure_run(profile="realtime") for _ in range(n)]
+
+
+def test_run_index_ids_latest_and_queries(tmp_path) -> None:
+    import json
+    import multiprocessing as mp
+    import time
+
+    from app.services.storage import RunRegistry
+
+    (tmp_path / "legacy-run").mkdir()
+    (tmp_path / "legacy-run" / "events.jsonl").write_text('{"frame_id": 0}\n')
+    reg = RunRegistry(tmp_path)
+    assert reg.index.get("legacy-run") is not None  # picked up from the directory once
+
+    # Same-second ids from several processes never collide
+    with mp.get_context("fork").Pool(3) as pool:
+        ids = [rid for chunk in pool.starmap(_create_runs, [(str(tmp_path), 40)] * 3) for rid in chunk]
+    assert len(set(ids)) == 120
+
+    t0 = time.time()
+    rid = reg.ensure_run(profile="accuracy", scenario="night", provenance={"detector": "replicate:yolo"})
+    reg.append_events(rid, [json.dumps({"frame_id": i, "fps": 12.0, "timings": {"model": 5.0}}) for i in range(3)])
+    reg.add_artifact(rid, "report", "runs/x/report.pdf")
+    # Another worker process sees the same latest run and its row
+    other = RunRegistry(tmp_path)
+    assert other.last_run_id() == rid
+    row = other.index.get(rid)
+    assert row["frames"] == 3 and row["profile"] == "accuracy" and row["scenario"] == "night"
+    assert row["provenance"] == {"detector": "replicate:yolo"} and row["artifacts"]["report"] == "runs/x/report.pdf"
+    assert row["stats"]["model_ms"]["mean"] == 5.0
+    assert [r["run_id"] for r in other.index.query(profile="accuracy")] == [rid]
+    assert len(other.index.query(profile="realtime", limit=500)) == 120
+    assert [r["run_id"] for r in other.index.query(since=t0)] == [rid]
+
+
+def test_rotated_segments_read_transparently(tmp_path) -> None:
+    from app.services.event_log import EventLog, SegmentSettings
+    from app.services.event_writer import WriterSettings
+    from app.services.storage import RunRegistry
+
+    # Rotate every ~100 bytes; the background writer closes its handle before each rotation
+    seg = SegmentSettings(segment_mb=100 / (1024 * 1024), compression="gzip")
+    reg = RunRegistry(tmp_path, writer=WriterSettings(max_batch_events=3), segments=seg)
+    rid = reg.ensure_run("seg")
+    events = [f'{{"frame_id": {i}, "fps": {i}.0, "pad": "{"x" * 20}"}}' for i in range(30)]
+    for i in range(0, 30, 3):
+        reg.append_events(rid, events[i:i + 3])
+        reg.flush(rid)
+    log = EventLog(tmp_path / rid)
+    assert len(log.segments()) >= 5
+    assert reg.read_last_event(rid) == events[-1]
+
+    # Compressed segments answer reads at the same logical offsets
+    lines, cur = reg.read_events(rid, cursor=0, limit=1000)
+    assert lines == events
+    assert reg.compress_segments(rid)["segments"] == len(log.segments())
+    assert all(s["codec"] == "gzip" for s in log.segments())
+    assert not list(log.seg_dir.glob("*.jsonl"))
+    assert reg.read_events(rid, cursor=0, limit=1000) == (events, cur)
+    lines, _ = reg.read_events(rid, after_frame=13, limit=4)
+    assert [ln.split(",")[0] for ln in lines] == [f'{{"frame_id": {i}' for i in range(14, 18)]
+
+    # Derived data rebuilds from segments; new appends continue the logical log
+    (tmp_path / rid / "events.idx").unlink()
+    reg.telemetry(rid).clear()
+    assert list(reg.telemetry(rid).columns(["fps"])["fps"]) == [float(i) for i in range(30)]
+    reg.append_event(rid, '{"frame_id": 30}')
+    assert reg.read_events(rid, cursor=cur) == (['{"frame_id": 30}'], cur + len('{"frame_id": 30}') + 1)
+    reg.close()
+
+
+def test_appends_during_delete_leave_no_run_behind(tmp_path, monkeypatch) -> None:
+    from app.services.event_writer import WriterSettings
+
+    for writer in (None, WriterSettings(max_batch_events=1, flush_interval_ms=1)):
+        _delete_while_appending(tmp_path / ("writer" if writer else "direct"), monkeypatch, writer)
+
+
+def _delete_while_appending(base, monkeypatch, writer) -> None:
+    from app.services.storage import RunRegistry
+
+    reg = RunRegistry(base, writer=writer)
+    rid = reg.ensure_run("gone")
+    reg.append_events(rid, [f'{{"frame_id": {i}}}' for i in range(3)])
+    reg.flush(rid)
+    real = reg._delete_files
+
+    def racing(run_id: str) -> int:
+        # Events arrive after the writer let go of the run, before and after its files go
+        reg.append_event(run_id, '{"frame_id": 3}')
+        freed = real(run_id)
+        reg.append_event(run_id, '{"frame_id": 4}')
+        return freed
+
+    monkeypatch.setattr(reg, "_delete_files", racing)
+    assert reg.delete_run(rid) > 0
+    reg.flush()
+    assert not (base / rid).exists() and reg.index.get(rid) is None
+    if reg.writer is not None:
+        assert reg.writer.stats()["pending"] == 0
+    reg.close()
+
+
+def test_janitor_compacts_idle_and_deletes_old_runs(tmp_path) -> None:
+    import time
+
+    from app.services.event_log import EventLog
+    from app.services.retention import RetentionSettings, RunJanitor
+    from app.services.storage import RunRegistry
+
+    reg = RunRegistry(tmp_path)
+    old, idle, live, empty = (reg.ensure_run(r) for r in ("old", "idle", "live", "empty"))
+    for rid in (old, idle, live):
+        reg.append_events(rid, [f'{{"frame_id": {i}}}' for i in range(50)])
+    bundle = tmp_path / "old_bundle.zip"
+    bundle.write_bytes(b"zip")
+    reg.add_artifact(old, "bundle", bundle)
+    now = time.time()
+    conn = reg.index._conn()
+    for rid, age in ((old, 40 * 86400), (idle, 3600), (empty, 7200), (live, 0)):
+        conn.execute("UPDATE runs SET last_active = ? WHERE run_id = ?", (now - age, rid))
+
+    janitor = RunJanitor(reg, RetentionSettings(compact_idle_s=900, empty_ttl_s=3600, max_age_days=30))
+    assert janitor.run_once(now) == {"compacted": 1, "deleted": 2}
+    assert not (tmp_path / old).exists() and not bundle.exists() and not (tmp_path / empty).exists()
+    assert reg.index.get(old) is None and reg.index.get(live) is not None
+
+    # The idle run is one gzip segment and an empty active file; reads are unchanged
+    log = EventLog(tmp_path / idle)
+    assert [s["codec"] for s in log.segments()] == ["gzip"] and log.active.stat().st_size == 0
+    assert len(reg.read_events(idle, cursor=0, limit=100)[0]) == 50
+    assert reg.read_last_event(idle) == '{"frame_id": 49}'
+    assert RunRegistry(tmp_path).read_last_event(idle) == '{"frame_id": 49}'
+    assert (tmp_path / live / "events.jsonl").stat().st_size > 0
+    # Compacted runs are skipped until they see new activity
+    assert janitor.run_once(now) == {"compacted": 0, "deleted": 0}
+    assert janitor.stats()["deleted"] == 2 and janitor.stats()["bytes_freed"] > 0
+
+
+def test_janitor_keeps_runs_that_predate_the_index(tmp_path) -> None:
+    import time
+
+    from app.services.retention import RetentionSettings, RunJanitor
+    from app.services.storage import RunRegistry
+
+    for rid in ("legacy", "stale"):
+        (tmp_path / rid).mkdir()
+        (tmp_path / rid / "events.jsonl").write_text("".join(f'{{"frame_id": {i}}}\n' for i in range(500)), encoding="utf-8")
+    reg = RunRegistry(tmp_path)
+    assert reg.index.get("legacy")["frames"] == 500  # backfill counts the log
+    # An index backfilled before frames were counted still says 0
+    reg.index.set_frames("stale", 0)
+    reg.index._conn().execute("UPDATE runs SET last_active = ?", (time.time() - 40 * 86400,))
+
+    assert RunJanitor(reg).run_once()["deleted"] == 0  # deletion is opt-in
+    janitor = RunJanitor(reg, RetentionSettings(compact_idle_s=0, empty_ttl_s=3600))
+    assert janitor.run_once()["deleted"] == 0
+    assert reg.index.get("stale")["frames"] == 500 and len(reg.read_events("stale", cursor=0, limit=1000)[0]) == 500
+    reg.close()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import itertools
+
+import numpy as np
+
+import app.utils.assignment as assignment
+from app.providers.tracking.bytetrack import ByteTracker, SimpleTracker
+from app.providers.tracking.sessions import TrackerSessions
+
+
+def _box(x: float) -> dict:
+    return {"x1": x, "y1": 0.0, "x2": x + 10.0, "y2": 10.0, "cls": "car"}
+
+
+def test_tracker_sessions_keep_ids_and_trails() -> None:
+    sessions = TrackerSessions(factory=SimpleTracker)
+    first = sessions.update("run-a", [_box(0), _box(100)])
+    second = sessions.update("run-a", [_box(2), _box(103)])
+    assert [t["id"] for t in second] == [t["id"] for t in first]
+    assert len(second[0]["trail"]) == 2
+    # Another run gets its own tracker and ID space
+    assert sessions.update("run-b", [_box(0)])[0]["id"] == 1
+
+
+def test_tracker_sessions_evict_idle_and_overflow(monkeypatch) -> None:
+    import app.providers.tracking.sessions as mod
+
+    now = [1000.0]
+    monkeypatch.setattr(mod.time, "monotonic", lambda: now[0])
+    sessions = TrackerSessions(factory=SimpleTracker, ttl_s=10, max_sessions=2)
+    sessions.update("a", [_box(0)])
+    sessions.update("b", [_box(0)])
+    sessions.update("c", [_box(0)])
+    assert "a" not in sessions and "b" in sessions and "c" in sessions
+    now[0] += 11
+    assert sessions.evict_idle() == 2
+    assert sessions.stats() == {"sessions": 0.0, "evicted": 3.0}
+
+
+def test_simple_tracker_memory_is_capped() -> None:
+    trk = SimpleTracker(max_tracks=5, max_age=3)
+    for i in range(50):
+        trk.update([_box(i * 50.0)])
+    assert len(trk) <= 4
+    assert len(trk._history) == len(trk)
+
+
+def _scored(x: float, y: float, score: float) -> dict:
+    return {"x1": x, "y1": y, "x2": x + 40.0, "y2": y + 80.0, "score": score, "cls": "person"}
+
+
+def test_bytetrack_keeps_ids_for_moving_and_low_score_boxes() -> None:
+    trk = ByteTracker()
+    first = trk.update([_scored(0, 0, 0.9), _scored(300, 0, 0.9)])
+    ids = [t["id"] for t in first]
+    for step in range(1, 10):
+        # Second box fades to a low score mid-way: kept alive by the second stage
+        score = 0.9 if step < 5 else 0.3
+        out = trk.update([_scored(5.0 * step, 0, 0.9), _scored(300 - 4.0 * step, 2.0 * step, score)])
+        assert [t["id"] for t in out] == ids
+    assert len(out[0]["trail"]) == 10
+    # A box that vanishes is kept as lost and re-acquired under its old ID
+    trk.update([_scored(50, 0, 0.9)])
+    back = trk.update([_scored(55, 0, 0.9), _scored(300 - 44.0, 22.0, 0.9)])
+    assert [t["id"] for t in back] == ids
+
+
+def test_bytetrack_caps_live_tracks() -> None:
+    trk = ByteTracker(max_tracks=8, track_buffer=2)
+    for i in range(20):
+        trk.update([_scored(100.0 * j + 1000.0 * i, 0, 0.9) for j in range(5)])
+    assert len(trk) <= 8
+    assert set(trk._trails) <= set(trk.ids.tolist())
+
+
+def _brute_force(cost: np.ndarray, thresh: float) -> tuple[int, float]:
+    n, m = cost.shape
+    best = (0, 0.0)
+    for perm in itertools.permutations(range(m), min(n, m)):
+        picked = [cost[i, j] for i, j in zip(range(n), perm) if cost[i, j] <= thresh]
+        cand = (len(picked), -sum(picked))
+        if cand > (best[0], -best[1]):
+            best = (len(picked), sum(picked))
+    return best
+
+
+def test_linear_assignment_matches_brute_force(monkeypatch) -> None:
+    rng = np.random.default_rng(0)
+    for use_scipy in (True, False):
+        if not use_scipy:
+            monkeypatch.setattr(assignment, "_scipy_lsa", None)
+        for _ in range(60):
+            n, m = rng.integers(1, 6, 2)
+            cost = rng.random((n, m))
+            cost[rng.random((n, m)) < 0.4] = 5.0
+            matches, rows, cols = assignment.linear_assignment(cost, thresh=0.9)
+            count, total = _brute_force(cost, 0.9) if n <= m else _brute_force(cost.T, 0.9)
+            assert len(matches) == count
+            assert np.isclose(cost[matches[:, 0], matches[:, 1]].sum(), total)
+            assert len(rows) == n - count and len(cols) == m - count
@@ -15,6 +15,9 @@ def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--sets", default="evals/harness/eval_sets", help="Path to eval sets directory")
     ap.add_argument("--out", default=None, help="Output report directory (default: evals/reports/YYYYMMDD)")
+    ap.add_argument("--track-iou", type=float, default=0.5, help="IoU for MOTA/IDF1 matches in the tracking eval")
+    ap.add_argument("--ocr-cache", default="runs/_cache/ocr_eval.json", help="Per-sample OCR score cache ('' to disable)")
+    ap.add_argument("--workers", type=int, default=0, help="Process pool size for large OCR sets (0 = one per CPU)")
     args = ap.parse_args()
 
     sets_dir = Path(args.sets)
@@ -26,8 +29,8 @@ def main() -> int:
 
     metrics = {
         "detection": run_detection_eval(sets_dir / "coco.json"),
-        "ocr": run_ocr_eval(sets_dir / "ocr.json"),
-        "tracking": run_tracking_eval(sets_dir / "tracking.json"),
+        "ocr": run_ocr_eval(sets_dir / "ocr.json", cache_path=args.ocr_cache or None, workers=args.workers),
+        "tracking": run_tracking_eval(sets_dir / "tracking.json", iou_thresh=args.track_iou),
     }
     write_report(out_dir, metrics)
     print(json.dumps({"out": str(out_dir), "metrics": metrics}, indent=2))